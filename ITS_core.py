@@ -7,6 +7,12 @@ from Queue import *
 # PROTOCOL STACK - One folder per layer of VANET protocol stack. It may include more than one entity. Each entity is a different thread.
 # VANET protocol stack data link layer - multicast communication - basic emulation of logical and link layer communication.
 from data_link.multicast import *
+from data_link.async_multicast import *
+from data_link.dcc import *
+from data_link.rxd_workers import *
+from data_link.replay import *
+from data_link.access_categories import *
+from data_link.latency import *
 
 # VANET protocol stack transport & network layer - it may include: topology management, information dissemination within a ROI, location-based routing
 from transport_network.geonetworking import *
@@ -41,7 +47,7 @@ spat_service_txd_queue=Queue()
 map_service_txd_queue=Queue()
 ivim_service_txd_queue=Queue()
 
-services_rxd_queue=Queue()
+services_rxd_queue=create_services_queue()
 
 
 geonetwork_txd_queue=Queue()
@@ -55,7 +61,8 @@ geonetwork_rxd_ivim_queue=Queue()
 
 beacon_rxd_queue=Queue()
 
-multicast_txd_queue=Queue()
+dcc_txd_queue=Queue()
+multicast_txd_queue=create_txd_queue()
 multicast_rxd_queue=Queue()
 
 # EVENTS  -  flags used to coordinate threads activities
@@ -242,6 +249,7 @@ def main(argv):
 		t=Thread(target=ca_service_rxd, args=(node_interface, start_flag, geonetwork_rxd_ca_queue, services_rxd_queue,))
 		t.start()
 		threads.append(t)
+		subscribe(node_interface, 'CA')
 
 		# Thread -  	den_service_txd: receive data from application_txd, generates events and sends the DEN message to the geonetwork_txd
 		# Arguments - 	node_interface: dictionary that contains the current node status 
@@ -262,6 +270,7 @@ def main(argv):
 		t=Thread(target=den_service_rxd, args=(node_interface, start_flag, geonetwork_rxd_den_queue, services_rxd_queue, geonetwork_txd_queue, ))
 		t.start()
 		threads.append(t)
+		subscribe(node_interface, 'DEN')
 
 		if (node_type==maps.rsu_node):
 			# Thread -  	spat_service_txd: receive data from application_txd, generates events and sends the SPaT message to the geonetwork_txd
@@ -283,6 +292,7 @@ def main(argv):
 			t=Thread(target=spat_service_rxd, args=(node_interface, start_flag, geonetwork_rxd_spat_queue, services_rxd_queue, ))
 			t.start()
 			threads.append(t)
+			subscribe(node_interface, 'SPAT')
 
 
 		# Thread -  	map_service_txd: receive data from application_txd, generates events and sends the SPaT message to the geonetwork_txd
@@ -303,6 +313,7 @@ def main(argv):
 		t=Thread(target=map_service_rxd, args=(node_interface, start_flag, geonetwork_rxd_map_queue, services_rxd_queue,))
 		t.start()
 		threads.append(t)
+		subscribe(node_interface, 'MAP')
 
 		if (node_type==maps.rsu_node) or (node_type==maps.au_node):
 			# Thread -  	ivim_service_txd: receive data from application_txd, generates events and sends the SPaT message to the geonetwork_txd
@@ -324,6 +335,7 @@ def main(argv):
 			t=Thread(target=ivim_service_rxd, args=(node_interface,  start_flag, geonetwork_rxd_ivim_queue, services_rxd_queue,))
 			t.start()
 			threads.append(t)
+			subscribe(node_interface, 'IVIM')
 
 
 		##################################################
@@ -334,8 +346,8 @@ def main(argv):
 		# Arguments - 	node_interface: dictionary that contains the current node status 
 		# 			 	start_flag: thread execution control flagcoordinates: last known coordinates
 		# 				geonetwork_txd_queue: queue to get data from ca_service_txd or den_service_txd
-		#             	multicast_txd_queue: queue to send data to multicast_txd
-		t=Thread(target=geonetwork_txd, args=(node_interface, start_flag, geonetwork_txd_queue, multicast_txd_queue,))
+		#             	multicast_txd_queue: queue to send data to multicast_txd (through dcc_gate if its_conf.dcc_model)
+		t=Thread(target=geonetwork_txd, args=(node_interface, start_flag, coordinates, geonetwork_txd_queue, dcc_txd_queue if its_conf.dcc_model else multicast_txd_queue,))
 		t.start()
 		threads.append(t)
 
@@ -345,7 +357,8 @@ def main(argv):
 		# 				coordinates: last known coordinates
 		# 				multicast_rxd_queue: queue to get data from multicast_txd
 		#             	geonetwork_rxd_ca_queue, geonetwork_rxd_den_queue, geonetwork_rxd_spat_queue, geonetwork_rxd_ivim_queue: queue to send data to services_rxd, after being processed
-		t=Thread(target=geonetwork_rxd, args=(node_interface, start_flag, multicast_rxd_queue, geonetwork_rxd_ca_queue, geonetwork_rxd_den_queue, geonetwork_rxd_spat_queue, geonetwork_rxd_ivim_queue,))
+		#             	geonetwork_txd_queue: queue to forward the messages addressed to other nodes (its_conf.forwarding_model)
+		t=Thread(target=geonetwork_rxd, args=(node_interface, start_flag, coordinates, multicast_rxd_queue, geonetwork_rxd_ca_queue, geonetwork_rxd_den_queue, geonetwork_rxd_spat_queue, geonetwork_rxd_ivim_queue, geonetwork_txd_queue,))
 		t.start()
 		threads.append(t)
 
@@ -353,8 +366,8 @@ def main(argv):
 
 			# Thread - 		beacon_txd: periodical generation of beacons
 			# Arguments - 	coordinates: last known coordinates
-			#             	multicast_txd_queue: queue to send beacons to multicast_txd
-			t=Thread(target=beacon_txd, args=(node_interface, start_flag, coordinates, multicast_txd_queue,))
+			#             	multicast_txd_queue: queue to send beacons to multicast_txd (through dcc_gate if its_conf.dcc_model)
+			t=Thread(target=beacon_txd, args=(node_interface, start_flag, coordinates, dcc_txd_queue if its_conf.dcc_model else multicast_txd_queue,))
 			t.start()
 			threads.append(t)
 
@@ -379,22 +392,50 @@ def main(argv):
 		#     Link layer threads
 		##################################################
 
-		# Thread - 		multicast_rxd: receive data from multicast socket, process and send the result to the geonetwork_rxd, after being processed, if needed
-		# Arguments - 	node_interface: dictionary that contains the current node status 
-		# 			 	start_flag: thread execution control flagcoordinates: last known coordinates
-		# 				multicast_rxd_queue: queue to send data to geonetwork_rxd
-		#            	beacon_rxd_queue: queue to send data to beacon_rxd
-		t=Thread(target=multicast_rxd, args=(node_interface, start_flag, coordinates, multicast_rxd_queue, beacon_rxd_queue,))
-		t.start()
-		threads.append(t)
+		if (its_conf.dcc_model):
+			# Thread - 		dcc_gate: rate control of the transmitted packets according to the channel busy ratio
+			# Arguments - 	node_interface: dictionary that contains the current node status 
+			# 			 	start_flag: thread execution control flag
+			# 				dcc_txd_queue: queue to get data from geonetwork_txd and beacon_txd
+			# 				multicast_txd_queue: queue to send data to multicast_txd
+			t=Thread(target=dcc_gate, args=(node_interface, start_flag, dcc_txd_queue, multicast_txd_queue,))
+			t.start()
+			threads.append(t)
 
-		# Thread - 		multicast_txd: receive data from geonetwork_txd and send it to the multicast socket
-		# Arguments - 	node_interface: dictionary that contains the current node status 
-		# 			 	start_flag: thread execution control flagcoordinates: last known coordinates
-		# 				multicast_txd_queue: queue to get data from transmission from geonetwork_txd
-		t=Thread(target=multicast_txd, args=(node_interface, start_flag, multicast_txd_queue,))
-		t.start()
-		threads.append(t)
+		if (its_conf.link_model == 'asyncio'):
+			# Thread - 		async_multicast: asyncio event loop that sends and receives data on the multicast socket
+			# Arguments - 	node_interface: dictionary that contains the current node status 
+			# 			 	start_flag: thread execution control flagcoordinates: last known coordinates
+			# 				multicast_txd_queue: queue to get data from transmission from geonetwork_txd
+			# 				multicast_rxd_queue: queue to send data to geonetwork_rxd
+			#            	beacon_rxd_queue: queue to send data to beacon_rxd
+			t=Thread(target=async_multicast, args=(node_interface, start_flag, coordinates, multicast_txd_queue, multicast_rxd_queue, beacon_rxd_queue,))
+			t.start()
+			threads.append(t)
+		else:
+			# Thread - 		multicast_rxd: receive data from multicast socket, process and send the result to the geonetwork_rxd, after being processed, if needed
+			# Arguments - 	node_interface: dictionary that contains the current node status 
+			# 			 	start_flag: thread execution control flagcoordinates: last known coordinates
+			# 				multicast_rxd_queue: queue to send data to geonetwork_rxd
+			#            	beacon_rxd_queue: queue to send data to beacon_rxd
+			#				With its_conf.rxd_workers > 1 (multicast medium), multicast_rxd_sharded shards the datagrams between workers
+			#				With its_conf.replay_file, capture_replay re-injects a capture instead
+			if (its_conf.replay_file):
+				t=Thread(target=capture_replay, args=(node_interface, start_flag, coordinates, multicast_rxd_queue, beacon_rxd_queue,))
+			elif (its_conf.rxd_workers > 1) and (its_conf.medium_model == 'multicast'):
+				t=Thread(target=multicast_rxd_sharded, args=(node_interface, start_flag, coordinates, multicast_rxd_queue, beacon_rxd_queue,))
+			else:
+				t=Thread(target=multicast_rxd, args=(node_interface, start_flag, coordinates, multicast_rxd_queue, beacon_rxd_queue,))
+			t.start()
+			threads.append(t)
+
+			# Thread - 		multicast_txd: receive data from geonetwork_txd and send it to the multicast socket
+			# Arguments - 	node_interface: dictionary that contains the current node status 
+			# 			 	start_flag: thread execution control flagcoordinates: last known coordinates
+			# 				multicast_txd_queue: queue to get data from transmission from geonetwork_txd
+			t=Thread(target=multicast_txd, args=(node_interface, start_flag, multicast_txd_queue,))
+			t.start()
+			threads.append(t)
 
 		if node_type == maps.obu_node:
 
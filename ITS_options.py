@@ -6,13 +6,27 @@
 #################################################
 
 #------------------------------------------------
-# forwarding_model = True: allow packet forwarding
+# forwarding_model = True: allow packet forwarding - messages addressed to a node (msg['dest']) are routed by
+#                          greedy/perimeter forwarding through the other nodes, which must also run with it
 #                   False: do not allow packet forwarding
 #------------------------------------------------
 forwarding_model = False
 
 #------------------------------------------------
-# roi_model = True: process packets using the RoI information
+# den_destination: node of ITS_maps.map the DEN messages are addressed to (GeoUnicast to its map position, relayed
+#                  with forwarding_model), e.g. '1' for RSU 1. None: DEN messages are broadcast
+#------------------------------------------------
+den_destination = None
+
+#------------------------------------------------
+# geounicast_max_hops: hops a message addressed to a node can make (greedy/perimeter forwarding,
+#                      transport_network/geo_routing.py)
+#------------------------------------------------
+geounicast_max_hops = 10
+
+#------------------------------------------------
+# roi_model = True: process packets using the RoI information - DEN/IVIM messages with a roi (roi_x, roi_y) carry
+#                   a destination area and are dropped by the receivers out of it (transport_network/geo_area.py)
 #             False: do not allow use RoI information to process the packets
 #------------------------------------------------
 roi_model  = False
@@ -49,6 +63,7 @@ delta_space = 10
 #################################################
 ## PHYSICAL LAYER EMULATION
 #  Model used: if distance from sender > range, then discard; if  distance from sender in [interference range, range[
+#  (channel_model = 'disc'), or the fading channel model of data_link/channel.py (channel_model = 'fading')
 #################################################
 
 #------------------------------------------------
@@ -64,4 +79,262 @@ range_scale = 0.8
 #------------------------------------------------
 # Interference zone packet drop probability
 #------------------------------------------------
-drop_threshold = 2
\ No newline at end of file
+drop_threshold = 2
+
+#------------------------------------------------
+# channel_model = 'disc': reception decided by the range and interference zone above
+#                 'fading': log-distance path loss and fading (data_link/channel.py)
+#------------------------------------------------
+channel_model = 'disc'
+
+#------------------------------------------------
+# Fading channel: path loss exponent, fading ('nakagami' | 'rayleigh' | 'none'), nakagami m (integer) and carrier frequency (Hz)
+#------------------------------------------------
+path_loss_exponent = 2.7
+fading_model = 'nakagami'
+nakagami_m = 3
+channel_frequency = 5.9e9
+
+#------------------------------------------------
+# Link budget (dBm) per node type, e.g. {1: 33, 2: 23}. Tx power of the types not listed is calibrated so that the
+# mean received power equals reference_sensitivity at the range of the type in ITS_maps
+#------------------------------------------------
+tx_power = {}
+rx_sensitivity = {}
+reference_sensitivity = -85.0
+
+#------------------------------------------------
+# Reception probability table step (m) and random seed (None: different results on every run)
+#------------------------------------------------
+channel_table_resolution = 1.0
+channel_seed = 1
+
+#################################################
+## DATA LINK LAYER
+#  Wire format of the transmitted packets. Received packets are decoded whatever the codec of the sender.
+#################################################
+
+#------------------------------------------------
+# wire_codec = 'json': json text (original format)
+#              'binary': compact binary format (data_link/codec.py). Messages not supported by the schema are sent in json
+# Receivers drop the binary packets out of range (physical_model) or duplicated on their fixed header, before the body
+# is decoded. Json packets have no fixed header: they are decoded in full before these decisions
+# Binary packets are 0.26-0.40 the size of json, but DEN, SPAT and IVIM messages take longer to encode than json.
+# They decode about twice as fast as json once the layout of their body is compiled; the first packet of a layout
+# costs 25-600 us (python -m benchmarks.codec_benchmark)
+# A node can override this value with a 'codec' entry in its ITS_maps.map definition
+#------------------------------------------------
+wire_codec = 'json'
+
+#------------------------------------------------
+# bundle_model = True: multicast_txd packs the messages waiting in multicast_txd_queue in a single datagram
+#                False: one datagram per message
+#------------------------------------------------
+bundle_model = False
+
+#------------------------------------------------
+# Bundle budget: maximum datagram size (bytes, limited to MSG_SIZE) and
+# maximum time (seconds) to wait for more messages after the first one (0: only the messages already waiting)
+#------------------------------------------------
+bundle_max_size = 1024
+bundle_max_delay = 0.001
+
+#------------------------------------------------
+# Fragmentation: datagrams larger than MSG_SIZE are sent in fragments and reassembled by the receiver.
+# Reassembly table limits: number of incomplete datagrams, bytes stored and timeout (seconds) after the first fragment
+#------------------------------------------------
+reassembly_max_entries = 64
+reassembly_max_bytes = 1048576
+reassembly_timeout = 1.0
+
+#------------------------------------------------
+# link_model = 'threads': multicast_txd and multicast_rxd blocking threads
+#              'asyncio': a single thread running an asyncio event loop (data_link/async_multicast.py)
+#------------------------------------------------
+link_model = 'threads'
+
+#------------------------------------------------
+# medium_model = 'multicast': IPv4 multicast over UDP, one process per node
+#                'memory': in-process broadcast bus - all the nodes run in the same interpreter, messages are not serialized
+#                'shm': shared memory rings - one process per node, all the nodes on the same host
+# (link_model = 'asyncio' always uses multicast)
+#------------------------------------------------
+medium_model = 'multicast'
+
+#------------------------------------------------
+# Shared memory medium: ring size of each node (bytes) and maximum polling interval of an idle reader (seconds)
+#------------------------------------------------
+shm_ring_size = 1048576
+shm_poll_interval = 0.001
+
+#------------------------------------------------
+# duplicate_model = True: packets already received (same node, msg_type and msg_id) are discarded before decoding
+#                   False: every packet is delivered
+# Duplicate filter size (sources, node and msg_type), time (seconds) a source is remembered without receiving its
+# packets and msg_ids remembered per source (data_link/duplicates.py). Messages routed by the geonetworking layer
+# (dest/gn_prev) are not filtered on reception: with forwarding_model, the messages delivered by geonetwork_rxd are
+# filtered instead (copies received through several paths)
+#------------------------------------------------
+duplicate_model = False
+duplicate_max_entries = 4096
+duplicate_ttl = 10.0
+duplicate_window = 1024
+
+#------------------------------------------------
+# dcc_model = True: decentralized congestion control between geonetwork_txd and multicast_txd (data_link/dcc.py)
+#             False: packets are sent as soon as they are generated
+#------------------------------------------------
+dcc_model = False
+
+#------------------------------------------------
+# Channel busy ratio: measurement interval (seconds), channel data rate (bit/s) and size (bytes) assumed for
+# received packets of unknown size (messages of the memory medium, not serialized)
+#------------------------------------------------
+dcc_probe_interval = 0.1
+dcc_data_rate = 6e6
+dcc_packet_size = 300
+
+#------------------------------------------------
+# DCC states: CBR at which the state changes to 'active' and to 'restrictive'
+#------------------------------------------------
+dcc_thresholds = (0.3, 0.65)
+
+#------------------------------------------------
+# Traffic class of each message type (0: highest priority, 3: other messages), token rate (packets/s) of each
+# class in each state, token bucket size of each class
+#------------------------------------------------
+dcc_classes = {'DEN': 0, 'CA': 1, 'BEACON': 1, 'SPAT': 2, 'IVIM': 2}
+dcc_rates = {'relaxed': (100, 20, 10, 10), 'active': (50, 10, 5, 2), 'restrictive': (20, 2, 1, 1)}
+dcc_burst = (10, 5, 5, 2)
+
+#------------------------------------------------
+# Packets waiting for a token: queue size per class (0: drop instead of queueing) and maximum waiting time (seconds)
+#------------------------------------------------
+dcc_queue_size = 20
+dcc_queue_lifetime = 1.0
+
+#------------------------------------------------
+# rxd_workers: number of workers that decode the received datagrams (1: a single multicast_rxd thread).
+#              Packets of the same sender are always handled by the same worker and delivered in order (multicast medium only)
+# rxd_worker_model = 'threads': workers are threads. They share the interpreter lock: no throughput gain over a single
+#                               thread (0.82 speedup with 8 workers, python -m benchmarks.rxd_benchmark)
+#                    'processes': workers are processes (decoding is not limited by the interpreter lock). Only faster
+#                                 with free CPUs: on a single CPU, 1 process worker decodes 54k packets/s vs 92k for a
+#                                 thread. The MAC model (mac_model) is not available to process workers
+#------------------------------------------------
+rxd_workers = 1
+rxd_worker_model = 'threads'
+
+#------------------------------------------------
+# capture_file: file where the node appends the datagrams it sends and receives (None: no capture).
+#               '{node}' is replaced by the node id, e.g. 'capture_{node}.its'. Summary: python -m data_link.capture <file>
+#------------------------------------------------
+capture_file = None
+
+#------------------------------------------------
+# replay_file: capture whose received datagrams replace the multicast reception (None: normal reception)
+# replay_speed: 1 - original pace, N - N times faster, 0 - as fast as possible
+#------------------------------------------------
+replay_file = None
+replay_speed = 1.0
+
+#------------------------------------------------
+# ac_model = 'fifo': multicast_txd_queue is a single FIFO queue
+#            'strict': one queue per access category, highest priority first (data_link/access_categories.py)
+#            'weighted': one queue per access category, weighted round robin with ac_weights
+#------------------------------------------------
+ac_model = 'fifo'
+
+#------------------------------------------------
+# Access category of each message type ('VO' > 'VI' > 'BE' > 'BK', other messages: 'BE'),
+# weights of the weighted model and maximum messages waiting per category (the oldest is dropped)
+#------------------------------------------------
+access_categories = {'DEN': 'VO', 'SPAT': 'VI', 'IVIM': 'VI', 'CA': 'BE', 'BEACON': 'BK'}
+ac_weights = {'VO': 8, 'VI': 4, 'BE': 2, 'BK': 1}
+ac_queue_size = {'VO': 64, 'VI': 64, 'BE': 128, 'BK': 16}
+
+#------------------------------------------------
+# compression_model = True: packets of at least compression_min_size bytes are compressed with a preset dictionary
+#                            (data_link/codec.py) when that reduces their size. CA messages and beacons are smaller
+#                     False: no compression
+#------------------------------------------------
+compression_model = False
+compression_min_size = 200
+
+#------------------------------------------------
+# channel_plan = None: every message is sent to a single multicast group (224.0.0.1:4260)
+#                {family: (group, port)}: each message family is sent to its own multicast channel, and nodes only
+#                join the channels of the facilities services they run, so unwanted traffic is filtered by the kernel
+# channel_families: family of each message type (other messages: 'CA'). Beacons travel with CA messages, and MAP
+#                   with SPAT
+#------------------------------------------------
+channel_plan = None
+channel_families = {'BEACON': 'CA', 'CA': 'CA', 'DEN': 'DEN', 'SPAT': 'SPAT', 'MAP': 'SPAT', 'IVIM': 'IVIM'}
+# channel_plan = {'CA': ('224.0.0.1', 4260), 'DEN': ('224.0.0.2', 4261), 'SPAT': ('224.0.0.3', 4262), 'IVIM': ('224.0.0.4', 4263)}
+
+#------------------------------------------------
+# latency_model = True: the messages are stamped when sent and received (kernel timestamps) and the latency breakdown
+#                       of the messages taken by the application is kept in histograms (data_link/latency.py)
+#                 False: no latency measurement
+#------------------------------------------------
+latency_model = False
+
+#------------------------------------------------
+# unicast_model = True: messages addressed to a node (msg['dest']) whose next hop is a neighbour are sent only to the
+#                       address of that neighbour, learned from the sender address of its beacons. Other nodes do not
+#                       receive (nor decode) them. Requires all the nodes to run with unicast_model
+#                 False: every message is sent by multicast
+#------------------------------------------------
+unicast_model = False
+
+#------------------------------------------------
+# impairment_model = True: loss, delay, jitter, duplication and reordering applied to the received packets
+#                          (data_link/impairment.py)
+#                    False: no impairments
+#------------------------------------------------
+impairment_model = False
+
+#------------------------------------------------
+# Impairments of every link (impairment) and of specific links (impairment_links, key (sender node, receiver node)):
+#		loss_model: 'bernoulli' (loss) | 'gilbert' (p_gb, p_bg, loss_good, loss_bad)
+#		delay_model: 'constant' (delay) | 'uniform' (delay, delay_max) | 'normal' (delay, delay_sigma) |
+#		             'exponential' (delay) | 'pareto' (delay, delay_shape); jitter: uniform extra delay up to jitter
+#		duplicate: duplication probability; reorder: probability of holding a packet reorder_delay seconds
+# Delays in seconds. impairment_seed: random seed (None: different results on every run)
+#------------------------------------------------
+impairment = {'loss_model': 'bernoulli', 'loss': 0.0, 'delay_model': 'constant', 'delay': 0.0, 'jitter': 0.0,
+			  'duplicate': 0.0, 'reorder': 0.0, 'reorder_delay': 0.01}
+impairment_links = {}
+impairment_seed = 1
+
+#------------------------------------------------
+# mac_model = True: CSMA/CA contention and collisions between the frames heard by each node (data_link/mac.py)
+#             False: simultaneous transmissions do not interfere
+#------------------------------------------------
+mac_model = False
+
+#------------------------------------------------
+# MAC model: data rate (bit/s), preamble duration, slot time, AIFS (s), contention window (slots), interference and
+# carrier sense ranges (factor of the sender range), release interval of idle receivers (s) and random seed
+#------------------------------------------------
+mac_data_rate = 6e6
+mac_preamble = 40e-6
+mac_slot = 13e-6
+mac_aifs = 58e-6
+mac_cw = 15
+mac_interference_factor = 1.5
+mac_carrier_sense_factor = 1.0
+mac_tick = 0.005
+mac_seed = 1
+
+#------------------------------------------------
+# loc_table_cell: side (m) of the cells of the grid indexing the neighbour table by position
+#                 (transport_network/loc_table.py). Small cells cost memory, large cells cost scanning
+#------------------------------------------------
+loc_table_cell = 500
+
+#------------------------------------------------
+# loc_table_validity: time (s) a neighbour is kept in the loc_table without receiving its beacons (beacons are sent
+#                     every 5 s)
+#------------------------------------------------
+loc_table_validity = 20
@@ -82,6 +82,8 @@ def trigger_event(node_id, event: EventConfig) -> Dict:
 			'timestamp': event.timestamp,
 			'repetition_interval': event.repetition_interval,
 			'max_hops': event.max_hops,
+			'roi_x': event.roi_x,
+			'roi_y': event.roi_y,
 			'max_latency': event.max_latency
 		}
 def trigger_situation(node_id, event: EventConfig) -> Dict:
@@ -101,6 +103,8 @@ def trigger_situation(node_id, event: EventConfig) -> Dict:
 			'timestamp': event.timestamp,
 			'repetition_interval': event.repetition_interval,
 			'max_hops': event.max_hops,
+			'roi_x': event.roi_x,
+			'roi_y': event.roi_y,
 			'max_latency': event.max_latency
 		}
 #------------------------------------------------------------------------------------------------
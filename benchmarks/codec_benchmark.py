@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# #################################################
+## CODEC BENCHMARK - bytes per message and encode/decode time of the json and binary wire codecs.
+# Messages are built with the same functions used by the facilities and geonetworking layers.
+# Binary decoding is timed with the body layout of the message compiled (bin dec), and for the first packet of
+# a layout, which compiles it (bin 1st).
+#		usage (from the repository root): python -m benchmarks.codec_benchmark [iterations]
+#################################################
+import sys, time, timeit
+import ITS_maps as maps
+from data_link.codec import *
+from facilities.services import create_ca_message, create_den_message, create_spat_message, create_ivim_message
+from transport_network.geo import create_beacon
+from application.event_config import EventConfig, EventType, HazardSubType
+from application.message_handler import spat_generation, ivim_containers_creation
+
+#------------------------------------------------------------------------------------------------
+# sample_messages - one message of each type, as generated by an OBU (node 5) and an RSU (node 4)
+#------------------------------------------------------------------------------------------------
+def sample_messages():
+	obu = maps.map['5']
+	rsu = maps.map['4']
+	obu_interface = {'node_id': '5', 'type': obu['type'], 'sub_type': obu['sub_type'], 'speed': obu['speed'],
+		'direction': obu['direction'], 'heading': obu['heading'], 'plus_info': '', 'time': time.time()}
+	rsu_interface = {'node_id': '4', 'type': rsu['type'], 'num_tls': rsu['num_tls'], 'tls_group': rsu['tls_groups'],
+		'movement': rsu['movement'], 'plus_info': '', 'time': time.time(), 'rsu_status': 'active'}
+	obu_coordinates = {'x': obu['x'], 'y': obu['y'], 't': time.time()}
+	rsu_coordinates = {'x': rsu['x'], 'y': rsu['y'], 't': time.time()}
+
+	event = EventConfig.create_hazard_event(EventType.ROAD_SURFACE_HAZARD, HazardSubType.POTHOLES, 3, 0.8,
+		{'x': 1000.0, 'y': 50.0}, {'width': 0.5, 'length': 1.2, 'depth': 0.1}, '5')
+	den_event = {'msg_type': 'DEN', 'event_id': event.event_id, 'event_type': event.event_type.value,
+		'hazard_subtype': event.hazard_subtype.value, 'status': event.status.value, 'severity': event.severity,
+		'confidence': event.confidence, 'location': event.location, 'dimensions': event.dimensions, 'node': '5',
+		'timestamp': event.timestamp, 'repetition_interval': event.repetition_interval,
+		'max_hops': event.max_hops, 'max_latency': event.max_latency}
+	situation = dict(ivim_containers_creation(rsu_interface, 'road_works'))
+	situation.update({'original_event_id': event.event_id, 'hazard_details': {'type': 'potholes', 'severity': 3,
+		'confidence': 0.8, 'location': event.location, 'dimensions': event.dimensions},
+		'timestamp': time.time(), 'source_rsu': '4'})
+
+	return [
+		('BEACON', create_beacon('5', obu['type'], obu['x'], obu['y'], time.time())),
+		('CA', create_ca_message(obu_interface, 1234, obu_coordinates)),
+		('DEN', create_den_message(obu_interface, 12, obu_coordinates, den_event)),
+		('SPAT', create_spat_message(rsu_interface, 56, rsu_coordinates, spat_generation(rsu_interface))),
+		('IVIM', create_ivim_message(rsu_interface, 7, rsu_coordinates, 100, situation)),
+	]
+
+#------------------------------------------------------------------------------------------------
+# per_call_us - mean time of a single call, in microseconds
+#------------------------------------------------------------------------------------------------
+def per_call_us(function, arg, iterations):
+	return min(timeit.repeat(lambda: function(arg), number=iterations, repeat=3)) / iterations * 1e6
+
+# decode_binary of a packet whose layout is not compiled yet
+def first_decode(pkt):
+	body_layouts.clear()
+	return decode_binary(pkt)
+
+def main(argv):
+	iterations = int(argv[1]) if len(argv) > 1 else 20000
+	messages = sample_messages()
+
+	print('\n{:<8}{:>11}{:>11}{:>8}{:>13}{:>13}{:>13}{:>13}{:>13}'.format('msg', 'json B', 'binary B', 'ratio',
+		'json enc us', 'bin enc us', 'json dec us', 'bin dec us', 'bin 1st us'))
+	for name, msg in messages:
+		json_pkt = encode_json(msg)
+		binary_pkt = encode_binary(msg)
+		if (first_decode(binary_pkt) != decode_json(json_pkt)) or (decode_binary(binary_pkt) != decode_json(json_pkt)):
+			print('ERROR: binary and json decoding differ for {}'.format(name))
+		print('{:<8}{:>11}{:>11}{:>8.2f}{:>13.2f}{:>13.2f}{:>13.2f}{:>13.2f}{:>13.2f}'.format(name,
+			len(json_pkt), len(binary_pkt), len(binary_pkt) / len(json_pkt),
+			per_call_us(encode_json, msg, iterations), per_call_us(encode_binary, msg, iterations),
+			per_call_us(decode_json, json_pkt, iterations), per_call_us(decode_binary, binary_pkt, iterations),
+			per_call_us(first_decode, binary_pkt, max(iterations // 100, 1))))
+	return
+
+if __name__=="__main__":
+	main(sys.argv)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# #################################################
+## COMPRESSION BENCHMARK - bytes saved by the preset dictionary compression (data_link/codec.py) and
+# CPU time spent to compress and decompress each message, for both codecs. Packets smaller than
+# its_conf.compression_min_size are not compressed, as by encode_packet. Decompression is the zlib time of the
+# compressed body alone (decompress), without decoding.
+# The last lines estimate the load of an RSU broadcasting SPAT at 10 Hz, IVIM at 1 Hz and DEN at 1 Hz.
+#		usage (from the repository root): python -m benchmarks.compression_benchmark [iterations]
+#################################################
+import sys, timeit
+import ITS_options as its_conf
+from data_link.codec import *
+from benchmarks.codec_benchmark import sample_messages
+
+# messages per second sent by an RSU
+RSU_RATES = {'SPAT': 10, 'IVIM': 1, 'DEN': 1}
+
+def per_call_us(function, arg, iterations):
+	return min(timeit.repeat(lambda: function(arg), number=iterations, repeat=3)) / iterations * 1e6
+
+def main(argv):
+	iterations = int(argv[1]) if len(argv) > 1 else 5000
+	messages = sample_messages()
+	encoders = {'json': encode_json, 'binary': encode_binary}
+
+	print('compression_min_size: {} B'.format(its_conf.compression_min_size))
+	print('\n{:<8}{:<8}{:>9}{:>13}{:>8}{:>11}{:>11}'.format('msg', 'codec', 'bytes', 'compressed', 'saved', 'comp us', 'decomp us'))
+	rsu = {codec: {'saved': 0, 'cpu': 0.0} for codec in encoders}
+	for name, msg in messages:
+		for codec, encode in encoders.items():
+			pkt = encode(msg)
+			comp_us = decomp_us = 0.0
+			compressed = pkt
+			if len(pkt) >= its_conf.compression_min_size:
+				compressed = compress_packet(pkt)
+				comp_us = per_call_us(compress_packet, pkt, iterations)
+			if compressed is not pkt:
+				if decode_packet(compressed) != decode_packet(pkt):
+					print('ERROR: compressed and uncompressed decoding differ for {} {}'.format(name, codec))
+				# the binary header is not compressed, json packets start with COMPRESSED_MAGIC
+				body = compressed[HEADER_SIZE:] if (compressed[0] == WIRE_MAGIC) else compressed[1:]
+				decomp_us = per_call_us(decompress, body, iterations)
+			saved = len(pkt) - len(compressed)
+			print('{:<8}{:<8}{:>9}{:>13}{:>7.0f}%{:>11.2f}{:>11.2f}'.format(name, codec, len(pkt), len(compressed),
+				100.0 * saved / len(pkt), comp_us, decomp_us))
+			rate = RSU_RATES.get(name, 0)
+			rsu[codec]['saved'] += rate * saved
+			rsu[codec]['cpu'] += rate * comp_us
+
+	print('\nRSU ({}):'.format(', '.join('{} {}/s'.format(k, v) for k, v in RSU_RATES.items())))
+	for codec, totals in rsu.items():
+		print('  {:<8} bandwidth saved: {:>6} B/s   compression CPU: {:>7.1f} us/s ({:.4f}% of a core)'.format(codec,
+			totals['saved'], totals['cpu'], totals['cpu'] / 1e4))
+	return
+
+if __name__=="__main__":
+	main(sys.argv)
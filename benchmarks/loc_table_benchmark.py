@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# #################################################
+## LOC TABLE BENCHMARK - cost of the neighbour table operations (transport_network/loc_table.py) with 10, 1k and
+# 10k neighbours placed at random over the map area, against a full scan of a plain dict (the original loc_table):
+#		update - beacon received from a neighbour that moved (update_loc_table_entry)
+#		radius - neighbours within the OBU range of a random position
+#		nearest - neighbour closest to a random destination, and the 8 closest
+#		update batch - 100 beacons received together (update_loc_table_entries), per beacon
+#		next hop - greedy next hop towards a random destination position (find_next_hop), against a scan
+#		view - consistent view of the table for a reader: the published view (read-copy-update) against a copy
+#		expire - expiry check with no entry due (the deadline heap against the scan of every entry once per second)
+# Times in microseconds per operation.
+#		usage (from the repository root): python -m benchmarks.loc_table_benchmark [cell (m)]
+#################################################
+import sys, time, math, random
+import ITS_maps as maps
+from transport_network.geo import update_loc_table_entry, update_loc_table_entries, find_next_hop
+from transport_network.geo_routing import PlanarGraph
+from transport_network.loc_table import LocTable
+
+SIZES = (10, 1000, 10000)
+VALIDITY = 2000
+
+def per_op(function, args_list):
+	begin = time.perf_counter()
+	for args in args_list:
+		function(*args)
+	return (time.perf_counter() - begin) / len(args_list) * 1e6
+
+def scan_radius(table, x, y, r):
+	return [e for e in table.values() if math.hypot(e['pos_x'] - x, e['pos_y'] - y) <= r]
+
+def plain_update(table, beacon):
+	table.update({beacon['node']: {'node': beacon['node'], 'pos_x': beacon['pos_x'], 'pos_y': beacon['pos_y'],
+								   'timeout': time.time() + VALIDITY}})
+
+def scan_expire(table, now):
+	return [node for node, e in table.items() if now > e['timeout']]
+
+def scan_nearest(table, x, y, k):
+	return sorted(table.values(), key=lambda e: math.hypot(e['pos_x'] - x, e['pos_y'] - y))[:k]
+
+def random_position(rng):
+	return rng.uniform(-maps.size_x / 2, maps.size_x / 2), rng.uniform(-maps.size_y / 2, maps.size_y / 2)
+
+def beacon(rng, n):
+	x, y = random_position(rng)
+	return {'msg_type': 'BEACON', 'node': str(rng.randrange(n)), 'node_type': maps.obu_node, 'pos_x': x, 'pos_y': y, 'time': 0}
+
+def run(n, cell):
+	rng = random.Random(n)
+	loc_table = LocTable(cell=cell)
+	plain = {}
+	for i in range(n):
+		x, y = random_position(rng)
+		entry = {'node': str(i), 'pos_x': x, 'pos_y': y, 'timeout': time.time() + VALIDITY}
+		loc_table.update(entry)
+		plain[str(i)] = entry
+	queries = [random_position(rng) for i in range(max(10000 // n, 20))]
+	beacons = [('0', loc_table, beacon(rng, n), VALIDITY) for i in range(10000)]
+
+	results = {}
+	results['update'] = (per_op(update_loc_table_entry, beacons),
+						 per_op(plain_update, [(plain, b[2]) for b in beacons]))
+	batches = [('0', loc_table, [b[2] for b in beacons[i:i+100]], VALIDITY) for i in range(0, len(beacons), 100)]
+	results['update batch'] = (per_op(update_loc_table_entries, batches) / 100, results['update'][1])
+	results['radius'] = (per_op(loc_table.radius, [(x, y, maps.obu_range) for x, y in queries]),
+						 per_op(scan_radius, [(plain, x, y, maps.obu_range) for x, y in queries]))
+	results['nearest 1'] = (per_op(loc_table.nearest, [(x, y, 1) for x, y in queries]),
+							per_op(scan_nearest, [(plain, x, y, 1) for x, y in queries]))
+	results['nearest 8'] = (per_op(loc_table.nearest, [(x, y, 8) for x, y in queries]),
+							per_op(scan_nearest, [(plain, x, y, 8) for x, y in queries]))
+	graph = PlanarGraph(loc_table)
+	hops = [({'node_id': '-1'}, loc_table.view(), '-1', (x, y), {'dest': '-1', 'dest_pos': {'x': -x, 'y': -y}}, graph) for x, y in queries]
+	results['next hop'] = (per_op(find_next_hop, hops),
+						   per_op(scan_nearest, [(plain, -x, -y, 1) for x, y in queries]))
+	results['view'] = (per_op(loc_table.view, [()] * len(queries)),
+					   per_op(dict, [(plain,)] * len(queries)))
+	results['expire'] = (per_op(loc_table.expire, [(0,)] * len(queries)),
+						 per_op(scan_expire, [(plain, 0)] * len(queries)))
+	return results
+
+def main(argv):
+	cell = float(argv[1]) if len(argv) > 1 else None
+	print('area: {} m x {} m  radius: {} m  times in us per operation (grid / dict scan)'.format(maps.size_x, maps.size_y, maps.obu_range))
+	for n in SIZES:
+		results = run(n, cell)
+		print('neighbours: {}'.format(n))
+		for operation, (grid, scan) in results.items():
+			print('  {:<12} {:>10.1f} {:>10.1f}'.format(operation, grid, scan))
+	return
+
+if __name__=="__main__":
+	main(sys.argv)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# #################################################
+## MAC BENCHMARK - CA messages at 10 Hz from many vehicles on the memory bus, with the MAC model
+# (its_conf.mac_model, data_link/mac.py) on and off. Vehicles are placed at random on a square road area, the
+# physical layer emulation is on, and each vehicle runs a multicast_rxd thread. Reported per run: delivery ratio,
+# collisions (frames lost), hidden terminal collisions, deferred frames, mean channel utilization seen by the
+# receivers, and the lag of the transmissions behind their schedule (the run keeps up with real time if the lag
+# stays small). CAMs sent late are sent in bursts, so the collisions grow with the lag.
+#		usage (from the repository root): python -m benchmarks.mac_benchmark [vehicles] [seconds] [area (m)]
+#################################################
+import sys, time, threading, random
+from Queue import Queue
+import ITS_maps as maps
+import ITS_options as its_conf
+from data_link.multicast import *
+from data_link.mac import mac_models
+
+CAM_RATE = 10
+
+def run(n_vehicles, seconds, area, mac_model):
+	its_conf.mac_model = mac_model
+	mac_models.clear()
+	rng = random.Random(1)
+	positions = [(rng.uniform(0, area), rng.uniform(0, area)) for i in range(n_vehicles)]
+	start_flag = threading.Event()
+	start_flag.set()
+	rxd_queues = []
+	for i, (x, y) in enumerate(positions):
+		node_interface = {'node_id': str(100+i), 'type': maps.obu_node}
+		multicast_rxd_queue = Queue()
+		t = threading.Thread(target=multicast_rxd, args=(node_interface, start_flag, {'x': x, 'y': y, 't': 0},
+							 multicast_rxd_queue, Queue(),), daemon=True)
+		t.start()
+		rxd_queues.append(multicast_rxd_queue)
+	while len(memory_bus.inboxes) < n_vehicles:
+		time.sleep(0.01)
+
+	txd = get_medium().open_txd({'node_id': '100', 'type': maps.obu_node})
+	# each vehicle sends a CAM every 1/CAM_RATE s, with a random phase
+	schedule = sorted((rng.uniform(0, 1.0/CAM_RATE), i) for i in range(n_vehicles))
+	begin = time.monotonic()
+	sent = 0
+	lag = total_lag = 0.0
+	while True:
+		for offset, i in schedule:
+			due = begin + sent // n_vehicles / CAM_RATE + offset
+			if due - begin >= seconds:
+				break
+			now = time.monotonic()
+			if due > now:
+				time.sleep(due - now)
+			else:
+				lag = max(lag, now - due)
+				total_lag += now - due
+			x, y = positions[i]
+			txd.send([{'msg_type': 'CA', 'node': str(100+i), 'node_type': maps.obu_node, 'msg_id': sent, 'pos_x': x,
+					   'pos_y': y, 'time': time.time(), 'speed': 100, 'dir': 'f', 'heading': 'E'}])
+			sent += 1
+		else:
+			continue
+		break
+	time.sleep(0.2)
+	delivered = 0
+	for q in rxd_queues:
+		while not q.empty():
+			delivered += len(q.get())
+	for inbox in list(memory_bus.inboxes):
+		memory_bus.detach(inbox)
+
+	stats = {'collisions': 0, 'hidden': 0, 'deferred': 0, 'frames': 0}
+	for mac in mac_models.values():
+		for k in stats:
+			stats[k] += mac.stats[k]
+	utilization = sum(mac.utilization() for mac in mac_models.values()) / max(len(mac_models), 1)
+	return sent, delivered, stats, utilization, lag, total_lag / max(sent, 1)
+
+def main(argv):
+	n_vehicles = int(argv[1]) if len(argv) > 1 else 100
+	seconds = float(argv[2]) if len(argv) > 2 else 5
+	area = float(argv[3]) if len(argv) > 3 else 6000
+	its_conf.medium_model = 'memory'
+	its_conf.physical_model = True
+
+	print('vehicles: {}  CAM rate: {} Hz  duration: {} s  area: {:.0f} m x {:.0f} m'.format(n_vehicles, CAM_RATE, seconds, area, area))
+	for mac_model in (False, True):
+		sent, delivered, stats, utilization, lag, mean_lag = run(n_vehicles, seconds, area, mac_model)
+		print('mac_model: {!s:<6} sent: {}  delivered: {} ({:.1f} per CAM)  collisions: {} ({:.1f}% of {} frames)  '
+			  'hidden: {}  deferred: {}  utilization: {:.1f}%  lag: {:.2f} ms mean, {:.1f} ms max'.format(mac_model, sent,
+			  delivered, delivered / max(sent, 1), stats['collisions'], 100.0 * stats['collisions'] / max(stats['frames'], 1),
+			  stats['frames'], stats['hidden'], stats['deferred'], 100*utilization, 1000*mean_lag, 1000*lag))
+	return
+
+if __name__=="__main__":
+	main(sys.argv)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# #################################################
+## MEDIUM BENCHMARK - in-process broadcast bus with many nodes.
+# Starts one multicast_rxd thread per node on the memory bus (its_conf.medium_model = 'memory'),
+# broadcasts CA messages from one node and reports the delivery rate to the upper layer queues.
+#		usage (from the repository root): python -m benchmarks.medium_benchmark [nodes] [messages]
+#################################################
+import sys, time, threading
+from Queue import Queue
+import ITS_maps as maps
+import ITS_options as its_conf
+from data_link.multicast import *
+
+def main(argv):
+	n_nodes = int(argv[1]) if len(argv) > 1 else 200
+	n_msgs = int(argv[2]) if len(argv) > 2 else 1000
+	its_conf.medium_model = 'memory'
+
+	start_flag = threading.Event()
+	start_flag.set()
+	rxd_queues = []
+	for i in range(n_nodes):
+		node_interface = {'node_id': str(100+i), 'type': maps.obu_node}
+		coordinates = {'x': i, 'y': 0, 't': time.time()}
+		multicast_rxd_queue = Queue()
+		t = threading.Thread(target=multicast_rxd, args=(node_interface, start_flag, coordinates, multicast_rxd_queue, Queue(),), daemon=True)
+		t.start()
+		rxd_queues.append(multicast_rxd_queue)
+	while len(memory_bus.inboxes) < n_nodes:
+		time.sleep(0.01)
+
+	txd = get_medium().open_txd({'node_id': '100', 'type': maps.obu_node})
+	begin = time.perf_counter()
+	for msg_id in range(n_msgs):
+		txd.send([{'msg_type': 'CA', 'node': '100', 'node_type': maps.obu_node, 'msg_id': msg_id, 'pos_x': 0, 'pos_y': 0,
+			'time': time.time(), 'speed': 100, 'dir': 'f', 'heading': 'E'}])
+	for q in rxd_queues:
+		# multicast_rxd delivers the messages of a transmission in a list
+		received = 0
+		while received < n_msgs:
+			received += len(q.get())
+	elapsed = time.perf_counter() - begin
+
+	deliveries = n_nodes*n_msgs
+	print('nodes: {}  messages: {}  deliveries: {}  time: {:.2f} s  deliveries/s: {:.0f}'.format(
+		n_nodes, n_msgs, deliveries, elapsed, deliveries/elapsed))
+	return
+
+if __name__=="__main__":
+	main(sys.argv)
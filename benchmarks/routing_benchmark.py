@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# #################################################
+## ROUTING BENCHMARK - GeoUnicast over several hops (transport_network/geo.py route_message, greedy/perimeter
+# forwarding of transport_network/geo_routing.py). OBUs are placed at random over the map area, out of a void in
+# its centre that greedy forwarding must go around, and each one has its own loc_table of the neighbours in its
+# reliable range (range_scale * OBU range). DEN messages are sent between random pairs of nodes: every hop routes
+# the message as geonetwork_txd does (route_message, with forwarding_model) and the next hop receives it through
+# the physical layer emulation of multicast_rxd, tested on the header of the relayed message. Reported:
+#		delivered - messages received by their destination, over the pairs connected in the neighbour graph
+#		hops - mean hops of the delivered messages, and their stretch (hops over the shortest path)
+#		beyond origin - hops received from a relay out of range of the originator position (lost if the header kept
+#		                the originator position)
+#		routing_stats - greedy/perimeter hops, recoveries and drops
+#		usage (from the repository root): python -m benchmarks.routing_benchmark [nodes] [messages] [void radius (m)]
+#################################################
+import sys, math, random
+from collections import deque
+import ITS_maps as maps
+import ITS_options as its_conf
+from data_link.multicast import physical_layer_emulation
+from transport_network.geo import update_loc_table_entries, route_message, originator_message, routing_stats
+from transport_network.geo_routing import PlanarGraph
+from transport_network.loc_table import LocTable
+
+VALIDITY = 2000
+MAX_HOPS = 100
+
+def place_nodes(rng, n, void):
+	positions = []
+	while len(positions) < n:
+		x = rng.uniform(-maps.size_x / 2, maps.size_x / 2)
+		y = rng.uniform(-maps.size_y / 2, maps.size_y / 2)
+		if math.hypot(x, y) > void:
+			positions.append((x, y))
+	return positions
+
+# neighbours of each node: nodes in its reliable range (the beacons always received)
+def neighbour_lists(positions, reach):
+	return [[j for j, (xj, yj) in enumerate(positions) if (j != i) and (math.hypot(xj - xi, yj - yi) <= reach)]
+			for i, (xi, yi) in enumerate(positions)]
+
+# hops of the shortest path from source to every node (breadth first)
+def shortest_hops(neighbours, source):
+	hops = {source: 0}
+	queue = deque([source])
+	while queue:
+		i = queue.popleft()
+		for j in neighbours[i]:
+			if j not in hops:
+				hops[j] = hops[i] + 1
+				queue.append(j)
+	return hops
+
+#------------------------------------------------------------------------------------------------
+# send - routes a DEN message from source to dest. Returns (delivered, hops, hops beyond the originator range)
+#------------------------------------------------------------------------------------------------
+def send(nodes, source, dest, msg_id):
+	interface, table, graph, (x, y) = nodes[source]
+	msg = {'msg_type': 'DEN', 'node': interface['node_id'], 'node_type': interface['type'], 'msg_id': msg_id,
+		   'pos_x': x, 'pos_y': y, 'time': 0.0, 'event': {}, 'dest': nodes[dest][0]['node_id'],
+		   'dest_pos': {'x': nodes[dest][3][0], 'y': nodes[dest][3][1]}}
+	current = source
+	beyond = 0
+	for hop in range(MAX_HOPS):
+		interface, table, graph, position = nodes[current]
+		if not route_message(interface, table.view(), position, msg, graph) or ('next_hop' not in msg):
+			return False, hop, beyond
+		receiver = int(msg['next_hop'])
+		receiver_interface, coordinates = nodes[receiver][0], {'x': nodes[receiver][3][0], 'y': nodes[receiver][3][1]}
+		if not physical_layer_emulation(receiver_interface, coordinates, msg):
+			return False, hop, beyond
+		origin = msg.get('gn_src', (msg['pos_x'], msg['pos_y']))
+		if math.hypot(origin[0] - coordinates['x'], origin[1] - coordinates['y']) > maps.obu_range:
+			beyond += 1
+		if receiver == dest:
+			delivered = originator_message(msg)
+			return (delivered['pos_x'], delivered['pos_y']) == nodes[source][3], hop + 1, beyond
+		# the relay forwards a copy (geonetwork_rxd)
+		msg = dict(msg)
+		current = receiver
+	return False, MAX_HOPS, beyond
+
+def main(argv):
+	n_nodes = int(argv[1]) if len(argv) > 1 else 150
+	n_messages = int(argv[2]) if len(argv) > 2 else 500
+	void = float(argv[3]) if len(argv) > 3 else 2500
+	its_conf.forwarding_model = True
+	its_conf.physical_model = True
+	its_conf.geounicast_max_hops = MAX_HOPS
+	rng = random.Random(1)
+
+	positions = place_nodes(rng, n_nodes, void)
+	reach = its_conf.range_scale * maps.obu_range
+	neighbours = neighbour_lists(positions, reach)
+	nodes = []
+	for i, position in enumerate(positions):
+		table = LocTable()
+		beacons = [{'node': str(j), 'pos_x': positions[j][0], 'pos_y': positions[j][1]} for j in neighbours[i]]
+		update_loc_table_entries(str(i), table, beacons, VALIDITY)
+		nodes.append(({'node_id': str(i), 'type': maps.obu_node}, table, PlanarGraph(table), position))
+
+	connected = delivered = total_hops = stretch = beyond = 0
+	for msg_id in range(n_messages):
+		source, dest = rng.sample(range(n_nodes), 2)
+		shortest = shortest_hops(neighbours, source).get(dest)
+		if shortest is None:
+			continue
+		connected += 1
+		ok, hops, far = send(nodes, source, dest, msg_id)
+		beyond += far
+		if ok:
+			delivered += 1
+			total_hops += hops
+			stretch += hops / shortest
+
+	print('nodes: {}  area: {} m x {} m  void radius: {:.0f} m  reliable range: {:.0f} m  mean neighbours: {:.1f}'.format(
+		n_nodes, maps.size_x, maps.size_y, void, reach, sum(len(n) for n in neighbours) / n_nodes))
+	print('messages: {}  connected pairs: {}  delivered: {} ({:.1f}%)  mean hops: {:.2f}  stretch: {:.2f}  beyond origin: {}'.format(
+		n_messages, connected, delivered, 100.0 * delivered / max(connected, 1), total_hops / max(delivered, 1),
+		stretch / max(delivered, 1), beyond))
+	print('routing_stats: {}'.format(routing_stats))
+	return
+
+if __name__=="__main__":
+	main(sys.argv)
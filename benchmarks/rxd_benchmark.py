@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# #################################################
+## RECEPTION BENCHMARK - throughput of the sharded reception workers (data_link/rxd_workers.py).
+# Datagrams with CA messages from many senders are dispatched to 1, 2, 4... workers, as the reader thread
+# of multicast_rxd_sharded does, and the rate of packets delivered to multicast_rxd_queue is reported.
+# The socket is not used, so the result is the decoding capacity of the workers.
+#		usage (from the repository root): python -m benchmarks.rxd_benchmark [threads|processes] [json|binary] [datagrams]
+#################################################
+import sys, os, time
+from Queue import Queue
+import ITS_maps as maps
+import ITS_options as its_conf
+from data_link.codec import encode_packet
+from data_link.rxd_workers import *
+
+SENDERS = 64
+
+def create_datagrams(n, codec):
+	datagrams = []
+	for i in range(n):
+		# all the senders are in range: every packet is delivered
+		msg = {'msg_type': 'CA', 'node': str(100 + i % SENDERS), 'node_type': maps.obu_node, 'msg_id': i, 'pos_x': 10*(i % SENDERS),
+			   'pos_y': 0, 'time': time.time(), 'speed': 100, 'dir': 'f', 'heading': 'E'}
+		datagrams.append((encode_packet(msg, codec), ('10.0.0.{}'.format(i % SENDERS), 5000), None))
+	return datagrams
+
+def run(n_workers, model, datagrams):
+	multicast_rxd_queue = Queue()
+	workers = RxdWorkers({'node_id': '1', 'type': maps.rsu_node}, {'x': 0, 'y': 0, 't': 0}, multicast_rxd_queue, Queue(),
+						 n_workers, model)
+	workers.start()
+	# warm up (process start)
+	workers.dispatch(datagrams[:SENDERS])
+	received = 0
+	while received < SENDERS:
+		received += len(multicast_rxd_queue.get())
+
+	begin = time.perf_counter()
+	for i in range(0, len(datagrams), RXD_BATCH):
+		workers.dispatch(datagrams[i:i+RXD_BATCH])
+	received = 0
+	while received < len(datagrams):
+		received += len(multicast_rxd_queue.get())
+	elapsed = time.perf_counter() - begin
+	workers.close()
+	return elapsed
+
+def main(argv):
+	model = argv[1] if len(argv) > 1 else 'threads'
+	codec = argv[2] if len(argv) > 2 else 'json'
+	n_datagrams = int(argv[3]) if len(argv) > 3 else 100000
+	its_conf.physical_model = True
+
+	datagrams = create_datagrams(n_datagrams, codec)
+	print('model: {}  codec: {}  datagrams: {}  cpus: {}'.format(model, codec, n_datagrams, os.cpu_count()))
+	base = None
+	for n_workers in (1, 2, 4, 8):
+		elapsed = run(n_workers, model, datagrams)
+		base = base or elapsed
+		print('workers: {}  time: {:.2f} s  packets/s: {:.0f}  speedup: {:.2f}'.format(
+			n_workers, elapsed, n_datagrams/elapsed, base/elapsed))
+	return
+
+if __name__=="__main__":
+	main(sys.argv)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# #################################################
+## ACCESS CATEGORIES - EDCA style priority queuing of the transmitted messages (its_conf.ac_model).
+# multicast_txd_queue keeps one queue per access category, from the highest to the lowest priority:
+#		'VO' - voice/safety (DEN), 'VI' - video (SPAT, IVIM), 'BE' - best effort (CA), 'BK' - background (BEACON)
+# (its_conf.access_categories). Messages are taken from the queues by:
+#		'strict' - strict priority: always the highest priority message waiting
+#		'weighted' - weighted round robin: each category sends up to its_conf.ac_weights messages per round
+# Each category is bounded to its_conf.ac_queue_size messages: when full, the oldest message of the category
+# is dropped. The queueing delay of the messages is recorded per category.
+#################################################
+import time
+from collections import deque
+import ITS_options as its_conf
+from data_link.async_multicast import LinkQueue
+
+ACCESS_CATEGORIES = ('VO', 'VI', 'BE', 'BK')
+
+def access_category(msg):
+	return its_conf.access_categories.get(msg.get('msg_type'), 'BE')
+
+#------------------------------------------------------------------------------------------------
+# AccessCategoryQueue - LinkQueue with a queue per access category
+#		model: 'strict' | 'weighted'
+#		stats: per category - queued, sent, dropped (queue full), delay_sum, delay_max (seconds)
+#------------------------------------------------------------------------------------------------
+class AccessCategoryQueue(LinkQueue):
+
+	def __init__(self, model=None, maxsize=0):
+		self.model = model or its_conf.ac_model
+		if self.model not in ('strict', 'weighted'):
+			raise ValueError('unknown access category model: {}'.format(self.model))
+		LinkQueue.__init__(self, maxsize)
+
+	def _init(self, maxsize):
+		LinkQueue._init(self, maxsize)
+		self.queues = [deque() for ac in ACCESS_CATEGORIES]
+		self.index = {ac: i for i, ac in enumerate(ACCESS_CATEGORIES)}
+		self.bounds = [its_conf.ac_queue_size[ac] for ac in ACCESS_CATEGORIES]
+		self.weights = [max(its_conf.ac_weights[ac], 1) for ac in ACCESS_CATEGORIES]
+		self.credits = list(self.weights)
+		self.stats = {ac: {'queued': 0, 'sent': 0, 'dropped': 0, 'delay_sum': 0.0, 'delay_max': 0.0} for ac in ACCESS_CATEGORIES}
+
+	def _qsize(self):
+		return sum(len(queue) for queue in self.queues)
+
+	def _put(self, item):
+		i = self.index[access_category(item)]
+		queue = self.queues[i]
+		stats = self.stats[ACCESS_CATEGORIES[i]]
+		if len(queue) >= self.bounds[i]:
+			queue.popleft()
+			stats['dropped'] += 1
+		queue.append((time.time(), item))
+		stats['queued'] += 1
+		self._wake()
+
+	def _get(self):
+		i = self.select()
+		queued, item = self.queues[i].popleft()
+		stats = self.stats[ACCESS_CATEGORIES[i]]
+		delay = time.time() - queued
+		stats['sent'] += 1
+		stats['delay_sum'] += delay
+		if delay > stats['delay_max']:
+			stats['delay_max'] = delay
+		return item
+
+	#------------------------------------------------------------------------------------------------
+	# select - category of the next message (called only when a message is waiting)
+	#------------------------------------------------------------------------------------------------
+	def select(self):
+		if (self.model == 'strict'):
+			for i, queue in enumerate(self.queues):
+				if queue:
+					return i
+		for attempt in range(2):
+			for i, queue in enumerate(self.queues):
+				if queue and self.credits[i] > 0:
+					self.credits[i] -= 1
+					return i
+			# every category with messages used its credits: new round
+			self.credits = list(self.weights)
+
+#------------------------------------------------------------------------------------------------
+# create_txd_queue - multicast_txd_queue of the configured access category model
+#------------------------------------------------------------------------------------------------
+def create_txd_queue():
+	if (its_conf.ac_model == 'fifo'):
+		return LinkQueue()
+	return AccessCategoryQueue(its_conf.ac_model)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# #################################################
+## ASYNCIO LINK LAYER - multicast transmission and reception in a single event loop.
+# Alternative to the multicast_txd/multicast_rxd threads (its_conf.link_model = 'asyncio'):
+#		- AsyncLinkLayer owns the multicast sockets and exposes an awaitable send and an async iterator
+#		  of received packets.
+#		- async_multicast is the thread that runs the event loop and keeps feeding the queue-based
+#		  geonetworking threads (multicast_txd_queue, multicast_rxd_queue and beacon_rxd_queue).
+# Packets are framed, fragmented, decoded and filtered by the physical layer emulation exactly as in
+# data_link/multicast.py.
+#################################################
+import asyncio, time
+from Queue import Queue, Empty
+import application.app_config as app_conf
+import ITS_options as its_conf
+from data_link.multicast import *
+
+#------------------------------------------------------------------------------------------------
+# LinkQueue - Queue that wakes up an event loop when an item is put, so that the loop does not need a
+#		thread blocked on get(). Without an attached loop it behaves as a plain Queue.
+#------------------------------------------------------------------------------------------------
+class LinkQueue(Queue):
+
+	def _init(self, maxsize):
+		Queue._init(self, maxsize)
+		self.wakeup = None
+		self.wakeup_pending = False
+
+	def _put(self, item):
+		Queue._put(self, item)
+		self._wake()
+
+	def _wake(self):
+		# called with the queue mutex held - a single wakeup is scheduled until the loop drains the queue
+		if (self.wakeup is not None) and not self.wakeup_pending:
+			self.wakeup_pending = True
+			self.wakeup()
+
+	#------------------------------------------------------------------------------------------------
+	# attach - callback is called in the event loop after an item is put in the queue
+	#------------------------------------------------------------------------------------------------
+	def attach(self, loop, callback):
+		self.wakeup = lambda: loop.call_soon_threadsafe(callback)
+
+	#------------------------------------------------------------------------------------------------
+	# drain - all the items waiting in the queue. Clears the pending wakeup first, so items put during the
+	#		drain schedule a new wakeup.
+	#------------------------------------------------------------------------------------------------
+	def drain(self):
+		with self.mutex:
+			self.wakeup_pending = False
+		items = []
+		while True:
+			try:
+				items.append(self.get_nowait())
+			except Empty:
+				return items
+
+
+#------------------------------------------------------------------------------------------------
+# MulticastRxdProtocol - reception of multicast datagrams. deliver is called for each packet accepted
+#		by the physical layer emulation. With a MAC model (data_link/mac.py), the packets are delivered by it
+#		at the end of their airtime.
+#------------------------------------------------------------------------------------------------
+class MulticastRxdProtocol(asyncio.DatagramProtocol):
+
+	def __init__(self, node_interface, coordinates, deliver, table=None, mac=None):
+		self.node_interface = node_interface
+		self.coordinates = coordinates
+		self.deliver = deliver
+		self.table = table
+		self.mac = mac
+		self.duplicates = create_duplicate_filter()
+		self.probe = get_channel_probe(node_interface['node_id']) if its_conf.dcc_model else None
+		self.capture = open_capture(node_interface['node_id'])
+
+	def datagram_received(self, data, addr):
+		# asyncio does not return the ancillary data of the datagram: no kernel timestamp
+		rxd_time = time.time() if rxd_timestamps() else None
+		if self.capture is not None:
+			self.capture.write(CAPTURE_RXD, data, addr)
+		for pkt_rxd in receive_datagram(self.node_interface, self.coordinates, data, addr, self.duplicates, self.probe,
+										self.table, rxd_time, self.mac):
+			self.deliver(pkt_rxd)
+		if self.mac is not None:
+			self.mac.flush()
+
+	def error_received(self, exc):
+		if (app_conf.debug_multicast):
+			print('STATUS: Socket error ({}) - THREAD: async_multicast - NODE: {}'.format(exc, self.node_interface['node_id']),'\n')
+
+#------------------------------------------------------------------------------------------------
+# MulticastTxdProtocol - flow control of the transmission socket: writable is cleared while the
+#		transport write buffer is above its high-water mark
+#------------------------------------------------------------------------------------------------
+class MulticastTxdProtocol(asyncio.DatagramProtocol):
+
+	def __init__(self, rxd_protocol=None):
+		self.writable = asyncio.Event()
+		self.writable.set()
+		# its_conf.unicast_model: the transmission socket receives the unicast datagrams sent to the node
+		self.rxd_protocol = rxd_protocol
+
+	def datagram_received(self, data, addr):
+		if self.rxd_protocol is not None:
+			self.rxd_protocol.datagram_received(data, addr)
+
+	def pause_writing(self):
+		self.writable.clear()
+
+	def resume_writing(self):
+		self.writable.set()
+
+
+#------------------------------------------------------------------------------------------------
+# AsyncLinkLayer - link layer running in an asyncio event loop
+#		node_interface, coordinates: node status and last known coordinates (physical layer emulation)
+#		deliver: function called with each received packet. If None, received packets are kept in an
+#				 asyncio.Queue and read with 'async for pkt in link'
+#		mac: MacModel of the node (create_mac_model) or None. It delivers the packets it hears with its own
+#			 deliver function, possibly from the MAC ticker thread
+#------------------------------------------------------------------------------------------------
+class AsyncLinkLayer:
+
+	def __init__(self, node_interface, coordinates, deliver=None, mac=None):
+		self.node_interface = node_interface
+		self.node = node_interface['node_id']
+		self.coordinates = coordinates
+		self.codec = node_codec(self.node)
+		self.frag_id = 0
+		self.rxd_queue = None
+		if deliver is None:
+			self.rxd_queue = asyncio.Queue()
+			deliver = self.rxd_queue.put_nowait
+		self.deliver = deliver
+		self.mac = mac
+		self.rxd_transports = []
+		self.txd_transport = None
+		self.txd_protocol = None
+
+	async def open(self):
+		loop = asyncio.get_running_loop()
+		# one reassembly table for the sockets of the link layer
+		table = create_reassembly_table(self.node)
+
+		# one endpoint per socket of the subscribed channels
+		for r in create_rxd_sockets(self.node_interface):
+			r.setblocking(False)
+			transport, protocol = await loop.create_datagram_endpoint(
+				lambda: MulticastRxdProtocol(self.node_interface, self.coordinates, self.deliver, table, self.mac),
+				sock=r)
+			self.rxd_transports.append(transport)
+
+		s, self.address = create_txd_socket()
+		rxd_protocol = None
+		if (its_conf.unicast_model):
+			s = get_unicast_socket(self.node)
+			rxd_protocol = protocol
+		s.setblocking(False)
+		self.txd_transport, self.txd_protocol = await loop.create_datagram_endpoint(
+			lambda: MulticastTxdProtocol(rxd_protocol), sock=s)
+		self.sendto = self.txd_transport.sendto
+		capture = open_capture(self.node)
+		if capture is not None:
+			self.sendto = capture.sendto(self.sendto)
+		return self
+
+	def close(self):
+		for transport in self.rxd_transports:
+			transport.close()
+		self.rxd_transports = []
+		if self.txd_transport is not None:
+			self.txd_transport.close()
+
+	#------------------------------------------------------------------------------------------------
+	# send - transmit a message, waiting while the socket write buffer is full
+	#------------------------------------------------------------------------------------------------
+	async def send(self, msg):
+		await self.txd_protocol.writable.wait()
+		self.send_nowait([msg])
+
+	#------------------------------------------------------------------------------------------------
+	# send_nowait - transmit a list of messages without waiting. With its_conf.bundle_model the messages
+	#		are packed in as few datagrams as possible.
+	#		reason: flush reason of the messages collected by the caller (txd_stats, see collect_bundle) or None
+	#------------------------------------------------------------------------------------------------
+	def send_nowait(self, msgs, reason=None):
+		if (its_conf.bundle_model) and (reason is not None):
+			txd_stats['flush'][reason] += 1
+		if (its_conf.latency_model):
+			msgs = stamp_txd(msgs)
+		if (its_conf.unicast_model):
+			unicast, msgs = split_unicast(self.node, msgs)
+			for address, neighbour_msgs in unicast:
+				for packets in encode_bundles(neighbour_msgs, self.codec):
+					self.frag_id = send_datagram(self.sendto, address, packets, self.frag_id, self.node)
+		for address, channel_msgs in split_channels(msgs, self.address):
+			for packets in encode_bundles(channel_msgs, self.codec):
+				self.frag_id = send_datagram(self.sendto, address, packets, self.frag_id, self.node)
+
+	def __aiter__(self):
+		return self
+
+	async def __anext__(self):
+		if self.rxd_queue is None:
+			raise TypeError('received packets are delivered to a callback')
+		return await self.rxd_queue.get()
+
+
+#------------------------------------------------------------------------------------------------
+# Thread - async_multicast - runs the asyncio link layer and connects it to the geonetworking queues.
+#		Replaces the multicast_txd and multicast_rxd threads.
+#		multicast_txd_queue must be a LinkQueue to be served without a blocking thread. Any other
+#		queue is read through the default executor, in bundles collected as by multicast_txd with
+#		its_conf.bundle_model.
+#------------------------------------------------------------------------------------------------
+def async_multicast(node_interface, start_flag, coordinates, multicast_txd_queue, multicast_rxd_queue, beacon_rxd_queue):
+
+	node = node_interface['node_id']
+	while not start_flag.isSet():
+		time.sleep (1)
+	if (app_conf.debug_sys):
+		print('STATUS: Ready to start - THREAD: async_multicast - NODE: {}'.format(node),'\n')
+
+	asyncio.run(link_layer_adapter(node_interface, coordinates, multicast_txd_queue, multicast_rxd_queue, beacon_rxd_queue))
+	return
+
+async def link_layer_adapter(node_interface, coordinates, multicast_txd_queue, multicast_rxd_queue, beacon_rxd_queue):
+
+	node = node_interface['node_id']
+	deliver = lambda pkt_rxd: deliver_packet(node, pkt_rxd, multicast_rxd_queue, beacon_rxd_queue)
+	deliver_list = lambda pkts_rxd: deliver_packets(node, pkts_rxd, multicast_rxd_queue, beacon_rxd_queue)
+	impairment = create_impairment_stage(node, deliver_list)
+	if impairment is not None:
+		deliver = lambda pkt_rxd: impairment.submit([pkt_rxd])
+	# as in multicast_rxd: the MAC model delivers the packets it releases, after the impairments
+	mac = create_mac_model(node, deliver_list if impairment is None else impairment.submit)
+	link = AsyncLinkLayer(node_interface, coordinates, deliver, mac)
+	await link.open()
+	loop = asyncio.get_running_loop()
+
+	try:
+		if isinstance(multicast_txd_queue, LinkQueue):
+			writable = link.txd_protocol.writable
+			waiting = set()
+			# the queue is drained: the messages are flushed because no more are waiting
+			def send_queued():
+				if not writable.is_set():
+					# the transport write buffer is full: the queue is drained once it resumes writing. The queue
+					# is not drained meanwhile, so its wakeup stays pending and a single task waits
+					task = loop.create_task(send_writable())
+					waiting.add(task)
+					task.add_done_callback(waiting.discard)
+					return
+				msgs = multicast_txd_queue.drain()
+				if msgs:
+					link.send_nowait(msgs, 'empty')
+			async def send_writable():
+				await writable.wait()
+				send_queued()
+			multicast_txd_queue.attach(loop, send_queued)
+			send_queued()
+			await loop.create_future()
+		elif (its_conf.bundle_model):
+			while True:
+				msgs, reason = await loop.run_in_executor(None, collect_bundle, multicast_txd_queue)
+				await link.txd_protocol.writable.wait()
+				link.send_nowait(msgs, reason)
+		else:
+			while True:
+				msg = await loop.run_in_executor(None, multicast_txd_queue.get)
+				await link.send(msg)
+	finally:
+		link.close()
+	return
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# #################################################
+## CAPTURE - record of the datagrams sent and received by a node (its_conf.capture_file).
+# multicast_txd and multicast_rxd append every datagram to an append-only file, with its monotonic timestamp
+# and peer address (sender when received, destination when sent). Captures are replayed by
+# data_link/replay.py.
+#
+# File format:
+#		header - CAPTURE_MAGIC (8 bytes)
+#		records - length (4 bytes) | timestamp (8 bytes) | kind (1 byte) | IPv4 address (4 bytes) | port (2 bytes) | data
+#				  kind: CAPTURE_RXD, CAPTURE_TXD or CAPTURE_SESSION. A session record is written every time the
+#				  file is opened for capture: its data is the wall clock time of the session start (8 bytes), and
+#				  the timestamps of the following records are relative to the monotonic clock of that session.
+# Datagrams of the memory and shared memory media are not captured.
+#	usage (from the repository root): python -m data_link.capture <capture file>  - summary of a capture
+#################################################
+import sys, struct, threading, time, mmap, socket, atexit
+import ITS_options as its_conf
+
+CAPTURE_MAGIC = b'ITSCAP01'
+CAPTURE_RECORD = struct.Struct('!IdB4sH')
+CAPTURE_SESSION_DATA = struct.Struct('!d')
+
+CAPTURE_RXD = 0
+CAPTURE_TXD = 1
+CAPTURE_SESSION = 2
+
+# maximum time (seconds) a captured datagram stays in the file buffer
+CAPTURE_FLUSH_INTERVAL = 1.0
+
+# Capture file of each node of this process
+captures = {}
+lock_captures = threading.Lock()
+
+class CaptureError(Exception):
+	pass
+
+#------------------------------------------------------------------------------------------------
+# CaptureWriter - appends datagrams to a capture file. Shared by the threads of a node
+#------------------------------------------------------------------------------------------------
+class CaptureWriter:
+
+	def __init__(self, path):
+		self.lock = threading.Lock()
+		self.file = open(path, 'ab')
+		if self.file.tell() == 0:
+			self.file.write(CAPTURE_MAGIC)
+		self.flush_time = time.monotonic() + CAPTURE_FLUSH_INTERVAL
+		self.write(CAPTURE_SESSION, CAPTURE_SESSION_DATA.pack(time.time()))
+
+	def write(self, kind, data, address=None):
+		now = time.monotonic()
+		ip, port = pack_address(address)
+		with self.lock:
+			self.file.write(CAPTURE_RECORD.pack(len(data), now, kind, ip, port))
+			self.file.write(data)
+			if now >= self.flush_time:
+				self.file.flush()
+				self.flush_time = now + CAPTURE_FLUSH_INTERVAL
+
+	#------------------------------------------------------------------------------------------------
+	# sendto - sendto function that captures the datagrams sent with sendto
+	#------------------------------------------------------------------------------------------------
+	def sendto(self, sendto):
+		def captured_sendto(data, address):
+			self.write(CAPTURE_TXD, data, address)
+			return sendto(data, address)
+		return captured_sendto
+
+	def flush(self):
+		with self.lock:
+			self.file.flush()
+
+	def close(self):
+		with self.lock:
+			self.file.close()
+
+def pack_address(address):
+	if address is None:
+		return b'\0\0\0\0', 0
+	try:
+		return socket.inet_aton(address[0]), address[1]
+	except (OSError, TypeError):
+		return b'\0\0\0\0', 0
+
+#------------------------------------------------------------------------------------------------
+# open_capture - capture file of a node (its_conf.capture_file, '{node}' is replaced by the node id), or None
+#		if capture is disabled
+#------------------------------------------------------------------------------------------------
+def open_capture(node):
+	if not its_conf.capture_file:
+		return None
+	with lock_captures:
+		if node not in captures:
+			captures[node] = CaptureWriter(its_conf.capture_file.format(node=node))
+		return captures[node]
+
+# buffered datagrams are written when the node exits
+@atexit.register
+def flush_captures():
+	with lock_captures:
+		for capture in captures.values():
+			capture.flush()
+
+
+#------------------------------------------------------------------------------------------------
+# CaptureReader - memory mapped capture file. Iteration yields (timestamp, kind, address, data) per record,
+#		data being a memoryview of the file. A truncated last record (interrupted capture) is ignored.
+#------------------------------------------------------------------------------------------------
+class CaptureReader:
+
+	def __init__(self, path):
+		with open(path, 'rb') as f:
+			self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		if self.map[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+			self.map.close()
+			raise CaptureError('not a capture file: {}'.format(path))
+
+	def __iter__(self):
+		view = memoryview(self.map)
+		offset = len(CAPTURE_MAGIC)
+		while offset + CAPTURE_RECORD.size <= len(view):
+			length, timestamp, kind, ip, port = CAPTURE_RECORD.unpack_from(view, offset)
+			offset += CAPTURE_RECORD.size
+			if offset + length > len(view):
+				return
+			yield timestamp, kind, (socket.inet_ntoa(ip), port), view[offset:offset+length]
+			offset += length
+
+	def close(self):
+		try:
+			self.map.close()
+		except BufferError:
+			# records still referenced - the file is unmapped when they are released
+			pass
+
+def main(argv):
+	if len(argv) < 2:
+		print('usage: python -m data_link.capture <capture file>')
+		return
+	reader = CaptureReader(argv[1])
+	counts = {CAPTURE_RXD: 0, CAPTURE_TXD: 0, CAPTURE_SESSION: 0}
+	size = 0
+	first = last = None
+	for timestamp, kind, address, data in reader:
+		counts[kind] = counts.get(kind, 0) + 1
+		if (kind == CAPTURE_SESSION):
+			first = last = None
+		else:
+			size += len(data)
+			first = timestamp if first is None else first
+			last = timestamp
+	data = None
+	reader.close()
+	print('sessions: {}  received: {}  sent: {}  bytes: {}  last session span: {:.3f} s'.format(counts[CAPTURE_SESSION],
+		counts[CAPTURE_RXD], counts[CAPTURE_TXD], size, (last - first) if first is not None else 0))
+	return
+
+if __name__=="__main__":
+	main(sys.argv)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# #################################################
+## CHANNEL MODEL - reception probability of a packet as a function of the sender-receiver distance
+# (its_conf.channel_model = 'fading'), used by physical_layer_emulation instead of the disc model.
+#		path loss - log-distance: PL(d) = PL(d0) + 10*n*log10(d/d0), d0 = 1 m, PL(d0) = free space loss at
+#					its_conf.channel_frequency
+#		fading - 'nakagami' (integer m = its_conf.nakagami_m), 'rayleigh' (nakagami with m = 1) or 'none'
+#		link budget - tx power per sender type and sensitivity per receiver type (dBm). When a tx power is
+#					  not configured it is calibrated so that the mean received power equals the reference
+#					  sensitivity at the range of the node type in ITS_maps (rsu_range, obu_range, au_range)
+# A packet is received if the faded received power is above the receiver sensitivity. The probability is
+# precomputed per (sender type, receiver type) in tables indexed by distance, so each packet costs a table
+# lookup and one random draw. Each receiver draws from its own RNG seeded with its_conf.channel_seed and
+# its node id, so runs are reproducible.
+# receive_batch evaluates many (sender, receiver) pairs in one call, vectorized with NumPy when available.
+#################################################
+import math, random
+import ITS_maps as map
+import ITS_options as its_conf
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+SPEED_OF_LIGHT = 299792458.0
+REFERENCE_DISTANCE = 1.0
+
+# reception probability below which tables end (packets farther away are never received)
+TABLE_MIN_PROBABILITY = 1e-6
+# distance (m) at which tables end whatever the probability (e.g. path loss exponents close to 0)
+TABLE_MAX_DISTANCE = 100000.0
+
+NODE_TYPES = (map.rsu_node, map.obu_node, map.au_node)
+
+def node_range(node_type):
+	if (node_type == map.rsu_node):
+		return map.rsu_range
+	elif (node_type == map.obu_node):
+		return map.obu_range
+	return map.au_range
+
+#------------------------------------------------------------------------------------------------
+# ChannelModel - reception probability tables of every (sender type, receiver type) pair
+#		path_loss_exponent: n of the log-distance model
+#		fading: 'nakagami' | 'rayleigh' | 'none', m: nakagami shape (integer >= 1)
+#		tx_power: {node type: dBm}, types not present are calibrated from their ITS_maps range
+#		sensitivity: {node type: dBm}, types not present use reference_sensitivity
+#		resolution: distance step of the tables (m)
+#		seed: RNG seed (None: not reproducible)
+#------------------------------------------------------------------------------------------------
+class ChannelModel:
+
+	def __init__(self, path_loss_exponent=2.7, fading='nakagami', m=3, frequency=5.9e9, tx_power=None,
+				 sensitivity=None, reference_sensitivity=-85.0, resolution=1.0, seed=None):
+		if fading not in ('nakagami', 'rayleigh', 'none'):
+			raise ValueError('unknown fading model: {}'.format(fading))
+		self.exponent = path_loss_exponent
+		self.fading = fading
+		self.m = 1 if fading == 'rayleigh' else int(m)
+		if self.m < 1:
+			raise ValueError('nakagami m must be >= 1: {}'.format(m))
+		self.loss_d0 = 20*math.log10(4*math.pi*REFERENCE_DISTANCE*frequency/SPEED_OF_LIGHT)
+		self.resolution = float(resolution)
+		self.seed = seed
+		self.rngs = {}
+		# NumPy generator of receive_batch, created on the first call
+		self.batch_rng = None
+
+		tx_power = tx_power or {}
+		sensitivity = sensitivity or {}
+		self.tx_power = {}
+		self.sensitivity = {}
+		for node_type in NODE_TYPES:
+			self.tx_power[node_type] = tx_power.get(node_type, reference_sensitivity + self.path_loss(node_range(node_type)))
+			self.sensitivity[node_type] = sensitivity.get(node_type, reference_sensitivity)
+
+		self.tables = {}
+		for sender_type in NODE_TYPES:
+			for receiver_type in NODE_TYPES:
+				margin = self.tx_power[sender_type] - self.sensitivity[receiver_type]
+				self.tables[(sender_type, receiver_type)] = self.build_table(margin)
+		self.arrays = None
+
+	def path_loss(self, distance):
+		return self.loss_d0 + 10*self.exponent*math.log10(max(distance, REFERENCE_DISTANCE)/REFERENCE_DISTANCE)
+
+	#------------------------------------------------------------------------------------------------
+	# probability - reception probability at distance for a link margin (tx power - sensitivity, dB)
+	#		Nakagami-m: received power ~ Gamma(m, mean/m), P(power > sensitivity) = Q(m, m*sensitivity/mean)
+	#------------------------------------------------------------------------------------------------
+	def probability(self, margin, distance):
+		excess = margin - self.path_loss(distance)
+		if (self.fading == 'none'):
+			return 1.0 if excess >= 0 else 0.0
+		x = self.m * 10**(-excess/10)
+		term = math.exp(-x)
+		total = term
+		for k in range(1, self.m):
+			term *= x/k
+			total += term
+		return min(total, 1.0)
+
+	#------------------------------------------------------------------------------------------------
+	# build_table - probabilities at distances 0, resolution, 2*resolution... until they are negligible or the
+	#		distance reaches TABLE_MAX_DISTANCE
+	#------------------------------------------------------------------------------------------------
+	def build_table(self, margin):
+		table = []
+		for i in range(int(math.ceil(TABLE_MAX_DISTANCE/self.resolution))):
+			p = self.probability(margin, i*self.resolution)
+			if p < TABLE_MIN_PROBABILITY:
+				break
+			table.append(p)
+		return table
+
+	def reception_probability(self, sender_type, receiver_type, distance):
+		table = self.tables.get((sender_type, receiver_type), ())
+		i = int(distance/self.resolution)
+		return table[i] if i < len(table) else 0.0
+
+	#------------------------------------------------------------------------------------------------
+	# rng - random generator of a receiver, seeded with the channel seed and the node id
+	#------------------------------------------------------------------------------------------------
+	def rng(self, node):
+		rng = self.rngs.get(node)
+		if rng is None:
+			rng = random.Random(None if self.seed is None else '{}:{}'.format(self.seed, node))
+			self.rngs[node] = rng
+		return rng
+
+	def receive(self, node, sender_type, receiver_type, distance):
+		return self.rng(node).random() < self.reception_probability(sender_type, receiver_type, distance)
+
+	#------------------------------------------------------------------------------------------------
+	# receive_batch - reception of n packets in one call
+	#		senders, receivers: (x, y) positions, sender_types, receiver_types: node types (sequences of length n)
+	#		rng: numpy.random.Generator (NumPy) or random.Random (otherwise), default: a generator of the model seeded
+	#			 with the channel seed once, so successive calls continue its sequence
+	#		Returns a boolean array (NumPy) or a list of booleans
+	#------------------------------------------------------------------------------------------------
+	def receive_batch(self, senders, receivers, sender_types, receiver_types, rng=None):
+		if np is None:
+			rng = rng or self.rng('batch')
+			return [rng.random() < self.reception_probability(st, rt, math.hypot(s[0]-r[0], s[1]-r[1]))
+					for s, r, st, rt in zip(senders, receivers, sender_types, receiver_types)]
+
+		if rng is None:
+			if self.batch_rng is None:
+				self.batch_rng = np.random.default_rng(self.seed)
+			rng = self.batch_rng
+		if self.arrays is None:
+			self.arrays = self.build_arrays()
+		tables, type_index = self.arrays
+		senders = np.asarray(senders, dtype=float)
+		receivers = np.asarray(receivers, dtype=float)
+		distance = np.hypot(senders[:, 0] - receivers[:, 0], senders[:, 1] - receivers[:, 1])
+		i = np.minimum((distance/self.resolution).astype(np.int64), tables.shape[1] - 1)
+		pair = type_index[np.asarray(sender_types)] * len(NODE_TYPES) + type_index[np.asarray(receiver_types)]
+		return rng.random(len(i)) < tables[pair, i]
+
+	#------------------------------------------------------------------------------------------------
+	# build_arrays - tables as a single NumPy array [pair, distance index], padded with zeros (the last
+	#		column is always 0, for distances beyond the table), and node type -> type index
+	#------------------------------------------------------------------------------------------------
+	def build_arrays(self):
+		width = max(len(table) for table in self.tables.values()) + 1
+		tables = np.zeros((len(NODE_TYPES)**2, width))
+		for s, sender_type in enumerate(NODE_TYPES):
+			for r, receiver_type in enumerate(NODE_TYPES):
+				table = self.tables[(sender_type, receiver_type)]
+				tables[s*len(NODE_TYPES) + r, :len(table)] = table
+		type_index = np.zeros(max(NODE_TYPES) + 1, dtype=np.int64)
+		for t, node_type in enumerate(NODE_TYPES):
+			type_index[node_type] = t
+		return tables, type_index
+
+
+#------------------------------------------------------------------------------------------------
+# create_channel_model - channel model configured in ITS_options
+#------------------------------------------------------------------------------------------------
+def create_channel_model():
+	return ChannelModel(its_conf.path_loss_exponent, its_conf.fading_model, its_conf.nakagami_m,
+						its_conf.channel_frequency, its_conf.tx_power, its_conf.rx_sensitivity,
+						its_conf.reference_sensitivity, its_conf.channel_table_resolution, its_conf.channel_seed)
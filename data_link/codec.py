@@ -0,0 +1,659 @@
+#!/usr/bin/env python
+# #################################################
+## WIRE CODEC - encoding/decoding of the messages exchanged over the link layer.
+# Two formats are available:
+#		json   - original format: json text encoded in utf-8
+#		binary - versioned, schema-driven format: struct-packed fixed header plus a typed body
+# The receiver detects the format from the first byte of the datagram, so nodes using
+# different codecs can share the same channel.
+# Packets of at least its_conf.compression_min_size bytes can be compressed (its_conf.compression_model) with
+# zlib and a preset dictionary built from representative ITS messages.
+#################################################
+import struct, json, zlib
+import ITS_maps as map
+import ITS_options as its_conf
+
+#------------------------------------------------------------------------------------------------
+# CodecError - raised when a message cannot be represented in (or decoded from) the wire format
+#------------------------------------------------------------------------------------------------
+class CodecError(Exception):
+	pass
+
+# #####################################################################################################
+# Binary frame definition
+# #####################################################################################################
+# first byte of every binary frame. It is not a valid first byte of an utf-8 json text.
+WIRE_MAGIC = 0xC5
+# version of the frame layout and of the interned strings table - bump it on every change
+WIRE_VERSION = 1
+
+# fixed header - magic, version, msg_type, flags, node, node_type, msg_id, pos_x, pos_y
+HEADER = struct.Struct('!BBBBHBIdd')
+HEADER_SIZE = HEADER.size
+HEADER_FLAGS_OFFSET = 3
+
+# header flags
+FLAG_NO_MSG_ID = 0x01		# message has no msg_id field (e.g. beacons)
+FLAG_POS_INT = 0x02			# pos_x and pos_y are integers
+FLAG_EXTRAS = 0x04			# body ends with a dict holding the fields not described in the schema
+FLAG_COMPRESSED = 0x08		# body compressed with the preset dictionary (header not compressed)
+FLAG_ROUTED = 0x10			# message routed by the geonetworking layer (dest/gn_prev in the extras). Read only by
+							# routed_packet: the decoder ignores it
+
+# message types - code and body schema (fields encoded after the header, in this order)
+MSG_SCHEMAS = {
+	'BEACON': (1, ('time',)),
+	'CA': (2, ('time', 'speed', 'dir', 'heading')),
+	'DEN': (3, ('time', 'event')),
+	'SPAT': (4, ('time', 'intersection')),
+	'IVIM': (5, ('time', 'valid', 'situation')),
+}
+MSG_TYPES = {code: (msg_type, fields) for msg_type, (code, fields) in MSG_SCHEMAS.items()}
+HEADER_FIELDS = ('msg_type', 'node', 'node_type', 'msg_id', 'pos_x', 'pos_y')
+
+# value tags used in the typed body
+TAG_NONE = 0
+TAG_TRUE = 1
+TAG_FALSE = 2
+TAG_INT8 = 3
+TAG_INT32 = 4
+TAG_INT64 = 5
+TAG_FLOAT = 6
+TAG_STR = 7
+TAG_ISTR = 8
+TAG_LIST = 9
+TAG_DICT = 10
+
+INT8 = struct.Struct('!b')
+INT32 = struct.Struct('!i')
+INT64 = struct.Struct('!q')
+FLOAT = struct.Struct('!d')
+UINT16 = struct.Struct('!H')
+
+# interned strings - keys and enumerated values used by the facilities and application layers.
+# Each one is encoded with 2 bytes. The table is part of the wire format: append only and bump WIRE_VERSION.
+INTERNED = (
+	# message fields
+	'msg_type', 'node', 'node_type', 'msg_id', 'pos_x', 'pos_y', 'time', 'speed', 'dir', 'heading',
+	'event', 'intersection', 'valid', 'situation',
+	'BEACON', 'CA', 'DEN', 'SPAT', 'IVIM', 'MAP',
+	# DEN events
+	'event_id', 'event_type', 'hazard_subtype', 'status', 'severity', 'confidence', 'location',
+	'dimensions', 'timestamp', 'repetition_interval', 'max_hops', 'max_latency', 'roi_x', 'roi_y',
+	'x', 'y', 'width', 'length', 'depth',
+	'road_surface_hazard', 'vehicle_breakdown', 'weather_hazard', 'traffic_condition', 'roadworks',
+	'potholes', 'flooding', 'ice', 'debris', 'oil_spill', 'fog', 'hail', 'accident',
+	'start', 'update', 'stop',
+	# SPaT
+	'intersectionID', 'moy', 'statusFlags', 'signalGroups', 'movement', 'priorityInformation',
+	'priorityRequest', 'state', 'end', 'direction', 'pedestrian_detection',
+	'red', 'yellow', 'green', 'N', 'S', 'E', 'O', 'f', 'b',
+	# IVIM
+	'msg_sub_type', 'vehicle_information', 'type', 'roadwork_information', 'work_zone_type',
+	'work_zone_status', 'sign_type', 'sign_position', 'lane_unformation', 'lane_id', 'lane_status',
+	'lane_type', 'lane_restrictions', 'restriction_length', 'speed_limit_information',
+	'default_speed_limit', 'work_zone_speed_limit', 'applicable', 'weather_information', 'condition',
+	'visibility', 'roadSurfaceCondition', 'original_event_id', 'hazard_details', 'source_rsu',
+	'vehicle', 'road_works', 'road_sign', 'lane_condition', 'speed_limit', 'weather_condition',
+	'road_repair', 'bridge_maintenance', 'active', 'inactive', 'closed', 'open', 'merging', 'normal',
+	'none', 'merge_left', 'merge_right', 'no_overtaking', 'urban', 'highway', 'rural',
+	'rain', 'slippery', 'snow', 'dry', 'wet', 'icy', 'breakdown_vehicle', 'emergency_vehicle',
+)
+INTERNED_INDEX = {s: i for i, s in enumerate(INTERNED)}
+
+
+# #####################################################################################################
+# Codec selection
+# #####################################################################################################
+
+#------------------------------------------------------------------------------------------------
+# node_codec - codec used by a node to transmit: the 'codec' entry of the node in ITS_maps.map, if present,
+#				otherwise the default its_conf.wire_codec
+#------------------------------------------------------------------------------------------------
+def node_codec(node_id):
+	return map.map.get(node_id, {}).get('codec', its_conf.wire_codec)
+
+#------------------------------------------------------------------------------------------------
+# encode_packet - encode a message with the selected codec. Messages that the binary schema cannot
+#				represent are sent in json.
+#------------------------------------------------------------------------------------------------
+def encode_packet(msg, codec='json'):
+	pkt = None
+	if (codec == 'binary'):
+		try:
+			pkt = encode_binary(msg)
+		except CodecError:
+			pass
+	if pkt is None:
+		pkt = encode_json(msg)
+	if (its_conf.compression_model) and (len(pkt) >= its_conf.compression_min_size):
+		return compress_packet(pkt)
+	return pkt
+
+#------------------------------------------------------------------------------------------------
+# decode_packet - decode a datagram, whatever the codec used by the sender
+#------------------------------------------------------------------------------------------------
+def decode_packet(data):
+	if not data:
+		raise CodecError('empty packet')
+	if (data[0] == WIRE_MAGIC):
+		return decode_binary(data)
+	if (data[0] == COMPRESSED_MAGIC):
+		return decode_json(decompress(data[1:]))
+	return decode_json(data)
+
+
+# #####################################################################################################
+# JSON codec
+# #####################################################################################################
+def encode_json(msg):
+	return json.dumps(msg).encode('utf-8')
+
+def decode_json(data):
+	try:
+		return json.loads(str(data, 'utf-8'))
+	except ValueError as e:
+		raise CodecError('invalid json packet: {}'.format(e))
+
+
+# #####################################################################################################
+# Binary codec
+# 	The decoded message is equal to the one obtained with the json codec, i.e. json.loads(json.dumps(msg)):
+#	dict keys are converted to strings and tuples to lists.
+# #####################################################################################################
+
+#------------------------------------------------------------------------------------------------
+# encode_binary - header with the common fields (msg_type, node, node_type, msg_id, pos_x, pos_y)
+#				followed by the schema fields and, if needed, a dict with the remaining fields
+#------------------------------------------------------------------------------------------------
+def encode_binary(msg):
+	try:
+		code, fields = MSG_SCHEMAS[msg['msg_type']]
+		node = msg['node']
+		node_type = msg['node_type']
+		pos_x = msg['pos_x']
+		pos_y = msg['pos_y']
+	except (KeyError, TypeError):
+		raise CodecError('message type not supported by the binary codec')
+
+	if (type(node) is not str) or (not node.isdigit()) or (str(int(node)) != node) or (int(node) > 0xFFFF):
+		raise CodecError('node id not supported by the binary codec: {}'.format(node))
+	if (type(node_type) is not int) or not (0 <= node_type <= 0xFF):
+		raise CodecError('node type not supported by the binary codec: {}'.format(node_type))
+
+	flags = 0
+	msg_id = msg.get('msg_id')
+	if msg_id is None and 'msg_id' not in msg:
+		flags |= FLAG_NO_MSG_ID
+		msg_id = 0
+	elif (type(msg_id) is not int) or not (0 <= msg_id <= 0xFFFFFFFF):
+		raise CodecError('msg_id not supported by the binary codec: {}'.format(msg_id))
+	if (type(pos_x) is int) and (type(pos_y) is int):
+		if (abs(pos_x) > 2**53) or (abs(pos_y) > 2**53):
+			raise CodecError('position not supported by the binary codec')
+		flags |= FLAG_POS_INT
+	elif (type(pos_x) not in (int, float)) or (type(pos_y) not in (int, float)):
+		raise CodecError('position not supported by the binary codec')
+
+	body = bytearray()
+	for field in fields:
+		if field not in msg:
+			raise CodecError('missing field {} in {} message'.format(field, msg['msg_type']))
+		pack_value(body, msg[field])
+	n_header = len(HEADER_FIELDS) - 1 if (flags & FLAG_NO_MSG_ID) else len(HEADER_FIELDS)
+	if (len(msg) > n_header + len(fields)):
+		extras = {k: v for k, v in msg.items() if (k not in HEADER_FIELDS) and (k not in fields)}
+		if extras:
+			flags |= FLAG_EXTRAS
+			pack_value(body, extras)
+			if ('dest' in extras) or ('gn_prev' in extras):
+				flags |= FLAG_ROUTED
+
+	header = HEADER.pack(WIRE_MAGIC, WIRE_VERSION, code, flags, int(node), node_type, msg_id, pos_x, pos_y)
+	return header + body
+
+#------------------------------------------------------------------------------------------------
+# peek_header - fields of the fixed header of a binary packet (msg_type, node, node_type, msg_id, pos_x, pos_y),
+#				without decoding the body
+#------------------------------------------------------------------------------------------------
+def peek_header(data):
+	try:
+		magic, version, code, flags, node, node_type, msg_id, pos_x, pos_y = HEADER.unpack_from(data, 0)
+	except struct.error:
+		raise CodecError('truncated binary header')
+	if (magic != WIRE_MAGIC) or (version != WIRE_VERSION):
+		raise CodecError('unsupported binary frame version: {}'.format(version))
+	if code not in MSG_TYPES:
+		raise CodecError('unknown message type code: {}'.format(code))
+
+	if (flags & FLAG_POS_INT):
+		pos_x = int(pos_x)
+		pos_y = int(pos_y)
+	header = {'msg_type': MSG_TYPES[code][0], 'node': str(node), 'node_type': node_type}
+	if not (flags & FLAG_NO_MSG_ID):
+		header['msg_id'] = msg_id
+	header['pos_x'] = pos_x
+	header['pos_y'] = pos_y
+	return header
+
+#------------------------------------------------------------------------------------------------
+# read_packet - header of a received packet and the data still to be decoded.
+#				Binary packets: (header fields, packet). Json packets are decoded at once: (message, None). The json
+#				format is kept as sent by the original nodes (no header prefix), so its header fields can not be
+#				read without parsing the text
+#------------------------------------------------------------------------------------------------
+def read_packet(data):
+	if not data:
+		raise CodecError('empty packet')
+	if (data[0] == WIRE_MAGIC):
+		return peek_header(data), data
+	if (data[0] == COMPRESSED_MAGIC):
+		header = decode_json(decompress(data[1:]))
+	else:
+		header = decode_json(data)
+	if not isinstance(header, dict):
+		raise CodecError('invalid json packet: not an object')
+	# size of the packet on the wire, taken back by packet_size
+	header['rxd_size'] = len(data)
+	return header, None
+
+#------------------------------------------------------------------------------------------------
+# packet_size - size (bytes) on the wire of a packet returned by read_packet, default if not known (messages not
+#				serialized, e.g. by the memory medium). Removes the size kept in the header of json packets
+#------------------------------------------------------------------------------------------------
+def packet_size(header, data, default):
+	if data is None:
+		return header.pop('rxd_size', default)
+	return len(data)
+
+#------------------------------------------------------------------------------------------------
+# routed_packet - True if a packet returned by read_packet carries a message routed by the geonetworking layer
+#				(addressed to a node, or forwarded), without decoding the body
+#------------------------------------------------------------------------------------------------
+def routed_packet(header, data):
+	if data is None:
+		return ('dest' in header) or ('gn_prev' in header)
+	return bool(data[HEADER_FLAGS_OFFSET] & FLAG_ROUTED)
+
+#------------------------------------------------------------------------------------------------
+# open_packet - complete message of a packet returned by read_packet
+#------------------------------------------------------------------------------------------------
+def open_packet(header, data):
+	if data is None:
+		return header
+	return decode_binary(data, header)
+
+#------------------------------------------------------------------------------------------------
+# decode_binary - inverse of encode_binary. header: result of peek_header(data), if already available
+#------------------------------------------------------------------------------------------------
+def decode_binary(data, header=None):
+	if header is None:
+		header = peek_header(data)
+	msg = dict(header)
+	fields = MSG_SCHEMAS[msg['msg_type']][1]
+	flags = data[HEADER_FLAGS_OFFSET]
+	if (flags & FLAG_COMPRESSED):
+		data = bytes(data[:HEADER_SIZE]) + decompress(data[HEADER_SIZE:])
+
+	# packets with the layout of a packet already decoded are read with one unpack_from
+	key = (msg['msg_type'], flags, len(data))
+	layouts = body_layouts.get(key, ())
+	for layout in layouts:
+		try:
+			body = layout.read(data)
+		except (IndexError, UnicodeDecodeError):
+			raise CodecError('truncated binary body')
+		if body is not None:
+			msg.update(body)
+			return msg
+
+	try:
+		offset = HEADER_SIZE
+		for field in fields:
+			msg[field], offset = unpack_value(data, offset)
+		if (flags & FLAG_EXTRAS):
+			extras, offset = unpack_value(data, offset)
+			msg.update(extras)
+	except (struct.error, IndexError, UnicodeDecodeError):
+		raise CodecError('truncated binary body')
+	if (offset != len(data)):
+		raise CodecError('trailing bytes in binary frame')
+	if len(data) <= LAYOUT_MAX_SIZE:
+		add_layout(key, BodyLayout(data, fields, flags & FLAG_EXTRAS))
+	return msg
+
+
+# #####################################################################################################
+# Body layouts
+#	The tags, dict keys, container and string sizes of the packets of a message type rarely change: the body
+#	of a decoded packet is compiled to a layout that reads the packets with the same constant bytes at once:
+#		struct - unpack_from format of the values (the constant bytes are padding)
+#		mask, expected - the constant bytes of the packet, compared as a single integer
+#		build - function that returns the body fields from the unpacked values
+#	Null and boolean values are read from their tag. Up to LAYOUT_VARIANTS layouts are kept per (msg_type, flags,
+#	packet size) in body_layouts: the oldest is replaced by the layout of a packet that none of them could read.
+#	Compiling a layout costs tens of decodes: packets whose layout changes all the time are slower than json
+# #####################################################################################################
+# packets larger than LAYOUT_MAX_SIZE bytes, or nested deeper than LAYOUT_MAX_DEPTH, are not compiled
+LAYOUT_MAX_SIZE = 2048
+LAYOUT_MAX_DEPTH = 32
+# body_layouts is cleared when it holds LAYOUT_CACHE_SIZE keys
+LAYOUT_CACHE_SIZE = 256
+LAYOUT_VARIANTS = 4
+
+body_layouts = {}
+
+# struct format of the fixed size values
+LAYOUT_FORMATS = {TAG_INT8: 'b', TAG_INT32: 'i', TAG_INT64: 'q', TAG_FLOAT: 'd'}
+# values of the tags without data
+LAYOUT_CONSTANTS = {TAG_NONE: None, TAG_TRUE: True, TAG_FALSE: False}
+
+def add_layout(key, layout):
+	if layout.build is None:
+		return
+	if len(body_layouts) >= LAYOUT_CACHE_SIZE:
+		body_layouts.clear()
+	layouts = body_layouts.setdefault(key, [])
+	if len(layouts) >= LAYOUT_VARIANTS:
+		del layouts[0]
+	layouts.append(layout)
+
+class BodyLayout:
+
+	__slots__ = ('struct', 'mask', 'expected', 'build', 'count')
+
+	def __init__(self, data, fields, extras):
+		self.build = None
+		# values unpacked
+		self.count = 0
+		mask = bytearray(len(data))
+		formats = []
+		try:
+			offset = HEADER_SIZE
+			items = []
+			for field in fields:
+				expression, offset = self.compile_value(data, offset, mask, formats, 0)
+				items.append('{!r}: {}'.format(field, expression))
+			if extras:
+				expression, offset = self.compile_value(data, offset, mask, formats, 0)
+				items.append('**' + expression)
+		except CodecError:
+			return
+		self.struct = struct.Struct('!' + ''.join(formats))
+		self.mask = int.from_bytes(mask, 'big')
+		self.expected = int.from_bytes(data, 'big') & self.mask
+		self.build = eval('lambda v: {' + ', '.join(items) + '}', {'I': INTERNED, 'C': LAYOUT_CONSTANTS})
+
+	#------------------------------------------------------------------------------------------------
+	# read - body fields of a packet, or None if its constant bytes differ from the ones of the layout
+	#------------------------------------------------------------------------------------------------
+	def read(self, data):
+		if (int.from_bytes(data, 'big') & self.mask) != self.expected:
+			return None
+		try:
+			return self.build(self.struct.unpack_from(data, HEADER_SIZE))
+		except KeyError:
+			# a value of another type in place of a null or boolean
+			return None
+
+	#------------------------------------------------------------------------------------------------
+	# compile_value - expression of the tagged value at offset, from the values unpacked with formats (v). The
+	#		constant bytes are set in mask. Returns the expression and the next offset
+	#------------------------------------------------------------------------------------------------
+	def compile_value(self, data, offset, mask, formats, depth):
+		if depth > LAYOUT_MAX_DEPTH:
+			raise CodecError('binary body too deep')
+		tag = data[offset]
+		if tag in LAYOUT_CONSTANTS:
+			return 'C[{}]'.format(self.value(formats, 'B')), offset + 1
+		self.constant(mask, formats, offset, 1)
+		offset += 1
+		if tag == TAG_ISTR:
+			return 'I[{}]'.format(self.value(formats, 'B')), offset + 1
+		elif tag == TAG_STR:
+			size = UINT16.unpack_from(data, offset)[0]
+			self.constant(mask, formats, offset, 2)
+			return "str({}, 'utf-8')".format(self.value(formats, '{}s'.format(size))), offset + 2 + size
+		elif tag in LAYOUT_FORMATS:
+			return self.value(formats, LAYOUT_FORMATS[tag]), offset + struct.calcsize('!' + LAYOUT_FORMATS[tag])
+		size = UINT16.unpack_from(data, offset)[0]
+		self.constant(mask, formats, offset, 2)
+		offset += 2
+		items = []
+		for i in range(size):
+			if tag == TAG_DICT:
+				# keys are constant
+				key, next_offset = unpack_value(data, offset)
+				self.constant(mask, formats, offset, next_offset - offset)
+				value, offset = self.compile_value(data, next_offset, mask, formats, depth + 1)
+				items.append('{!r}: {}'.format(key, value))
+			else:
+				value, offset = self.compile_value(data, offset, mask, formats, depth + 1)
+				items.append(value)
+		return ('{{{}}}' if tag == TAG_DICT else '[{}]').format(', '.join(items)), offset
+
+	# expression of the next unpacked value, read with format
+	def value(self, formats, format):
+		formats.append(format)
+		self.count += 1
+		return 'v[{}]'.format(self.count - 1)
+
+	# size constant bytes at offset, skipped by the struct format
+	def constant(self, mask, formats, offset, size):
+		mask[offset:offset+size] = b'\xff' * size
+		formats.append('{}x'.format(size))
+
+
+# #####################################################################################################
+# Compression
+# #####################################################################################################
+# first byte of a compressed json packet, followed by the compressed json text
+COMPRESSED_MAGIC = 0xD5
+# maximum size of a decompressed packet
+MAX_DECOMPRESSED_SIZE = 1 << 20
+# raw deflate with a 4 KB window (the dictionary plus a packet) and a small hash table: priming a compressor
+# for each packet is cheap
+COMPRESSION_LEVEL = 6
+COMPRESSION_WBITS = -12
+COMPRESSION_MEMLEVEL = 4
+
+# representative messages the preset dictionary is built from. The dictionary is part of the wire format:
+# bump WIRE_VERSION on every change.
+COMPRESSION_SAMPLES = (
+	{'msg_type': 'DEN', 'node': '5', 'node_type': 2, 'msg_id': 1, 'pos_x': 0, 'pos_y': 0, 'time': 0.0,
+	 'event': {'msg_type': 'DEN', 'event_id': '', 'event_type': 'road_surface_hazard', 'hazard_subtype': 'potholes',
+		'status': 'start', 'severity': 3, 'confidence': 0.8, 'location': {'x': 0.0, 'y': 0.0},
+		'dimensions': {'width': 0.5, 'length': 1.2, 'depth': 0.1}, 'node': '5', 'timestamp': 0.0,
+		'repetition_interval': 3, 'max_hops': 8, 'max_latency': 10000}},
+	{'msg_type': 'IVIM', 'node': '4', 'node_type': 1, 'msg_id': 1, 'pos_x': 0, 'pos_y': 0, 'time': 0.0, 'valid': 100,
+	 'situation': {'msg_sub_type': 'road_works',
+		'roadwork_information': {'work_zone_type': 'road_repair', 'work_zone_status': 'active'},
+		'lane_unformation': {'lane_id': 1, 'lane_status': 'closed', 'lane_type': 'normal', 'lane_restrictions': 'merge_left'},
+		'speed_limit_information': {'default_speed_limit': 50, 'work_zone_speed_limit': 30, 'applicable': True},
+		'weather_information': {'condition': 'rain', 'visibility': 'normal', 'roadSurfaceCondition': 'wet'},
+		'original_event_id': '', 'hazard_details': {'type': 'potholes', 'severity': 3, 'confidence': 0.8,
+			'location': {'x': 0.0, 'y': 0.0}, 'dimensions': {'width': 0.5, 'length': 1.2, 'depth': 0.1}},
+		'timestamp': 0.0, 'source_rsu': '4'}},
+	{'msg_type': 'SPAT', 'node': '4', 'node_type': 1, 'msg_id': 1, 'pos_x': 0, 'pos_y': 0, 'time': 0.0,
+	 'intersection': {'intersectionID': '4', 'moy': 0, 'statusFlags': 'active',
+		'signalGroups': {1: {'state': 'red', 'start': 0, 'end': 1}, 2: {'state': 'green', 'start': 0, 'end': 1},
+			3: {'state': 'yellow', 'start': 0, 'end': 1}, 4: {'state': 'red', 'start': 0, 'end': 1}},
+		'movement': {1: {'direction': 'E', 'pedestrian_detection': True}, 2: {'direction': 'O', 'pedestrian_detection': True},
+			3: {'direction': 'N', 'pedestrian_detection': False}, 4: {'direction': 'S', 'pedestrian_detection': False}},
+		'priorityInformation': {'priorityRequest': False}}},
+)
+
+# preset dictionary and compressor/decompressor primed with it - created on first use
+compression_state = None
+
+#------------------------------------------------------------------------------------------------
+# compression_dictionary - json text and binary bodies of the samples (most useful content last)
+#------------------------------------------------------------------------------------------------
+def compression_dictionary():
+	parts = [encode_json(msg) for msg in COMPRESSION_SAMPLES]
+	parts += [encode_binary(msg)[HEADER_SIZE:] for msg in COMPRESSION_SAMPLES]
+	return b''.join(parts)
+
+def get_compression_state():
+	global compression_state
+	if compression_state is None:
+		zdict = compression_dictionary()
+		compression_state = (zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, COMPRESSION_WBITS, COMPRESSION_MEMLEVEL, zdict=zdict),
+							 zlib.decompressobj(COMPRESSION_WBITS, zdict=zdict))
+	return compression_state
+
+def compress(data):
+	compressor = get_compression_state()[0].copy()
+	return compressor.compress(data) + compressor.flush()
+
+def decompress(data):
+	decompressor = get_compression_state()[1].copy()
+	try:
+		out = decompressor.decompress(data, MAX_DECOMPRESSED_SIZE)
+	except zlib.error as e:
+		raise CodecError('invalid compressed packet: {}'.format(e))
+	if decompressor.unconsumed_tail or not decompressor.eof:
+		raise CodecError('invalid compressed packet')
+	return out
+
+#------------------------------------------------------------------------------------------------
+# compress_packet - compressed version of an encoded packet, or the packet itself when compression does
+#				not reduce its size. Binary packets keep the header uncompressed (FLAG_COMPRESSED is set)
+#------------------------------------------------------------------------------------------------
+def compress_packet(pkt):
+	if (pkt[0] == WIRE_MAGIC):
+		if (pkt[HEADER_FLAGS_OFFSET] & FLAG_COMPRESSED):
+			return pkt
+		compressed = bytearray(pkt[:HEADER_SIZE])
+		compressed[HEADER_FLAGS_OFFSET] |= FLAG_COMPRESSED
+		compressed += compress(pkt[HEADER_SIZE:])
+	elif (pkt[0] == COMPRESSED_MAGIC):
+		return pkt
+	else:
+		compressed = bytearray((COMPRESSED_MAGIC,))
+		compressed += compress(pkt)
+	return bytes(compressed) if len(compressed) < len(pkt) else pkt
+
+
+#------------------------------------------------------------------------------------------------
+# pack_value - append a tagged value to the buffer out
+#------------------------------------------------------------------------------------------------
+def pack_value(out, value):
+	t = type(value)
+	if t is str:
+		pack_str(out, value)
+	elif value is None:
+		out.append(TAG_NONE)
+	elif t is bool:
+		out.append(TAG_TRUE if value else TAG_FALSE)
+	elif t is int:
+		if -128 <= value < 128:
+			out.append(TAG_INT8)
+			out += INT8.pack(value)
+		elif -2**31 <= value < 2**31:
+			out.append(TAG_INT32)
+			out += INT32.pack(value)
+		elif -2**63 <= value < 2**63:
+			out.append(TAG_INT64)
+			out += INT64.pack(value)
+		else:
+			raise CodecError('integer out of range: {}'.format(value))
+	elif t is float:
+		out.append(TAG_FLOAT)
+		out += FLOAT.pack(value)
+	elif t is dict:
+		if len(value) > 0xFFFF:
+			raise CodecError('dict too large')
+		out.append(TAG_DICT)
+		out += UINT16.pack(len(value))
+		for k, v in value.items():
+			pack_str(out, json_key(k))
+			pack_value(out, v)
+	elif (t is list) or (t is tuple):
+		if len(value) > 0xFFFF:
+			raise CodecError('list too large')
+		out.append(TAG_LIST)
+		out += UINT16.pack(len(value))
+		for v in value:
+			pack_value(out, v)
+	else:
+		raise CodecError('type not supported by the binary codec: {}'.format(t.__name__))
+
+def pack_str(out, value):
+	index = INTERNED_INDEX.get(value)
+	if index is not None:
+		out.append(TAG_ISTR)
+		out.append(index)
+		return
+	raw = value.encode('utf-8')
+	if len(raw) > 0xFFFF:
+		raise CodecError('string too large')
+	out.append(TAG_STR)
+	out += UINT16.pack(len(raw))
+	out += raw
+
+#------------------------------------------------------------------------------------------------
+# json_key - dict keys are converted to strings as json.dumps does
+#------------------------------------------------------------------------------------------------
+def json_key(key):
+	if type(key) is str:
+		return key
+	if key is True:
+		return 'true'
+	if key is False:
+		return 'false'
+	if key is None:
+		return 'null'
+	if type(key) is int:
+		return int.__repr__(key)
+	if type(key) is float:
+		return json.dumps(key)
+	raise CodecError('dict key not supported: {}'.format(key))
+
+#------------------------------------------------------------------------------------------------
+# unpack_value - read the tagged value starting at offset. Returns the value and the next offset.
+#------------------------------------------------------------------------------------------------
+def unpack_value(data, offset):
+	tag = data[offset]
+	offset += 1
+	if tag == TAG_ISTR:
+		return INTERNED[data[offset]], offset + 1
+	elif tag == TAG_STR:
+		size = UINT16.unpack_from(data, offset)[0]
+		offset += 2
+		if offset + size > len(data):
+			raise IndexError('string out of frame')
+		return str(data[offset:offset+size], 'utf-8'), offset + size
+	elif tag == TAG_INT8:
+		return INT8.unpack_from(data, offset)[0], offset + 1
+	elif tag == TAG_INT32:
+		return INT32.unpack_from(data, offset)[0], offset + 4
+	elif tag == TAG_FLOAT:
+		return FLOAT.unpack_from(data, offset)[0], offset + 8
+	elif tag == TAG_DICT:
+		size = UINT16.unpack_from(data, offset)[0]
+		offset += 2
+		value = {}
+		for i in range(size):
+			key, offset = unpack_value(data, offset)
+			if type(key) is not str:
+				raise CodecError('invalid dict key')
+			value[key], offset = unpack_value(data, offset)
+		return value, offset
+	elif tag == TAG_LIST:
+		size = UINT16.unpack_from(data, offset)[0]
+		offset += 2
+		value = []
+		for i in range(size):
+			item, offset = unpack_value(data, offset)
+			value.append(item)
+		return value, offset
+	elif tag == TAG_NONE:
+		return None, offset
+	elif tag == TAG_TRUE:
+		return True, offset
+	elif tag == TAG_FALSE:
+		return False, offset
+	elif tag == TAG_INT64:
+		return INT64.unpack_from(data, offset)[0], offset + 8
+	raise CodecError('unknown value tag: {}'.format(tag))
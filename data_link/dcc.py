@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# #################################################
+## DECENTRALIZED CONGESTION CONTROL (DCC) - reactive rate control of the transmitted packets (ETSI TS 102 687 style)
+# The dcc_gate thread sits between geonetwork_txd/beacon_txd and multicast_txd (its_conf.dcc_model = True):
+#		- multicast_rxd measures the channel busy ratio (CBR): air time of the packets heard over each
+#		  its_conf.dcc_probe_interval, averaged with the previous interval
+#		- the CBR selects the DCC state: 'relaxed', 'active' or 'restrictive' (its_conf.dcc_thresholds)
+#		- each traffic class has a token bucket whose rate depends on the state (its_conf.dcc_rates).
+#		  Packets without a token wait in the queue of their class (its_conf.dcc_queue_size packets, at most
+#		  its_conf.dcc_queue_lifetime seconds) or are dropped (its_conf.dcc_queue_size = 0)
+# Traffic classes (its_conf.dcc_classes): 0 - highest priority ... 3 - lowest priority
+#################################################
+import threading, time
+from collections import deque
+from Queue import Empty
+import application.app_config as app_conf
+import ITS_options as its_conf
+
+DCC_STATES = ('relaxed', 'active', 'restrictive')
+DCC_CLASSES = 4
+
+# preamble and header of an ITS-G5 frame (seconds)
+FRAME_OVERHEAD = 40e-6
+
+# Channel probe and DCC gate of each node of this process
+channel_probes = {}
+dcc_gates = {}
+lock_dcc = threading.Lock()
+
+#------------------------------------------------------------------------------------------------
+# ChannelProbe - channel busy ratio measured from the packets heard by a node
+#------------------------------------------------------------------------------------------------
+class ChannelProbe:
+
+	def __init__(self, interval, data_rate):
+		self.interval = interval
+		self.data_rate = data_rate
+		self.lock = threading.Lock()
+		self.busy = 0.0
+		self.start = time.time()
+		self.last_cbr = 0.0
+		self.cbr = 0.0
+
+	#------------------------------------------------------------------------------------------------
+	# heard - a packet of size bytes was received
+	#------------------------------------------------------------------------------------------------
+	def heard(self, size):
+		with self.lock:
+			self.busy += FRAME_OVERHEAD + size*8/self.data_rate
+
+	#------------------------------------------------------------------------------------------------
+	# update - closes the measurement interval if it is over. Returns the current CBR
+	#------------------------------------------------------------------------------------------------
+	def update(self, now=None):
+		if now is None:
+			now = time.time()
+		with self.lock:
+			elapsed = now - self.start
+			if elapsed >= self.interval:
+				cbr = min(self.busy/elapsed, 1.0)
+				self.cbr = (self.last_cbr + cbr)/2
+				self.last_cbr = cbr
+				self.busy = 0.0
+				self.start = now
+			return self.cbr
+
+def get_channel_probe(node):
+	with lock_dcc:
+		if node not in channel_probes:
+			channel_probes[node] = ChannelProbe(its_conf.dcc_probe_interval, its_conf.dcc_data_rate)
+		return channel_probes[node]
+
+#------------------------------------------------------------------------------------------------
+# TokenBucket - rate: tokens per second, burst: maximum tokens
+#------------------------------------------------------------------------------------------------
+class TokenBucket:
+
+	def __init__(self, rate, burst, now):
+		self.rate = rate
+		self.burst = burst
+		self.tokens = burst
+		self.time = now
+
+	def refill(self, now):
+		self.tokens = min(self.burst, self.tokens + (now - self.time)*self.rate)
+		self.time = now
+
+	def take(self, now):
+		self.refill(now)
+		if self.tokens >= 1:
+			self.tokens -= 1
+			return True
+		return False
+
+	#------------------------------------------------------------------------------------------------
+	# wait_time - seconds until a token is available
+	#------------------------------------------------------------------------------------------------
+	def wait_time(self, now):
+		self.refill(now)
+		if self.tokens >= 1:
+			return 0.0
+		if self.rate <= 0:
+			return None
+		return (1 - self.tokens)/self.rate
+
+#------------------------------------------------------------------------------------------------
+# DccGate - DCC state and per class token buckets and queues of a node
+#		status: state - current DCC state, cbr - last CBR
+#				forwarded, queued, dropped - packets per traffic class (dropped: queue full or lifetime expired)
+#------------------------------------------------------------------------------------------------
+class DccGate:
+
+	def __init__(self, probe, now=None):
+		if now is None:
+			now = time.time()
+		self.probe = probe
+		self.state = DCC_STATES[0]
+		self.buckets = [TokenBucket(its_conf.dcc_rates[self.state][c], its_conf.dcc_burst[c], now) for c in range(DCC_CLASSES)]
+		self.queues = [deque() for c in range(DCC_CLASSES)]
+		self.status = {'state': self.state, 'cbr': 0.0, 'forwarded': [0]*DCC_CLASSES, 'queued': [0]*DCC_CLASSES,
+					   'dropped': [0]*DCC_CLASSES}
+
+	#------------------------------------------------------------------------------------------------
+	# update_state - DCC state of the current CBR. Token rates follow the state
+	#------------------------------------------------------------------------------------------------
+	def update_state(self, now):
+		cbr = self.probe.update(now)
+		state = DCC_STATES[0]
+		for threshold, next_state in zip(its_conf.dcc_thresholds, DCC_STATES[1:]):
+			if cbr >= threshold:
+				state = next_state
+		if state != self.state:
+			for c, bucket in enumerate(self.buckets):
+				bucket.refill(now)
+				bucket.rate = its_conf.dcc_rates[state][c]
+			self.state = state
+		self.status['state'] = state
+		self.status['cbr'] = cbr
+
+	#------------------------------------------------------------------------------------------------
+	# submit - packet from the upper layers. Returns the packets that can be transmitted now
+	#------------------------------------------------------------------------------------------------
+	def submit(self, msg, now):
+		c = traffic_class(msg)
+		if not self.queues[c] and self.buckets[c].take(now):
+			self.status['forwarded'][c] += 1
+			return [msg]
+		if len(self.queues[c]) >= its_conf.dcc_queue_size:
+			self.status['dropped'][c] += 1
+			return []
+		self.queues[c].append((now, msg))
+		self.status['queued'][c] += 1
+		return []
+
+	#------------------------------------------------------------------------------------------------
+	# release - queued packets that got a token, highest priority class first
+	#------------------------------------------------------------------------------------------------
+	def release(self, now):
+		released = []
+		for c, queue in enumerate(self.queues):
+			while queue and (now - queue[0][0] > its_conf.dcc_queue_lifetime):
+				queue.popleft()
+				self.status['dropped'][c] += 1
+			while queue and self.buckets[c].take(now):
+				released.append(queue.popleft()[1])
+				self.status['forwarded'][c] += 1
+		return released
+
+	#------------------------------------------------------------------------------------------------
+	# wait_time - seconds until a queued packet can be released (None if no packet is queued)
+	#------------------------------------------------------------------------------------------------
+	def wait_time(self, now):
+		waits = [self.buckets[c].wait_time(now) for c, queue in enumerate(self.queues) if queue]
+		waits = [w for w in waits if w is not None]
+		return min(waits) if waits else None
+
+def traffic_class(msg):
+	return its_conf.dcc_classes.get(msg.get('msg_type'), DCC_CLASSES - 1)
+
+
+#------------------------------------------------------------------------------------------------
+# Thread - dcc_gate - rate control of the packets sent by geonetwork_txd and beacon_txd to multicast_txd
+#------------------------------------------------------------------------------------------------
+def dcc_gate(node_interface, start_flag, dcc_txd_queue, multicast_txd_queue):
+
+	node = node_interface['node_id']
+	while not start_flag.isSet():
+		time.sleep (1)
+	if (app_conf.debug_sys):
+		print('STATUS: Ready to start - THREAD: dcc_gate - NODE: {}'.format(node),'\n')
+
+	gate = DccGate(get_channel_probe(node))
+	with lock_dcc:
+		dcc_gates[node] = gate
+	state_time = time.time() + its_conf.dcc_probe_interval
+
+	while True :
+		now = time.time()
+		timeout = state_time - now
+		wait = gate.wait_time(now)
+		if wait is not None:
+			timeout = min(timeout, wait)
+		try:
+			msg = dcc_txd_queue.get(timeout=max(timeout, 0))
+		except Empty:
+			msg = None
+
+		now = time.time()
+		if now >= state_time:
+			state = gate.state
+			gate.update_state(now)
+			state_time = now + its_conf.dcc_probe_interval
+			if (app_conf.debug_multicast) and (gate.state != state):
+				print('STATUS: DCC state {} (CBR {:.2f}) - THREAD: dcc_gate - NODE: {}'.format(gate.state, gate.status['cbr'], node),'\n')
+		released = gate.release(now)
+		if msg is not None:
+			released.extend(gate.submit(msg, now))
+		for msg in released:
+			multicast_txd_queue.put(msg)
+	return
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# #################################################
+## DUPLICATE PACKET DETECTION - packets already received from the same node, with the same type and msg_id,
+# are discarded. Only the packet header is needed (node, msg_type, msg_id).
+# msg_id is the sequence number of the messages of each type sent by a node, so each source (node, msg_type)
+# keeps a sliding window of the last DUPLICATE_WINDOW sequence numbers: the highest msg_id received and a bitmap
+# of the msg_ids received below it. Memory is O(sources), whatever the number of messages received.
+# A msg_id older than the window is stale: it is discarded like a duplicate (a late or reordered copy), unless the
+# source restarted its msg_ids, i.e. the msg_id is more than half the msg_id space (32 bits) behind, or
+# DUPLICATE_RESTART msg_ids in a row were stale: the window then starts again from it.
+# Sources are evicted after ttl seconds without packets, and the least recently heard first when there are more
+# than max_sources.
+#		duplicate_stats: duplicates discarded at each layer ('link': accept_packet, 'geonetworking': geonetwork_rxd)
+#################################################
+import time
+from collections import OrderedDict
+
+# sequence numbers remembered per source
+DUPLICATE_WINDOW = 1024
+
+# msg_ids are 32-bit sequence numbers (binary codec): a msg_id more than DUPLICATE_RESTART_GAP behind the window
+# restarts it, as do DUPLICATE_RESTART stale msg_ids in a row
+DUPLICATE_RESTART_GAP = 1 << 31
+DUPLICATE_RESTART = 3
+
+duplicate_stats = {'link': 0, 'geonetworking': 0}
+
+#------------------------------------------------------------------------------------------------
+# DuplicateFilter - sliding windows of the recently heard sources, kept for ttl seconds and bounded to
+#		max_sources (the least recently heard sources are removed first)
+#		stats: duplicates - packets detected as duplicates, stale - packets older than the window (discarded),
+#		       restarts - windows started again (source restarted), evicted - sources removed (ttl or max_sources)
+#------------------------------------------------------------------------------------------------
+class DuplicateFilter:
+
+	def __init__(self, max_sources=4096, ttl=10.0, window=DUPLICATE_WINDOW, layer='link'):
+		self.max_sources = max_sources
+		self.ttl = ttl
+		self.window = window
+		self.mask = (1 << window) - 1
+		self.layer = layer
+		# (node, msg_type): [highest msg_id, bitmap (bit i: highest - i received), expiry time, stale msg_ids in a row]
+		self.sources = OrderedDict()
+		self.stats = {'duplicates': 0, 'stale': 0, 'restarts': 0, 'evicted': 0}
+
+	#------------------------------------------------------------------------------------------------
+	# is_duplicate - True if the packet was already received. Packets without an integer msg_id are never
+	#		duplicates.
+	#------------------------------------------------------------------------------------------------
+	def is_duplicate(self, header, now=None):
+		seq = header.get('msg_id')
+		if not isinstance(seq, int):
+			return False
+		if now is None:
+			now = time.time()
+		sources = self.sources
+		while sources and (next(iter(sources.values()))[2] <= now):
+			sources.popitem(last=False)
+			self.stats['evicted'] += 1
+		key = (header['node'], header['msg_type'])
+		source = sources.get(key)
+		if source is None:
+			sources[key] = [seq, 1, now + self.ttl, 0]
+			if len(sources) > self.max_sources:
+				sources.popitem(last=False)
+				self.stats['evicted'] += 1
+			return False
+		sources.move_to_end(key)
+		source[2] = now + self.ttl
+		offset = source[0] - seq
+		if offset < 0:
+			# newer than the window: the window slides
+			source[0] = seq
+			source[1] = ((source[1] << -offset) | 1) & self.mask if -offset < self.window else 1
+			source[3] = 0
+			return False
+		if offset >= self.window:
+			source[3] += 1
+			if (offset > DUPLICATE_RESTART_GAP) or (source[3] >= DUPLICATE_RESTART):
+				source[0] = seq
+				source[1] = 1
+				source[3] = 0
+				self.stats['restarts'] += 1
+				return False
+			self.stats['stale'] += 1
+			duplicate_stats[self.layer] += 1
+			return True
+		source[3] = 0
+		bit = 1 << offset
+		if source[1] & bit:
+			self.stats['duplicates'] += 1
+			duplicate_stats[self.layer] += 1
+			return True
+		source[1] |= bit
+		return False
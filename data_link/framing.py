@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# #################################################
+## LINK LAYER FRAMING - several encoded packets carried in a single datagram (bundle) and
+# datagrams larger than the receive buffer carried in several fragments.
+# A datagram is either a single packet (json or binary, see data_link/codec.py) or a bundle:
+#		magic (1 byte) | number of packets (1 byte) | [packet length (2 bytes) | packet] * number of packets
+# A datagram larger than MSG_SIZE is sent as a sequence of fragments:
+#		magic (1 byte) | fragmented datagram id (4 bytes) | fragment index (1 byte) | number of fragments (1 byte) | data
+#################################################
+import struct, time
+from collections import OrderedDict
+
+#------------------------------------------------------------------------------------------------
+# FramingError - raised when a datagram is not a valid frame
+#------------------------------------------------------------------------------------------------
+class FramingError(Exception):
+	pass
+
+# first byte of a bundle. It is neither a binary codec frame nor a valid first byte of an utf-8 json text.
+BUNDLE_MAGIC = 0xB5
+BUNDLE_HEADER = struct.Struct('!BB')
+BUNDLE_ENTRY = struct.Struct('!H')
+# maximum number of packets in a bundle
+BUNDLE_MAX_PACKETS = 0xFF
+
+#------------------------------------------------------------------------------------------------
+# bundle_size - size of a bundle carrying packets with a total size of data_size bytes
+#------------------------------------------------------------------------------------------------
+def bundle_size(n_packets, data_size):
+	return BUNDLE_HEADER.size + n_packets*BUNDLE_ENTRY.size + data_size
+
+#------------------------------------------------------------------------------------------------
+# pack_bundle - build a datagram with the encoded packets. A single packet is sent without bundle header.
+#------------------------------------------------------------------------------------------------
+def pack_bundle(packets):
+	if len(packets) == 1:
+		return packets[0]
+	if len(packets) > BUNDLE_MAX_PACKETS:
+		raise FramingError('too many packets in bundle: {}'.format(len(packets)))
+	frame = bytearray(BUNDLE_HEADER.pack(BUNDLE_MAGIC, len(packets)))
+	for pkt in packets:
+		frame += BUNDLE_ENTRY.pack(len(pkt))
+		frame += pkt
+	return bytes(frame)
+
+#------------------------------------------------------------------------------------------------
+# group_packets - split a list of encoded packets in bundles of at most max_size bytes, keeping their order
+#------------------------------------------------------------------------------------------------
+def group_packets(packets, max_size):
+	bundles = []
+	current = []
+	data_size = 0
+	for pkt in packets:
+		if current and ((len(current) == BUNDLE_MAX_PACKETS) or (bundle_size(len(current)+1, data_size+len(pkt)) > max_size)):
+			bundles.append(current)
+			current = []
+			data_size = 0
+		current.append(pkt)
+		data_size += len(pkt)
+	if current:
+		bundles.append(current)
+	return bundles
+
+#------------------------------------------------------------------------------------------------
+# split_datagram - list of the encoded packets carried in a received datagram
+#------------------------------------------------------------------------------------------------
+def split_datagram(data):
+	if not data or data[0] != BUNDLE_MAGIC:
+		return [data]
+	if len(data) < BUNDLE_HEADER.size:
+		raise FramingError('truncated bundle header')
+	count = data[1]
+	offset = BUNDLE_HEADER.size
+	packets = []
+	for i in range(count):
+		if offset + BUNDLE_ENTRY.size > len(data):
+			raise FramingError('truncated bundle')
+		size = BUNDLE_ENTRY.unpack_from(data, offset)[0]
+		offset += BUNDLE_ENTRY.size
+		if offset + size > len(data):
+			raise FramingError('truncated bundle')
+		packets.append(data[offset:offset+size])
+		offset += size
+	return packets
+
+
+# first byte of a fragment
+FRAGMENT_MAGIC = 0xF5
+FRAGMENT_HEADER = struct.Struct('!BIBB')
+# maximum number of fragments of a datagram
+FRAGMENT_MAX_COUNT = 0xFF
+
+#------------------------------------------------------------------------------------------------
+# fragment_datagram - split a datagram in fragments of max_size bytes (header included).
+#			frag_id identifies the datagram among the ones fragmented by the same sender.
+#------------------------------------------------------------------------------------------------
+def fragment_datagram(datagram, frag_id, max_size):
+	chunk = max_size - FRAGMENT_HEADER.size
+	count = (len(datagram) + chunk - 1) // chunk
+	if count > FRAGMENT_MAX_COUNT:
+		raise FramingError('datagram too large to fragment: {} bytes'.format(len(datagram)))
+	frag_id &= 0xFFFFFFFF
+	return [FRAGMENT_HEADER.pack(FRAGMENT_MAGIC, frag_id, index, count) + datagram[index*chunk:(index+1)*chunk]
+		for index in range(count)]
+
+#------------------------------------------------------------------------------------------------
+# ReassemblyTable - fragments received, waiting for the remaining fragments of the same datagram.
+#		Entries are keyed by (sender address, fragmented datagram id). Memory is bounded by max_entries and
+#		max_bytes: when exceeded, the oldest reassemblies are evicted. Reassemblies not completed within
+#		timeout seconds after the first fragment are evicted as well.
+#		stats: completed - datagrams reassembled
+#			   timeout - incomplete reassemblies evicted after timeout
+#			   overflow - incomplete reassemblies evicted to respect the memory bounds
+#			   duplicates - fragments received twice
+#			   invalid - fragments with an invalid header
+#------------------------------------------------------------------------------------------------
+class ReassemblyTable:
+
+	def __init__(self, max_entries=64, max_bytes=1048576, timeout=1.0):
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self.timeout = timeout
+		self.entries = OrderedDict()
+		self.size = 0
+		self.stats = {'completed': 0, 'timeout': 0, 'overflow': 0, 'duplicates': 0, 'invalid': 0}
+
+	#------------------------------------------------------------------------------------------------
+	# add - store a fragment received from sender. Returns the datagram when all its fragments were received,
+	#		otherwise None
+	#------------------------------------------------------------------------------------------------
+	def add(self, sender, frame, now=None):
+		if now is None:
+			now = time.time()
+		self.expire(now)
+		if len(frame) < FRAGMENT_HEADER.size:
+			self.stats['invalid'] += 1
+			return None
+		magic, frag_id, index, count = FRAGMENT_HEADER.unpack_from(frame, 0)
+		if (magic != FRAGMENT_MAGIC) or (index >= count):
+			self.stats['invalid'] += 1
+			return None
+
+		key = (sender, frag_id)
+		entry = self.entries.get(key)
+		if entry is None:
+			entry = {'deadline': now + self.timeout, 'parts': [None]*count, 'received': 0, 'size': 0}
+			self.entries[key] = entry
+		elif len(entry['parts']) != count:
+			self.stats['invalid'] += 1
+			return None
+		if entry['parts'][index] is not None:
+			self.stats['duplicates'] += 1
+			return None
+
+		data = bytes(frame[FRAGMENT_HEADER.size:])
+		entry['parts'][index] = data
+		entry['received'] += 1
+		entry['size'] += len(data)
+		self.size += len(data)
+		if entry['received'] == count:
+			del self.entries[key]
+			self.size -= entry['size']
+			self.stats['completed'] += 1
+			return b''.join(entry['parts'])
+
+		while (len(self.entries) > self.max_entries) or (self.size > self.max_bytes):
+			self.evict('overflow')
+		return None
+
+	#------------------------------------------------------------------------------------------------
+	# expire - evict the reassemblies whose timeout expired. Entries are kept by arrival order of the first
+	#		fragment, so only the expired entries are visited.
+	#------------------------------------------------------------------------------------------------
+	def expire(self, now=None):
+		if now is None:
+			now = time.time()
+		while self.entries and (next(iter(self.entries.values()))['deadline'] <= now):
+			self.evict('timeout')
+
+	def evict(self, reason):
+		key, entry = self.entries.popitem(last=False)
+		self.size -= entry['size']
+		self.stats[reason] += 1
+
+	#------------------------------------------------------------------------------------------------
+	# pending - number of incomplete reassemblies
+	#------------------------------------------------------------------------------------------------
+	def pending(self):
+		return len(self.entries)
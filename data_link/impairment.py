@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# #################################################
+## IMPAIRMENT - network impairments applied to the packets received by a node (its_conf.impairment_model),
+# between multicast_rxd and multicast_rxd_queue/beacon_rxd_queue:
+#		loss - 'bernoulli': each packet is lost with probability loss
+#		       'gilbert': Gilbert-Elliott two state chain - the link moves good->bad with probability p_gb and
+#		                  bad->good with probability p_bg on every packet, and a packet is lost with probability
+#		                  loss_good or loss_bad of the current state
+#		delay - base delay (seconds) drawn from a distribution: 'constant' (delay), 'uniform' (delay..delay_max),
+#		        'normal' (mean delay, sigma delay_sigma), 'exponential' (mean delay), 'pareto' (scale delay,
+#		        shape delay_shape: heavy tail), plus jitter uniform in [0, jitter]
+#		duplicate - probability of delivering the packet twice (the copy gets its own delay)
+#		reorder - probability of holding the packet for reorder_delay more seconds, so the following packets
+#		          overtake it
+# Settings are global (its_conf.impairment) and can be replaced per link (its_conf.impairment_links, key
+# (sender node, receiver node)). Each link draws from its own RNG seeded with its_conf.impairment_seed, so runs
+# are reproducible. Delayed packets are kept in a timer heap served by one thread per node.
+# Packets sent by the node itself (multicast loopback) are not impaired.
+#################################################
+import heapq, random, threading, time
+import ITS_options as its_conf
+
+# Impairment stage of each node of this process (statistics in impairment_stages[node].stats)
+impairment_stages = {}
+
+#------------------------------------------------------------------------------------------------
+# LinkImpairment - impairments of the packets received from a sender
+#------------------------------------------------------------------------------------------------
+class LinkImpairment:
+
+	def __init__(self, settings, seed=None):
+		self.loss_model = settings.get('loss_model', 'bernoulli')
+		if self.loss_model not in ('bernoulli', 'gilbert'):
+			raise ValueError('unknown loss model: {}'.format(self.loss_model))
+		self.delay_model = settings.get('delay_model', 'constant')
+		if self.delay_model not in ('constant', 'uniform', 'normal', 'exponential', 'pareto'):
+			raise ValueError('unknown delay model: {}'.format(self.delay_model))
+		self.settings = settings
+		self.rng = random.Random(seed)
+		self.bad = False
+
+	def lost(self):
+		s = self.settings
+		if (self.loss_model == 'bernoulli'):
+			return self.rng.random() < s.get('loss', 0.0)
+		if self.bad:
+			self.bad = self.rng.random() >= s.get('p_bg', 0.0)
+		else:
+			self.bad = self.rng.random() < s.get('p_gb', 0.0)
+		return self.rng.random() < (s.get('loss_bad', 1.0) if self.bad else s.get('loss_good', 0.0))
+
+	def delay(self):
+		s = self.settings
+		rng = self.rng
+		delay = s.get('delay', 0.0)
+		if (self.delay_model == 'uniform'):
+			delay = rng.uniform(delay, s.get('delay_max', delay))
+		elif (self.delay_model == 'normal'):
+			delay = rng.gauss(delay, s.get('delay_sigma', 0.0))
+		elif (self.delay_model == 'exponential'):
+			delay = rng.expovariate(1.0 / delay) if delay > 0 else 0.0
+		elif (self.delay_model == 'pareto'):
+			delay = delay * rng.paretovariate(s.get('delay_shape', 2.0))
+		if s.get('jitter'):
+			delay += rng.uniform(0, s['jitter'])
+		if s.get('reorder') and rng.random() < s['reorder']:
+			delay += s.get('reorder_delay', 0.01)
+		return max(delay, 0.0)
+
+	#------------------------------------------------------------------------------------------------
+	# delays - delivery delay of each copy of a packet: [] if lost, two delays if duplicated
+	#------------------------------------------------------------------------------------------------
+	def delays(self):
+		if self.lost():
+			return []
+		delays = [self.delay()]
+		if self.settings.get('duplicate') and self.rng.random() < self.settings['duplicate']:
+			delays.append(self.delay())
+		return delays
+
+#------------------------------------------------------------------------------------------------
+# ImpairmentStage - impairments of a receiver. Packets submitted are delivered by deliver(packets) when due,
+#		from the stage thread (delayed packets) or from the caller (packets without delay, if none is waiting).
+#		stats: received, lost, duplicated, delivered, delay_sum, delay_max (seconds)
+#------------------------------------------------------------------------------------------------
+class ImpairmentStage:
+
+	def __init__(self, node, deliver, settings=None, links=None, seed=None):
+		self.node = node
+		self.deliver = deliver
+		self.settings = its_conf.impairment if settings is None else settings
+		self.link_settings = its_conf.impairment_links if links is None else links
+		self.seed = its_conf.impairment_seed if seed is None else seed
+		self.links = {}
+		self.heap = []
+		self.sequence = 0
+		self.condition = threading.Condition()
+		self.stats = {'received': 0, 'lost': 0, 'duplicated': 0, 'delivered': 0, 'delay_sum': 0.0, 'delay_max': 0.0}
+		threading.Thread(target=self.run, daemon=True).start()
+
+	def link(self, sender):
+		link = self.links.get(sender)
+		if link is None:
+			settings = self.link_settings.get((sender, self.node), self.settings)
+			link = LinkImpairment(settings, None if self.seed is None else '{}:{}:{}'.format(self.seed, sender, self.node))
+			self.links[sender] = link
+		return link
+
+	def submit(self, pkts_rxd):
+		now = time.monotonic()
+		ready = []
+		with self.condition:
+			earliest = self.heap[0][0] if self.heap else None
+			for pkt_rxd in pkts_rxd:
+				if (pkt_rxd['node'] == self.node):
+					ready.append(pkt_rxd)
+					continue
+				self.stats['received'] += 1
+				delays = self.link(pkt_rxd['node']).delays()
+				if not delays:
+					self.stats['lost'] += 1
+				elif len(delays) > 1:
+					self.stats['duplicated'] += 1
+				for copy, delay in enumerate(delays):
+					if copy:
+						pkt_rxd = dict(pkt_rxd)
+					self.stats['delay_sum'] += delay
+					if delay > self.stats['delay_max']:
+						self.stats['delay_max'] = delay
+					if (delay == 0) and not self.heap:
+						ready.append(pkt_rxd)
+					else:
+						heapq.heappush(self.heap, (now + delay, self.sequence, pkt_rxd))
+						self.sequence += 1
+			self.stats['delivered'] += len(ready)
+			# the stage thread sleeps until the earliest packet is due
+			if self.heap and ((earliest is None) or (self.heap[0][0] < earliest)):
+				self.condition.notify()
+		if ready:
+			self.deliver(ready)
+
+	#------------------------------------------------------------------------------------------------
+	# run - delivers the packets of the heap when due, together if due at the same time
+	#------------------------------------------------------------------------------------------------
+	def run(self):
+		while True:
+			with self.condition:
+				while True:
+					now = time.monotonic()
+					if self.heap and (self.heap[0][0] <= now):
+						break
+					self.condition.wait(self.heap[0][0] - now if self.heap else None)
+				due = []
+				while self.heap and (self.heap[0][0] <= now):
+					due.append(heapq.heappop(self.heap)[2])
+				self.stats['delivered'] += len(due)
+			self.deliver(due)
+
+#------------------------------------------------------------------------------------------------
+# create_impairment_stage - impairment stage of a node delivering with deliver(packets), or None if
+#		its_conf.impairment_model is off
+#------------------------------------------------------------------------------------------------
+def create_impairment_stage(node, deliver):
+	if not its_conf.impairment_model:
+		return None
+	impairment_stages[node] = ImpairmentStage(node, deliver)
+	return impairment_stages[node]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# #################################################
+## LATENCY - one-way latency breakdown of the received messages (its_conf.latency_model).
+# Every message carries the time it was created by the facilities layer ('time'). With latency_model:
+#		multicast_txd adds 'txd_time' - wall clock time when the message is handed to the socket
+#		multicast_rxd adds 'rxd_time' - kernel receive timestamp of the datagram (SO_TIMESTAMPNS). Without
+#		                                kernel timestamps (asyncio link layer, other systems), the time the
+#		                                datagram was read from the socket
+# and the application takes the messages from services_rxd_queue, a LatencyQueue that records:
+#		'send_to_socket' - txd_time - time: queueing and processing in the layers of the sender
+#		'socket_to_socket' - rxd_time - txd_time: network (the clocks of the nodes must be synchronized)
+#		'socket_to_application' - application get - rxd_time: queueing and processing in the layers of the receiver
+# in a log scale histogram per message type and stage, queried at runtime with latency_summary().
+# Only the multicast medium is stamped: the memory medium shares the messages between the receivers.
+#################################################
+import socket, struct, threading, time
+from Queue import Queue
+import ITS_options as its_conf
+
+LATENCY_STAGES = ('send_to_socket', 'socket_to_socket', 'socket_to_application')
+
+# Linux values, not exported by the socket module of every Python version
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+SCM_TIMESTAMPNS = SO_TIMESTAMPNS
+TIMESPEC = struct.Struct('@ll')
+
+# Histograms of each message type
+latency_histograms = {}
+lock_latency = threading.Lock()
+
+#------------------------------------------------------------------------------------------------
+# LatencyHistogram - latencies in log2 buckets: bucket i counts the latencies in [2^(i-1), 2^i) microseconds
+#		(bucket 0: below 1 microsecond). Negative latencies (clock offset between nodes) are counted apart.
+#------------------------------------------------------------------------------------------------
+class LatencyHistogram:
+
+	BUCKETS = 32
+
+	def __init__(self):
+		self.buckets = [0] * self.BUCKETS
+		self.count = 0
+		self.negative = 0
+		self.sum = 0.0
+		self.max = 0.0
+
+	def add(self, latency):
+		if latency < 0:
+			self.negative += 1
+			return
+		us = int(latency * 1e6)
+		self.buckets[min(us.bit_length(), self.BUCKETS - 1)] += 1
+		self.count += 1
+		self.sum += latency
+		if latency > self.max:
+			self.max = latency
+
+	#------------------------------------------------------------------------------------------------
+	# percentile - upper bound (seconds) of the bucket holding the p-th percentile (0 < p <= 100)
+	#------------------------------------------------------------------------------------------------
+	def percentile(self, p):
+		if self.count == 0:
+			return 0.0
+		rank = p / 100.0 * self.count
+		seen = 0
+		for i, n in enumerate(self.buckets):
+			seen += n
+			if seen >= rank:
+				return min((1 << i) / 1e6, self.max)
+		return self.max
+
+	def summary(self):
+		return {'count': self.count, 'negative': self.negative, 'mean': self.sum / self.count if self.count else 0.0,
+				'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99), 'max': self.max}
+
+#------------------------------------------------------------------------------------------------
+# record_latency - adds the latency breakdown of a received message, taken by the application at time now
+#------------------------------------------------------------------------------------------------
+def record_latency(msg, now=None):
+	if 'rxd_time' not in msg:
+		return
+	now = time.time() if now is None else now
+	stamps = (msg.get('time'), msg.get('txd_time'), msg['rxd_time'], now)
+	with lock_latency:
+		histograms = latency_histograms.get(msg.get('msg_type'))
+		if histograms is None:
+			histograms = latency_histograms[msg.get('msg_type')] = {stage: LatencyHistogram() for stage in LATENCY_STAGES}
+		for stage, begin, end in zip(LATENCY_STAGES, stamps, stamps[1:]):
+			if (begin is not None) and (end is not None):
+				histograms[stage].add(end - begin)
+
+#------------------------------------------------------------------------------------------------
+# latency_summary - {msg_type: {stage: {count, negative, mean, p50, p90, p99, max}}}, latencies in seconds.
+#		msg_type: only the summary of this message type
+#------------------------------------------------------------------------------------------------
+def latency_summary(msg_type=None):
+	with lock_latency:
+		return {t: {stage: h.summary() for stage, h in histograms.items()}
+				for t, histograms in latency_histograms.items() if msg_type in (None, t)}
+
+def reset_latency():
+	with lock_latency:
+		latency_histograms.clear()
+
+#------------------------------------------------------------------------------------------------
+# stamp_txd - copies of the messages with the send instant (the messages may still be referenced by the sender)
+#------------------------------------------------------------------------------------------------
+def stamp_txd(msgs):
+	now = time.time()
+	return [dict(msg, txd_time=now) for msg in msgs]
+
+#------------------------------------------------------------------------------------------------
+# enable_timestamps - asks the kernel to timestamp the datagrams received by the socket. Returns False if
+#		not supported
+#------------------------------------------------------------------------------------------------
+def enable_timestamps(r):
+	try:
+		r.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+	except OSError:
+		return False
+	return True
+
+#------------------------------------------------------------------------------------------------
+# recv_timestamped - recvfrom returning (data, sender, rxd_time), rxd_time being the kernel timestamp of the
+#		datagram if the socket has timestamps enabled, or the current time
+#------------------------------------------------------------------------------------------------
+def recv_timestamped(r, size, flags=0):
+	data, ancdata, msg_flags, sender = r.recvmsg(size, socket.CMSG_SPACE(TIMESPEC.size), flags)
+	return data, sender, kernel_timestamp(ancdata)
+
+#------------------------------------------------------------------------------------------------
+# recv_timestamped_into - recvfrom_into returning (size, sender, rxd_time)
+#------------------------------------------------------------------------------------------------
+def recv_timestamped_into(r, buffer, flags=0):
+	size, ancdata, msg_flags, sender = r.recvmsg_into([buffer], socket.CMSG_SPACE(TIMESPEC.size), flags)
+	return size, sender, kernel_timestamp(ancdata)
+
+def kernel_timestamp(ancdata):
+	for level, kind, cmsg_data in ancdata:
+		if (level == socket.SOL_SOCKET) and (kind == SCM_TIMESTAMPNS) and len(cmsg_data) >= TIMESPEC.size:
+			sec, nsec = TIMESPEC.unpack_from(cmsg_data)
+			return sec + nsec / 1e9
+	return time.time()
+
+#------------------------------------------------------------------------------------------------
+# LatencyQueue - services_rxd_queue recording the latency breakdown of the messages taken by the application
+#------------------------------------------------------------------------------------------------
+class LatencyQueue(Queue):
+
+	def _get(self):
+		msg = Queue._get(self)
+		if isinstance(msg, dict):
+			record_latency(msg)
+		return msg
+
+#------------------------------------------------------------------------------------------------
+# create_services_queue - services_rxd_queue of the configured latency model
+#------------------------------------------------------------------------------------------------
+def create_services_queue():
+	if (its_conf.latency_model):
+		return LatencyQueue()
+	return Queue()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# #################################################
+## MAC MODEL - CSMA/CA contention and collisions of the emulated medium (its_conf.mac_model), evaluated by each
+# receiver on the frames it hears:
+#		airtime - each frame occupies the channel mac_preamble + (size + MAC_OVERHEAD)*8/mac_data_rate seconds
+#		interference - frames from senders closer than mac_interference_factor * sender range are heard, even if
+#		               too weak to be received (physical_layer_emulation)
+#		carrier sense - when a frame overlaps a frame on air from a sender in carrier sense range
+#		                (mac_carrier_sense_factor * sender range of the two senders), its sender would have deferred:
+#		                the frame is moved after the frame on air plus AIFS and a random backoff of 0..mac_cw slots.
+#		                Frames starting in the same slot collide
+#		hidden terminals - overlapping frames of senders out of carrier sense range of each other collide
+# A frame is delivered at the end of its airtime, if it did not collide. It is held until no frame that could overlap
+# it can still be heard: frames are released when a frame stamped MAC_HORIZON seconds after their end is heard
+# (receive timestamps, so a receiver running late does not release frames before the frames stamped after them) or,
+# when nothing was heard for MAC_HORIZON seconds, by a ticker thread shared by the nodes of the process (every
+# mac_tick s). A frame heard after the frames it overlaps were released is not tested against them: collisions are
+# never counted on released frames.
+# Frames sent by the node itself are not affected. Backoffs are drawn from an RNG seeded with its_conf.mac_seed.
+#		stats: frames (heard), collisions (frames lost), hidden (collisions between hidden terminals),
+#		       deferred (frames moved by carrier sense), expired (frames deferred more than MAC_MAX_DEFER, lost),
+#		       busy_time (s) - utilization() = busy time/elapsed time
+#################################################
+import random, threading, time
+from collections import deque
+import ITS_options as its_conf
+
+# MAC header, LLC and FCS (bytes)
+MAC_OVERHEAD = 36
+
+# frames heard out of order by less than MAC_HORIZON seconds are still tested against each other
+MAC_HORIZON = 0.01
+
+# frames deferred more than MAC_MAX_DEFER seconds are dropped by their sender (saturated channel)
+MAC_MAX_DEFER = 0.1
+
+# MAC model of each node of this process
+mac_models = {}
+lock_mac_models = threading.Lock()
+
+class Frame:
+
+	__slots__ = ('sender', 'x', 'y', 'cs_range', 'start', 'end', 'collided', 'pkt', 'complete', 'released')
+
+	def __init__(self, sender, x, y, cs_range, start, end):
+		self.sender = sender
+		self.x = x
+		self.y = y
+		self.cs_range = cs_range
+		self.start = start
+		self.end = end
+		self.collided = False
+		self.pkt = None
+		self.complete = False
+		self.released = False
+
+#------------------------------------------------------------------------------------------------
+# MacModel - frames heard by a receiver. deliver(packets) is called with the packets received without collision
+#------------------------------------------------------------------------------------------------
+class MacModel:
+
+	def __init__(self, node, deliver, seed=None):
+		self.node = node
+		self.deliver = deliver
+		seed = its_conf.mac_seed if seed is None else seed
+		self.rng = random.Random(None if seed is None else '{}:{}'.format(seed, node))
+		self.lock = threading.Lock()
+		self.frames = deque()
+		self.sender_end = {}
+		self.busy_until = 0.0
+		# longest airtime heard: frames that started longer before a frame can not overlap it
+		self.max_airtime = 0.0
+		self.begin = time.time()
+		# latest receive timestamp heard, and wall clock time it was heard
+		self.heard = 0.0
+		self.heard_at = 0.0
+		# frames pending release by the ticker (set with the lock held)
+		self.ticking = False
+		# packets released by transmission(), delivered by flush() or by the ticker
+		self.ready = []
+		self.stats = {'frames': 0, 'collisions': 0, 'hidden': 0, 'deferred': 0, 'expired': 0, 'busy_time': 0.0}
+
+	#------------------------------------------------------------------------------------------------
+	# transmission - a frame of size bytes heard from a sender at (x, y) with the given range. Returns the frame,
+	#		to be completed with its packet (None if the packet is not received), or None if it does not interfere.
+	#		The packets of the frames released meanwhile are delivered by flush(), once per batch of frames heard
+	#		now: time the frame was received (wall clock). Receive timestamps are used so that the frames queued
+	#		     while the receiver thread was not running are not seen as overlapping
+	#------------------------------------------------------------------------------------------------
+	def transmission(self, sender, x, y, sender_range, size, distance, now=None):
+		if distance > its_conf.mac_interference_factor * sender_range:
+			return None
+		heard_at = time.time()
+		if now is None:
+			now = heard_at
+		with self.lock:
+			heard = self.heard
+			if now > heard:
+				self.heard = heard = now
+			self.heard_at = heard_at
+			frames = self.frames
+			if frames and (frames[0].end <= heard - MAC_HORIZON):
+				self.pop_ended(heard, self.ready)
+			stats = self.stats
+			stats['frames'] += 1
+			# a sender transmits its frames one after the other
+			start = self.sender_end.get(sender, now)
+			if now > start:
+				start = now
+			duration = its_conf.mac_preamble + (size + MAC_OVERHEAD) * 8.0 / its_conf.mac_data_rate
+			if duration > self.max_airtime:
+				self.max_airtime = duration
+			end = start + duration
+			frame = Frame(sender, x, y, its_conf.mac_carrier_sense_factor * sender_range, start, end)
+			busy_until = self.busy_until
+			# the frames heard end before busy_until: the frames on air are searched only if the channel is busy
+			if busy_until > start:
+				start, end = self.contend(frame, start, end)
+				frame.start = start
+				frame.end = end
+			if start - now > MAC_MAX_DEFER:
+				self.collide(frame)
+				stats['expired'] += 1
+			else:
+				self.sender_end[sender] = end
+			if end > busy_until:
+				stats['busy_time'] += end - (start if start > busy_until else busy_until)
+				self.busy_until = end
+			frames.append(frame)
+			tick = not self.ticking
+			self.ticking = True
+		if tick:
+			ticker.add(self)
+		return frame
+
+	#------------------------------------------------------------------------------------------------
+	# flush - delivers the packets released while the last frames were heard (called by the receiver after each batch)
+	#------------------------------------------------------------------------------------------------
+	def flush(self):
+		if self.ready:
+			with self.lock:
+				delivered = self.ready
+				self.ready = []
+			if delivered:
+				self.deliver(delivered)
+
+	#------------------------------------------------------------------------------------------------
+	# contend - start and end of frame after carrier sense, against the frames on air from start (called with the
+	#		lock held). Collisions are set on the frames
+	#------------------------------------------------------------------------------------------------
+	def contend(self, frame, start, end):
+		sender = frame.sender
+		x = frame.x
+		y = frame.y
+		max_airtime = self.max_airtime
+		limit = start - max_airtime
+		# newest frames first: a deferred frame starts after the last frame on air
+		for other in reversed(self.frames):
+			if other.end <= start:
+				if other.start < limit:
+					break
+				continue
+			if (other.sender == sender) or (other.start >= end):
+				continue
+			cs_range = other.cs_range if other.cs_range < frame.cs_range else frame.cs_range
+			dx = other.x - x
+			dy = other.y - y
+			if dx*dx + dy*dy > cs_range*cs_range:
+				# hidden terminals
+				self.collide(other)
+				self.collide(frame)
+				self.stats['hidden'] += 1
+			elif abs(other.start - start) < its_conf.mac_slot:
+				self.collide(other)
+				self.collide(frame)
+			else:
+				backoff = its_conf.mac_aifs + int(self.rng.random() * (its_conf.mac_cw + 1)) * its_conf.mac_slot
+				end = other.end + backoff + (end - start)
+				start = other.end + backoff
+				limit = start - max_airtime
+				self.stats['deferred'] += 1
+				# deferred after the end of every frame heard: no other frame can overlap it
+				if start >= self.busy_until:
+					break
+		return start, end
+
+	def collide(self, frame):
+		if not (frame.collided or frame.released):
+			frame.collided = True
+			self.stats['collisions'] += 1
+
+	#------------------------------------------------------------------------------------------------
+	# complete - packet of a frame (None: not received), delivered after the end of the frame airtime when a later
+	#		frame is heard or by the ticker
+	#------------------------------------------------------------------------------------------------
+	def complete(self, frame, pkt_rxd):
+		frame.pkt = pkt_rxd
+		frame.complete = True
+
+	#------------------------------------------------------------------------------------------------
+	# release - delivers the packets of the frames whose airtime ended, once nothing was heard for MAC_HORIZON
+	#		seconds (the receiver releases the frames itself while it hears frames), and the packets not flushed by
+	#		the receiver. Returns True while frames are pending
+	#------------------------------------------------------------------------------------------------
+	def release(self):
+		now = time.time()
+		if now - self.heard_at < MAC_HORIZON:
+			return True
+		with self.lock:
+			delivered = self.ready
+			self.ready = []
+			self.pop_ended(max(now, self.heard), delivered)
+			pending = bool(self.frames)
+		if delivered:
+			self.deliver(delivered)
+		return pending
+
+	# appends to delivered the packets of the frames ended MAC_HORIZON seconds before time now, without collision
+	# (called with the lock held)
+	def pop_ended(self, now, delivered):
+		frames = self.frames
+		until = now - MAC_HORIZON
+		while frames and frames[0].complete and (frames[0].end <= until):
+			frame = frames.popleft()
+			frame.released = True
+			if (frame.pkt is not None) and not frame.collided:
+				delivered.append(frame.pkt)
+
+	def utilization(self):
+		elapsed = time.time() - self.begin
+		return min(self.stats['busy_time'] / elapsed, 1.0) if elapsed > 0 else 0.0
+
+#------------------------------------------------------------------------------------------------
+# MacTicker - releases the frames of the MAC models with frames pending, every its_conf.mac_tick seconds
+#------------------------------------------------------------------------------------------------
+class MacTicker:
+
+	def __init__(self):
+		self.condition = threading.Condition()
+		self.pending = set()
+		self.thread = None
+
+	def add(self, mac):
+		with self.condition:
+			self.pending.add(mac)
+			if self.thread is None:
+				self.thread = threading.Thread(target=self.run, daemon=True)
+				self.thread.start()
+			self.condition.notify()
+
+	def run(self):
+		while True:
+			with self.condition:
+				while not self.pending:
+					self.condition.wait()
+				macs = list(self.pending)
+			time.sleep(its_conf.mac_tick)
+			idle = [mac for mac in macs if not mac.release()]
+			with self.condition:
+				# frames heard after the release keep the model pending. ticking is cleared with the model lock held,
+				# so a frame heard meanwhile either is seen here or adds the model again
+				for mac in idle:
+					with mac.lock:
+						if not (mac.frames or mac.ready):
+							mac.ticking = False
+							self.pending.discard(mac)
+
+ticker = MacTicker()
+
+#------------------------------------------------------------------------------------------------
+# create_mac_model - MAC model of a node delivering with deliver(packets), or None if its_conf.mac_model is off
+#------------------------------------------------------------------------------------------------
+def create_mac_model(node, deliver):
+	if not its_conf.mac_model:
+		return None
+	with lock_mac_models:
+		mac_models[node] = MacModel(node, deliver)
+		return mac_models[node]
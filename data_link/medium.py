@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# #################################################
+## TRANSMISSION MEDIUM - interface used by multicast_txd/multicast_rxd to reach the other nodes.
+# A medium provides, for each node:
+#		open_txd(node_interface) - transmitter with send(msgs): broadcast a list of messages in one transmission
+#		open_rxd(node_interface) - receiver with receive(): blocks until a transmission is received and returns
+#								   a (header, packet data) pair for each message it carried (and of the
+#								   transmissions already waiting). The message is decoded from the packet data
+#								   only if accepted (read_packet/open_packet in data_link/codec.py). Media that do
+#								   not serialize return (message, None), and the transmission time of each message
+#								   in the receiver attribute rxd_times.
+# Physical layer emulation and delivery to the upper layers are done by multicast_rxd, whatever the medium.
+# Available media (its_conf.medium_model):
+#		'multicast' - IPv4 multicast over UDP (UdpMedium, data_link/multicast.py)
+#		'memory' - in-process broadcast bus (MemoryBus): nodes running in the same interpreter receive
+#				   a reference to the transmitted messages, without serialization
+#################################################
+import threading, copy, time
+from queue import SimpleQueue, Empty
+
+# maximum number of transmissions returned by one receive() of the memory bus
+MEMORY_RXD_BATCH = 64
+
+class Medium:
+
+	def open_txd(self, node_interface):
+		raise NotImplementedError
+
+	def open_rxd(self, node_interface):
+		raise NotImplementedError
+
+
+#------------------------------------------------------------------------------------------------
+# MemoryBus - broadcast bus shared by the nodes of the same process.
+#		A transmission is a fan-out of the message list reference to the inbox of every attached receiver,
+#		the sender included (as with multicast loopback).
+#		Messages are shared by all the receivers and must be handled as read-only: a layer that changes a
+#		received message changes a copy (e.g. geonetwork_rxd when forwarding). With copy=True each receiver gets its
+#		own deep copy (slower, but safe for applications that change received messages).
+#		stats: transmissions - number of send() calls
+#			   deliveries - number of (transmission, receiver) pairs
+#------------------------------------------------------------------------------------------------
+class MemoryBus(Medium):
+
+	def __init__(self, copy=False):
+		self.copy = copy
+		self.lock = threading.Lock()
+		# tuple replaced on every attach/detach, so transmitters iterate over it without locking
+		self.inboxes = ()
+		self.stats = {'transmissions': 0, 'deliveries': 0}
+
+	def open_txd(self, node_interface):
+		return MemoryBusTxd(self)
+
+	def open_rxd(self, node_interface):
+		# only put/get are used: the C queue costs a fraction of Queue with a transmission per receiver
+		inbox = SimpleQueue()
+		with self.lock:
+			self.inboxes = self.inboxes + (inbox,)
+		return MemoryBusRxd(self, inbox)
+
+	def detach(self, inbox):
+		with self.lock:
+			self.inboxes = tuple(i for i in self.inboxes if i is not inbox)
+
+	def transmit(self, msgs):
+		inboxes = self.inboxes
+		now = time.time()
+		# the (message, None) pairs returned by receive() and their times are built once and shared
+		packets = [(msg, None) for msg in msgs]
+		rxd_times = [now] * len(msgs)
+		for inbox in inboxes:
+			inbox.put(([(msg, None) for msg in copy.deepcopy(msgs)] if self.copy else packets, rxd_times))
+		self.stats['transmissions'] += 1
+		self.stats['deliveries'] += len(inboxes)
+
+class MemoryBusTxd:
+
+	def __init__(self, bus):
+		self.bus = bus
+
+	def send(self, msgs):
+		self.bus.transmit(msgs)
+
+class MemoryBusRxd:
+
+	def __init__(self, bus, inbox):
+		self.bus = bus
+		self.inbox = inbox
+		# time of the transmission of each message returned by the last receive()
+		self.rxd_times = []
+
+	#------------------------------------------------------------------------------------------------
+	# receive - messages of the next transmission and of the transmissions already waiting (a receiver running late
+	#		catches up with one wake-up)
+	#------------------------------------------------------------------------------------------------
+	def receive(self):
+		packets, self.rxd_times = self.inbox.get()
+		for i in range(MEMORY_RXD_BATCH - 1):
+			try:
+				more, rxd_times = self.inbox.get_nowait()
+			except Empty:
+				break
+			# the lists of the first transmission are shared with the other receivers
+			packets = packets + more
+			self.rxd_times = self.rxd_times + rxd_times
+		return packets
+
+	def close(self):
+		self.bus.detach(self.inbox)
+
+
+# bus shared by all the nodes of this process when its_conf.medium_model = 'memory'
+memory_bus = MemoryBus()
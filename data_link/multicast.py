@@ -5,13 +5,25 @@
 # For this, you just need to drop incoming packets when the distance between the sender and the receiver 
 # is higher than a threshold value
 #################################################
-import time
+import time, sys, selectors, threading
 import socket
 import struct, json
 import math, random
 import application.app_config as app_conf
 import ITS_maps as map
 import ITS_options as its_conf
+from data_link.codec import *
+from data_link.framing import *
+from data_link.medium import *
+from data_link.shm_medium import shm_medium
+from data_link.duplicates import DuplicateFilter
+from data_link.channel import create_channel_model
+from data_link.dcc import get_channel_probe
+from data_link.capture import open_capture, CAPTURE_RXD
+from data_link.impairment import create_impairment_stage
+from data_link.mac import create_mac_model
+from data_link.latency import stamp_txd, enable_timestamps, recv_timestamped, recv_timestamped_into
+from Queue import Empty
 
 # #####################################################################################################
 # message fields definition
@@ -38,6 +50,44 @@ MY_TTL = 1
 # Packet size
 MSG_SIZE=1024
 
+# maximum number of datagrams read from the socket after a wakeup, and delivered together
+RXD_BATCH = 64
+
+# Linux: a socket only receives the groups it joined, not every group joined by the host
+IP_MULTICAST_ALL = getattr(socket, 'IP_MULTICAST_ALL', 49)
+
+# Transmission statistics
+#		datagrams, messages - number of datagrams and messages sent
+#		msgs_per_datagram - histogram {messages in the datagram: number of datagrams}
+#		flush - reason for sending a bundle: size (MSG_SIZE or bundle_max_size reached), latency (bundle_max_delay expired),
+#				empty (no more messages waiting, bundle_max_delay = 0) and count (BUNDLE_MAX_PACKETS reached)
+#		fragmented - number of datagrams larger than MSG_SIZE, sent in fragments
+#		unicast - messages sent to the address of their next hop (its_conf.unicast_model)
+#		unicast_fallback - messages with a next hop of unknown address, sent by multicast
+txd_stats = {'datagrams': 0, 'messages': 0, 'msgs_per_datagram': {}, 'flush': {'size': 0, 'latency': 0, 'empty': 0, 'count': 0},
+			 'fragmented': 0, 'unicast': 0, 'unicast_fallback': 0}
+
+# Reception statistics
+#		packets - packets received
+#		dropped - packets dropped by the physical layer emulation (decided on the packet header)
+#		duplicates - packets already received (decided on the packet header)
+#		decoded - packets decoded and delivered to the upper layers
+rxd_stats = {'packets': 0, 'dropped': 0, 'duplicates': 0, 'decoded': 0}
+
+# Channel model of its_conf.channel_model = 'fading' - created by the first packet received
+channel = None
+
+# Fragments waiting for reassembly at each receiving node of this process {node: ReassemblyTable} - created by its
+# receiver. Reassembly statistics are available in reassembly_tables[node].stats
+reassembly_tables = {}
+lock_reassembly = threading.Lock()
+
+# its_conf.unicast_model: unicast socket of each node of this process, and address of the neighbours of each node,
+# learned from the sender address of their beacons
+unicast_sockets = {}
+neighbour_addresses = {}
+lock_unicast = threading.Lock()
+
 def multicast_txd(node_interface, start_flag, multicast_txd_queue):
 
 	node=node_interface['node_id']
@@ -46,6 +96,137 @@ def multicast_txd(node_interface, start_flag, multicast_txd_queue):
 	if (app_conf.debug_sys):
 		print('STATUS: Ready to start - THREAD: multicast_txd - NODE: {}'.format(node),'\n')
 
+	txd = get_medium().open_txd(node_interface)
+	
+	while True:
+		if (its_conf.bundle_model):
+			msgs, reason = collect_bundle(multicast_txd_queue)
+			txd_stats['flush'][reason] += 1
+		else:
+			msgs = [multicast_txd_queue.get()]
+		txd.send(msgs)
+	return
+
+#------------------------------------------------------------------------------------------------
+# get_medium - transmission medium selected by its_conf.medium_model
+#------------------------------------------------------------------------------------------------
+def get_medium():
+	if (its_conf.medium_model == 'memory'):
+		return memory_bus
+	elif (its_conf.medium_model == 'shm'):
+		return shm_medium
+	return udp_medium
+
+#------------------------------------------------------------------------------------------------
+# UdpMedium - IPv4 multicast. Messages are encoded with the node codec, bundled (its_conf.bundle_model)
+#		and fragmented when larger than MSG_SIZE.
+#------------------------------------------------------------------------------------------------
+class UdpMedium(Medium):
+
+	def open_txd(self, node_interface):
+		return UdpTxd(node_interface)
+
+	def open_rxd(self, node_interface):
+		return UdpRxd(node_interface)
+
+class UdpTxd:
+
+	def __init__(self, node_interface):
+		self.node = node_interface['node_id']
+		self.socket, self.address = create_txd_socket()
+		if (its_conf.unicast_model):
+			self.socket = get_unicast_socket(self.node)
+		# wire format used by this node - json or binary
+		self.codec = node_codec(self.node)
+		# identification of the datagrams larger than MSG_SIZE, sent in fragments
+		self.frag_id = 0
+		self.sendto = self.socket.sendto
+		capture = open_capture(self.node)
+		if capture is not None:
+			self.sendto = capture.sendto(self.sendto)
+
+	def send(self, msgs):
+		if (its_conf.latency_model):
+			msgs = stamp_txd(msgs)
+		if (its_conf.unicast_model):
+			unicast, msgs = split_unicast(self.node, msgs)
+			for address, neighbour_msgs in unicast:
+				for packets in encode_bundles(neighbour_msgs, self.codec):
+					self.frag_id = send_datagram(self.sendto, address, packets, self.frag_id, self.node)
+		for address, channel_msgs in split_channels(msgs, self.address):
+			for packets in encode_bundles(channel_msgs, self.codec):
+				self.frag_id = send_datagram(self.sendto, address, packets, self.frag_id, self.node)
+
+#------------------------------------------------------------------------------------------------
+# UdpRxd - datagrams are received in a pool of RXD_BATCH preallocated buffers. After a wakeup, the datagrams
+#		already waiting are read without blocking, and the packets of the whole burst are returned together.
+#		The packet data are memoryviews of the buffers: they are valid until the next call to receive().
+#		With rxd_timestamps() the kernel receive timestamp is added to the packet headers ('rxd_time').
+#------------------------------------------------------------------------------------------------
+class UdpRxd:
+
+	def __init__(self, node_interface):
+		self.node = node_interface['node_id']
+		self.sockets = create_rxd_sockets(node_interface)
+		if (its_conf.unicast_model):
+			self.sockets.append(get_unicast_socket(self.node))
+		self.selector = None
+		if len(self.sockets) > 1:
+			self.selector = selectors.DefaultSelector()
+			for r in self.sockets:
+				self.selector.register(r, selectors.EVENT_READ)
+		self.buffers = [memoryview(bytearray(MSG_SIZE)) for i in range(RXD_BATCH)]
+		self.capture = open_capture(self.node)
+		self.timestamps = rxd_timestamps()
+		if self.timestamps:
+			for r in self.sockets:
+				enable_timestamps(r)
+		self.table = create_reassembly_table(self.node)
+
+	def receive(self):
+		datagrams = []
+		while not datagrams:
+			if self.selector is None:
+				self.read(self.sockets[0], datagrams, 0)
+				ready = self.sockets
+			else:
+				ready = [key.fileobj for key, events in self.selector.select()]
+			for r in ready:
+				try:
+					while len(datagrams) < RXD_BATCH:
+						self.read(r, datagrams, socket.MSG_DONTWAIT)
+				except BlockingIOError:
+					pass
+
+		packets = []
+		for rxd_data, sender, rxd_time in datagrams:
+			if self.capture is not None:
+				self.capture.write(CAPTURE_RXD, rxd_data, sender)
+			for header, pkt_data in read_datagram(self.node, rxd_data, sender, self.table):
+				if rxd_time is not None:
+					header['rxd_time'] = rxd_time
+				packets.append((header, pkt_data))
+		return packets
+
+	#------------------------------------------------------------------------------------------------
+	# read - reads a datagram into the next free buffer and appends (data, sender, rxd_time) to datagrams
+	#------------------------------------------------------------------------------------------------
+	def read(self, r, datagrams, flags):
+		buffer = self.buffers[len(datagrams)]
+		if self.timestamps:
+			size, sender, rxd_time = recv_timestamped_into(r, buffer, flags)
+		else:
+			size, sender = r.recvfrom_into(buffer, 0, flags)
+			rxd_time = None
+		datagrams.append((buffer[:size], sender, rxd_time))
+
+udp_medium = UdpMedium()
+
+#------------------------------------------------------------------------------------------------
+# create_txd_socket - UDP socket used to send multicast packets. Returns the socket and the destination address
+#------------------------------------------------------------------------------------------------
+def create_txd_socket():
+
 	#Translates host/port (not used here) into a sequence of 5 tupples (family, type, proto, canonname, sockaddr) 
 	#Used o to obtain family information AF_INET
 	addrinfo=socket.getaddrinfo(MYGROUP_4, None)[0]
@@ -60,14 +241,69 @@ def multicast_txd(node_interface, start_flag, multicast_txd_queue):
 	# 		IPPROTO_IP - IPv4 protocol	
 	#		MULTICAST_TTL - set ttl value
 	s.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl_bin)
-	
-	msg = dict()
+	return s, (addrinfo[4][0], PORT)
+
+#------------------------------------------------------------------------------------------------
+# send_datagram - send the encoded packets in a single datagram, or in fragments if the datagram is larger than MSG_SIZE.
+#			sendto: socket.sendto or an equivalent function (e.g. asyncio transport.sendto)
+#			Returns the identification to be used by the next fragmented datagram
+#------------------------------------------------------------------------------------------------
+def send_datagram(sendto, address, packets, frag_id, node):
+	datagram = pack_bundle(packets)
+	if len(datagram) > MSG_SIZE:
+		try:
+			fragments = fragment_datagram(datagram, frag_id, MSG_SIZE)
+		except FramingError as e:
+			print('ERROR: Packet discarded ({}) - THREAD: multicast_txd - NODE: {}'.format(e, node),'\n')
+			return frag_id
+		frag_id += 1
+		txd_stats['fragmented'] += 1
+		for fragment in fragments:
+			data_to_send=sendto(fragment, address)
+	else:
+		data_to_send=sendto(datagram, address)
+	update_txd_stats(len(packets))
+	if (app_conf.debug_multicast):
+		print('STATUS: Packet transmitted - THREAD: multicast_txd - NODE: {}'.format(node),' - MSG: {}'.format(data_to_send),' - PACKETS: {}'.format(len(packets)),'\n')
+	return frag_id
+
+#------------------------------------------------------------------------------------------------
+# encode_bundles - encode the messages and, with its_conf.bundle_model, group them in bundles of at most
+#			its_conf.bundle_max_size bytes (limited to MSG_SIZE). Returns the list of packets of each datagram
+#------------------------------------------------------------------------------------------------
+def encode_bundles(msgs, codec):
+	packets = [encode_packet(msg, codec) for msg in msgs]
+	if not (its_conf.bundle_model):
+		return [[pkt] for pkt in packets]
+	bundles = group_packets(packets, min(its_conf.bundle_max_size, MSG_SIZE))
+	txd_stats['flush']['size'] += len(bundles) - 1
+	return bundles
+
+#------------------------------------------------------------------------------------------------
+# collect_bundle - drain multicast_txd_queue until the latency budget (its_conf.bundle_max_delay) expires or
+#			BUNDLE_MAX_PACKETS messages are collected. Returns the messages and the flush reason.
+#			Messages exceeding the size budget are sent in the next bundle (flush reason size)
+#------------------------------------------------------------------------------------------------
+def collect_bundle(multicast_txd_queue):
+	msgs = [multicast_txd_queue.get()]
+	deadline = time.time() + its_conf.bundle_max_delay
 	while True:
-		rxd_msg=multicast_txd_queue.get()
-		data_to_send=s.sendto(json.dumps(rxd_msg).encode('utf-8'), (addrinfo[4][0], PORT))
-		if (app_conf.debug_multicast):
-			print('STATUS: Packet transmitted - THREAD: multicast_txd - NODE: {}'.format(node),' - MSG: {}'.format(data_to_send),'\n')
-	return
+		if len(msgs) == BUNDLE_MAX_PACKETS:
+			return msgs, 'count'
+		timeout = deadline - time.time()
+		try:
+			if timeout > 0:
+				msgs.append(multicast_txd_queue.get(timeout=timeout))
+			else:
+				msgs.append(multicast_txd_queue.get_nowait())
+		except Empty:
+			return msgs, ('latency' if its_conf.bundle_max_delay > 0 else 'empty')
+
+def update_txd_stats(n_packets):
+	txd_stats['datagrams'] += 1
+	txd_stats['messages'] += n_packets
+	histogram = txd_stats['msgs_per_datagram']
+	histogram[n_packets] = histogram.get(n_packets, 0) + 1
 
 
 def multicast_rxd(node_interface, start_flag, coordinates, multicast_rxd_queue, beacon_rxd_queue):
@@ -78,6 +314,118 @@ def multicast_rxd(node_interface, start_flag, coordinates, multicast_rxd_queue,
 	if (app_conf.debug_sys):
 		print('STATUS: Ready to start - THREAD: multicast_rxd - NODE: {}'.format(node),'\n')
 
+	rxd = get_medium().open_rxd(node_interface)
+	duplicates = create_duplicate_filter()
+	probe = get_channel_probe(node) if its_conf.dcc_model else None
+	deliver = lambda pkts_rxd: deliver_packets(node, pkts_rxd, multicast_rxd_queue, beacon_rxd_queue)
+	impairment = create_impairment_stage(node, deliver)
+	mac = create_mac_model(node, deliver if impairment is None else impairment.submit)
+
+	while True :
+		delivered = []
+		packets = rxd.receive()
+		# times of the transmissions received from the memory medium (UDP packet headers carry their own)
+		rxd_times = getattr(rxd, 'rxd_times', None) or [None] * len(packets)
+		for (header, pkt_data), rxd_time in zip(packets, rxd_times):
+			pkt_rxd = accept_packet(node_interface, coordinates, header, pkt_data, duplicates, probe, rxd_time, mac)
+			if pkt_rxd is not None:
+				delivered.append(pkt_rxd)
+		if impairment is not None:
+			impairment.submit(delivered)
+		elif delivered:
+			deliver(delivered)
+		if mac is not None:
+			mac.flush()
+	return
+
+#------------------------------------------------------------------------------------------------
+# Channel plan - with its_conf.channel_plan each message family (its_conf.channel_families) is sent to its own
+#		multicast group/port, and nodes only join the channels of the facilities they run (node_interface['channels'],
+#		set by ITS_core). Without a channel plan every message is sent to MYGROUP_4:PORT.
+#------------------------------------------------------------------------------------------------
+def channel_address(msg_type, default):
+	if not its_conf.channel_plan:
+		return default
+	return tuple(its_conf.channel_plan[its_conf.channel_families.get(msg_type, 'CA')])
+
+#------------------------------------------------------------------------------------------------
+# split_channels - messages grouped by destination address, in order. Returns a list of (address, messages)
+#------------------------------------------------------------------------------------------------
+def split_channels(msgs, default):
+	if not its_conf.channel_plan:
+		return [(default, msgs)]
+	channels = {}
+	for msg in msgs:
+		channels.setdefault(channel_address(msg.get('msg_type'), default), []).append(msg)
+	return list(channels.items())
+
+#------------------------------------------------------------------------------------------------
+# subscribe - the node receives the messages of msg_type, on the channel of its family (its_conf.channel_families).
+#		Called by ITS_core for each facilities rxd thread started
+#------------------------------------------------------------------------------------------------
+def subscribe(node_interface, msg_type):
+	node_interface.setdefault('channels', set()).add(its_conf.channel_families.get(msg_type, 'CA'))
+
+#------------------------------------------------------------------------------------------------
+# Unicast - with its_conf.unicast_model the socket used by a node to transmit also receives the datagrams sent to
+#		its address. Receivers learn that address from the beacons of the node, and the messages with a next hop
+#		(msg['next_hop'], set by geonetwork_txd) are sent only to the address of that neighbour.
+#------------------------------------------------------------------------------------------------
+def get_unicast_socket(node):
+	with lock_unicast:
+		if node not in unicast_sockets:
+			s, address = create_txd_socket()
+			s.bind(('', 0))
+			unicast_sockets[node] = s
+		return unicast_sockets[node]
+
+def learn_neighbour(node, neighbour, address):
+	if (neighbour != node):
+		neighbour_addresses.setdefault(node, {})[neighbour] = address
+
+def neighbour_address(node, neighbour):
+	return neighbour_addresses.get(node, {}).get(neighbour)
+
+#------------------------------------------------------------------------------------------------
+# split_unicast - messages with a known next hop grouped by neighbour address, in order, and the messages left
+#		for multicast. Returns ([(address, messages)], messages). next_hop is transmitted: the neighbour forwards
+#		the messages addressed to other nodes (its_conf.forwarding_model)
+#------------------------------------------------------------------------------------------------
+def split_unicast(node, msgs):
+	unicast = {}
+	multicast = []
+	for msg in msgs:
+		if 'next_hop' not in msg:
+			multicast.append(msg)
+			continue
+		address = neighbour_address(node, msg['next_hop'])
+		if address is None:
+			txd_stats['unicast_fallback'] += 1
+			multicast.append(msg)
+		else:
+			txd_stats['unicast'] += 1
+			unicast.setdefault(address, []).append(msg)
+	return list(unicast.items()), multicast
+
+#------------------------------------------------------------------------------------------------
+# create_rxd_sockets - sockets of the channels the node subscribed to: one socket per port, joined to the
+#		groups of the channels on that port
+#------------------------------------------------------------------------------------------------
+def create_rxd_sockets(node_interface):
+	if not its_conf.channel_plan:
+		return [create_rxd_socket()]
+	families = node_interface.get('channels') or its_conf.channel_plan.keys()
+	ports = {}
+	for family in families:
+		group, port = its_conf.channel_plan[family]
+		ports.setdefault(port, set()).add(group)
+	return [create_rxd_socket(port, sorted(groups)) for port, groups in sorted(ports.items())]
+
+#------------------------------------------------------------------------------------------------
+# create_rxd_socket - UDP socket bound to port that joined the multicast groups (default: MYGROUP_4, PORT)
+#------------------------------------------------------------------------------------------------
+def create_rxd_socket(port=PORT, groups=(MYGROUP_4,)):
+
 	#Create an UDP/IPv4 socket 
 	r=socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
@@ -87,52 +435,205 @@ def multicast_rxd(node_interface, start_flag, coordinates, multicast_rxd_queue,
 	#r.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
 
 	#Bind the socket to the server
-	r.bind(('',PORT))
-	
-	#inet_pton - convert the IPv4 address from text to binary
-	group_bin=socket.inet_pton(socket.AF_INET, MYGROUP_4)
+	r.bind(('',port))
 
-	#mreq - defines the multicast group and interface to join
-	#INADDR_ANY - receives listen on default multicast interface
-	mreq = group_bin + struct.pack('=I', socket.INADDR_ANY)
+	#With a channel plan, receive only the groups joined by this socket
+	if (its_conf.channel_plan) and sys.platform.startswith('linux'):
+		r.setsockopt(socket.IPPROTO_IP, IP_MULTICAST_ALL, 0)
 
-	#Join multicast - add the socket on the IPv4 multicast address of the selected interface.
-	# 		IPPROTO_IP - IPv4 protocol	
-	# 		IP_ADD_MEMBERSHIP - add the socket to the multicast group
+	for group in groups:
+		#inet_pton - convert the IPv4 address from text to binary
+		group_bin=socket.inet_pton(socket.AF_INET, group)
 
-	# Drop multicast - drop the socket from the IPv4 multicast address of the selected interface. Use the same primitive and replace IP_ADD_MEMBERSHIP  by
-	# 		IP_DROP_MEMBERSHIP - drop the socket from the multicast group
-	r.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+		#mreq - defines the multicast group and interface to join
+		#INADDR_ANY - receives listen on default multicast interface
+		mreq = group_bin + struct.pack('=I', socket.INADDR_ANY)
 
-	txd_flag = True
-	while True :
-		rxd_data, sender = r.recvfrom(MSG_SIZE)
-		pkt_rxd = json.loads(rxd_data.decode('utf-8'))
+		#Join multicast - add the socket on the IPv4 multicast address of the selected interface.
+		# 		IPPROTO_IP - IPv4 protocol	
+		# 		IP_ADD_MEMBERSHIP - add the socket to the multicast group
+
+		# Drop multicast - drop the socket from the IPv4 multicast address of the selected interface. Use the same primitive and replace IP_ADD_MEMBERSHIP  by
+		# 		IP_DROP_MEMBERSHIP - drop the socket from the multicast group
+		r.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+	return r
+
+#------------------------------------------------------------------------------------------------
+# create_reassembly_table - new reassembly table of a receiver of node, published in reassembly_tables
+#------------------------------------------------------------------------------------------------
+def create_reassembly_table(node):
+	table = ReassemblyTable(its_conf.reassembly_max_entries, its_conf.reassembly_max_bytes, its_conf.reassembly_timeout)
+	with lock_reassembly:
+		reassembly_tables[node] = table
+	return table
+
+def get_reassembly_table(node):
+	with lock_reassembly:
+		table = reassembly_tables.get(node)
+	return table if table is not None else create_reassembly_table(node)
+
+#------------------------------------------------------------------------------------------------
+# rxd_timestamps - received datagrams are timestamped for the latency measurement and the MAC model
+#------------------------------------------------------------------------------------------------
+def rxd_timestamps():
+	return its_conf.latency_model or its_conf.mac_model
+
+#------------------------------------------------------------------------------------------------
+# create_duplicate_filter - duplicate detection of a receiver (None if its_conf.duplicate_model is off)
+#------------------------------------------------------------------------------------------------
+def create_duplicate_filter():
+	if (its_conf.duplicate_model):
+		return DuplicateFilter(its_conf.duplicate_max_entries, its_conf.duplicate_ttl, its_conf.duplicate_window)
+	return None
+
+#------------------------------------------------------------------------------------------------
+# read_datagram - reassembly, bundle split and header reading of a received datagram.
+#			Returns a (header, packet data) pair per packet - see read_packet in data_link/codec.py
+#			table: ReassemblyTable of the receiver (default: the one of node in reassembly_tables)
+#			The sender address of beacons is kept for unicast (its_conf.unicast_model)
+#------------------------------------------------------------------------------------------------
+def read_datagram(node, rxd_data, sender, table=None):
+
+	if rxd_data and (rxd_data[0] == FRAGMENT_MAGIC):
+		if table is None:
+			table = get_reassembly_table(node)
+		rxd_data = table.add(sender, rxd_data)
+		if rxd_data is None:
+			return []
+	try:
+		rxd_packets = split_datagram(rxd_data)
+	except FramingError as e:
 		if (app_conf.debug_multicast):
-			print('STATUS: Packet received - THREAD: multicast_rxd - NODE: {}'.format(node),' - MSG: {}'.format(pkt_rxd),'\n')
-		if (its_conf.physical_model):
-			txd_flag = physical_layer_emulation (node_interface, coordinates, pkt_rxd)
-		if (txd_flag):
-			if (pkt_rxd['msg_type'] == 'BEACON'):
-				beacon_rxd_queue.put(pkt_rxd)
-			else:
-				multicast_rxd_queue.put(pkt_rxd)
-			if (app_conf.debug_physical_layer):
-				print('STATUS: Packet delivered to upper layer - THREAD: multicast_rxd - NODE: {}'.format(node),' - MSG: {}'.format(pkt_rxd),'\n')
-	return
+			print('STATUS: Datagram discarded ({}) - THREAD: multicast_rxd - NODE: {}'.format(e, node),'\n')
+		return []
+
+	packets = []
+	for pkt_data in rxd_packets:
+		try:
+			header, pkt_data = read_packet(pkt_data)
+		except CodecError as e:
+			if (app_conf.debug_multicast):
+				print('STATUS: Packet discarded ({}) - THREAD: multicast_rxd - NODE: {}'.format(e, node),'\n')
+			continue
+		if (its_conf.unicast_model) and (header['msg_type'] == 'BEACON'):
+			learn_neighbour(node, header['node'], sender)
+		packets.append((header, pkt_data))
+	return packets
 
+#------------------------------------------------------------------------------------------------
+# receive_datagram - reading, physical layer emulation, duplicate detection and decoding of a received datagram.
+#			Returns the packets to be delivered to the upper layers (the packets heard by mac are delivered by it)
+#------------------------------------------------------------------------------------------------
+def receive_datagram(node_interface, coordinates, rxd_data, sender, duplicates=None, probe=None, table=None, rxd_time=None,
+					 mac=None):
+	delivered = []
+	for header, pkt_data in read_datagram(node_interface['node_id'], rxd_data, sender, table):
+		pkt_rxd = accept_packet(node_interface, coordinates, header, pkt_data, duplicates, probe, rxd_time, mac)
+		if pkt_rxd is not None:
+			delivered.append(pkt_rxd)
+	return delivered
 
-def physical_layer_emulation (node_interface, coordinates, pkt_rxd):
+#------------------------------------------------------------------------------------------------
+# accept_packet - physical layer emulation and duplicate detection of a received packet, using only its header.
+#			The packet body is decoded only if the packet is accepted. Returns the message or None if dropped.
+#			duplicates: DuplicateFilter or None (no duplicate detection). Routed messages (routed_packet) are not
+#						filtered: relays keep the node and msg_id of the originator, and perimeter forwarding may
+#						take a message through the same node twice. geonetwork_rxd filters the ones delivered
+#			probe: ChannelProbe that measures the channel busy ratio for DCC (data_link/dcc.py) or None. It hears the
+#				   packets of the other nodes, with their size on the wire (packet_size)
+#			rxd_time: receive timestamp of the datagram, added to the decoded message (data_link/latency.py) or None
+#					  (default: header['rxd_time'] if present). Messages shared by the memory medium are not changed
+#			mac: MacModel of the receiver (data_link/mac.py) or None. The packets heard by the MAC model are
+#				 delivered by it at the end of their airtime: accept_packet returns None
+#------------------------------------------------------------------------------------------------
+def accept_packet(node_interface, coordinates, header, pkt_data, duplicates=None, probe=None, rxd_time=None, mac=None):
+	rxd_stats['packets'] += 1
+	if (app_conf.debug_multicast):
+		print('STATUS: Packet received - THREAD: multicast_rxd - NODE: {}'.format(node_interface['node_id']),' - HEADER: {}'.format(header),'\n')
+	size = packet_size(header, pkt_data, its_conf.dcc_packet_size)
+	if rxd_time is None:
+		rxd_time = header.get('rxd_time')
+	frame = None
+	sender_distance = sender_range = None
+	if (mac is not None) and (header['node'] != node_interface['node_id']):
+		sender_distance = distance(coordinates, header)
+		sender_range = range_type(header['node_type'])
+		frame = mac.transmission(header['node'], header['pos_x'], header['pos_y'], sender_range, size, sender_distance,
+								 rxd_time)
+	pkt_rxd = None
+	if (its_conf.physical_model) and not physical_layer_emulation (node_interface, coordinates, header, sender_distance,
+																	sender_range):
+		rxd_stats['dropped'] += 1
+	else:
+		# the own transmissions looped back by the medium are not heard on the channel
+		if (probe is not None) and (header['node'] != node_interface['node_id']):
+			probe.heard(size)
+		if (duplicates is not None) and not routed_packet(header, pkt_data) and duplicates.is_duplicate(header):
+			rxd_stats['duplicates'] += 1
+		else:
+			try:
+				pkt_rxd = open_packet(header, pkt_data)
+			except CodecError as e:
+				if (app_conf.debug_multicast):
+					print('STATUS: Packet discarded ({}) - THREAD: multicast_rxd - NODE: {}'.format(e, node_interface['node_id']),'\n')
+	if pkt_rxd is not None:
+		rxd_stats['decoded'] += 1
+		if (rxd_time is not None) and (pkt_data is not None):
+			pkt_rxd['rxd_time'] = rxd_time
+	if frame is not None:
+		mac.complete(frame, pkt_rxd)
+		return None
+	return pkt_rxd
+
+#------------------------------------------------------------------------------------------------
+# deliver_packet - beacons are sent to beacon_rxd, other messages to geonetwork_rxd
+#------------------------------------------------------------------------------------------------
+def deliver_packet(node, pkt_rxd, multicast_rxd_queue, beacon_rxd_queue):
+	if (pkt_rxd['msg_type'] == 'BEACON'):
+		beacon_rxd_queue.put(pkt_rxd)
+	else:
+		multicast_rxd_queue.put(pkt_rxd)
+	if (app_conf.debug_physical_layer):
+		print('STATUS: Packet delivered to upper layer - THREAD: multicast_rxd - NODE: {}'.format(node),' - MSG: {}'.format(pkt_rxd),'\n')
+
+#------------------------------------------------------------------------------------------------
+# deliver_packets - batch version of deliver_packet: a single list put in each queue
+#------------------------------------------------------------------------------------------------
+def deliver_packets(node, pkts_rxd, multicast_rxd_queue, beacon_rxd_queue):
+	beacons = [pkt_rxd for pkt_rxd in pkts_rxd if pkt_rxd['msg_type'] == 'BEACON']
+	if beacons:
+		beacon_rxd_queue.put(beacons)
+	if len(beacons) < len(pkts_rxd):
+		multicast_rxd_queue.put([pkt_rxd for pkt_rxd in pkts_rxd if pkt_rxd['msg_type'] != 'BEACON'])
+	if (app_conf.debug_physical_layer):
+		for pkt_rxd in pkts_rxd:
+			print('STATUS: Packet delivered to upper layer - THREAD: multicast_rxd - NODE: {}'.format(node),' - MSG: {}'.format(pkt_rxd),'\n')
+
+
+#------------------------------------------------------------------------------------------------
+# physical_layer_emulation - True if the packet is received at coordinates. sender_distance, sender_range: distance
+#			to the sender and its range, if already known
+#------------------------------------------------------------------------------------------------
+def physical_layer_emulation (node_interface, coordinates, pkt_rxd, sender_distance=None, sender_range=None):
 
 	if (pkt_rxd['node'] == node_interface['node_id']):
 		return True
 
-	sender_distance = distance (coordinates, pkt_rxd)
-	sender_range = range_type (pkt_rxd['node_type'])
+	if sender_distance is None:
+		sender_distance = distance (coordinates, pkt_rxd)
+	if (its_conf.channel_model == 'fading'):
+		return get_channel().receive(node_interface['node_id'], pkt_rxd['node_type'], node_interface['type'], sender_distance)
+	if sender_range is None:
+		sender_range = range_type (pkt_rxd['node_type'])
 
 	return (region (sender_distance, sender_range))
 
-	
+def get_channel():
+	global channel
+	if channel is None:
+		channel = create_channel_model()
+	return channel
+
 def distance (coordinates, pkt_rxd):
 	x1 = coordinates['x']
 	y1 = coordinates['y']
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# #################################################
+## REPLAY - re-injects the datagrams received in a capture (data_link/capture.py) in a node, through the same
+# decoding and physical layer emulation as multicast_rxd, at its_conf.replay_speed times the original pace
+# (0: as fast as possible). The capture_replay thread replaces multicast_rxd when its_conf.replay_file is set,
+# so the load seen by a node in a field run can be reproduced offline.
+#################################################
+import time
+import application.app_config as app_conf
+import ITS_options as its_conf
+from data_link.capture import *
+from data_link.multicast import *
+
+#------------------------------------------------------------------------------------------------
+# replay_capture - re-injects the received datagrams of a capture in a node. Returns the number of datagrams
+#		deliver: function called with each accepted packet
+#		speed: 1 - original pace, N - N times faster, 0 - as fast as possible
+#------------------------------------------------------------------------------------------------
+def replay_capture(path, node_interface, coordinates, deliver, speed=1.0):
+	table = ReassemblyTable(its_conf.reassembly_max_entries, its_conf.reassembly_max_bytes, its_conf.reassembly_timeout)
+	duplicates = create_duplicate_filter()
+	reader = CaptureReader(path)
+	datagrams = 0
+	start = None
+	for timestamp, kind, address, data in reader:
+		if (kind == CAPTURE_SESSION):
+			# timestamps of a new session use a different monotonic clock
+			start = None
+			continue
+		if (kind != CAPTURE_RXD):
+			continue
+		if speed > 0:
+			if start is None:
+				start = (timestamp, time.monotonic())
+			delay = start[1] + (timestamp - start[0])/speed - time.monotonic()
+			if delay > 0:
+				time.sleep(delay)
+		for pkt_rxd in receive_datagram(node_interface, coordinates, data, address, duplicates, table=table):
+			deliver(pkt_rxd)
+		datagrams += 1
+	data = None
+	reader.close()
+	return datagrams
+
+#------------------------------------------------------------------------------------------------
+# Thread - capture_replay - replays its_conf.replay_file in place of multicast_rxd
+#------------------------------------------------------------------------------------------------
+def capture_replay(node_interface, start_flag, coordinates, multicast_rxd_queue, beacon_rxd_queue):
+	node = node_interface['node_id']
+	while not start_flag.isSet():
+		time.sleep (1)
+	if (app_conf.debug_sys):
+		print('STATUS: Ready to start - THREAD: capture_replay - NODE: {}'.format(node),'\n')
+
+	deliver = lambda pkt_rxd: deliver_packet(node, pkt_rxd, multicast_rxd_queue, beacon_rxd_queue)
+	impairment = create_impairment_stage(node, lambda pkts_rxd: deliver_packets(node, pkts_rxd, multicast_rxd_queue, beacon_rxd_queue))
+	if impairment is not None:
+		deliver = lambda pkt_rxd: impairment.submit([pkt_rxd])
+	datagrams = replay_capture(its_conf.replay_file, node_interface, coordinates, deliver, its_conf.replay_speed)
+	if (app_conf.debug_sys):
+		print('STATUS: Replay finished ({} datagrams) - THREAD: capture_replay - NODE: {}'.format(datagrams, node),'\n')
+	return
+
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# #################################################
+## SHARDED RECEPTION - multicast datagrams decoded by N workers (its_conf.rxd_workers > 1).
+# A reader thread receives the datagrams and shards them by sender address: all the datagrams of a sender
+# are handled by the same worker, in order, so the per-sender order of the packets delivered to
+# multicast_rxd_queue and beacon_rxd_queue is preserved.
+#		its_conf.rxd_worker_model = 'threads': workers are threads of this process. They share the interpreter lock,
+#		                            so they do not decode faster than a single thread (python -m
+#		                            benchmarks.rxd_benchmark: 0.82 speedup with 8 workers); they only keep the
+#		                            reader thread from blocking on a slow worker
+#		                            'processes': workers are processes. Datagrams are sent to them in batches,
+#		                            with the current receiver coordinates, and decoded packets are delivered by
+#		                            a merger thread. Batches are pickled to the workers, so processes are slower
+#		                            than threads on a single CPU and only gain with free CPUs
+# Every worker has its own reassembly table and duplicate filter. rxd_stats and the reassembly statistics
+# of process workers are kept in their process; the neighbour addresses they learn (unicast_model) are
+# returned with the packets and learnt by the merger thread, in the node process.
+# Note: all the sockets joined to a multicast group receive a copy of every datagram, so SO_REUSEPORT
+# can not spread multicast traffic between processes - a single socket is read and the datagrams are
+# distributed to the workers.
+#################################################
+import socket, selectors, threading, time, multiprocessing
+from Queue import Queue
+import application.app_config as app_conf
+import ITS_options as its_conf
+from data_link.multicast import *
+
+# maximum number of datagrams read from the socket before they are dispatched to the workers
+RXD_BATCH = 64
+
+#------------------------------------------------------------------------------------------------
+# Thread - multicast_rxd_sharded - replaces multicast_rxd when its_conf.rxd_workers > 1
+#------------------------------------------------------------------------------------------------
+def multicast_rxd_sharded(node_interface, start_flag, coordinates, multicast_rxd_queue, beacon_rxd_queue):
+
+	node = node_interface['node_id']
+	while not start_flag.isSet():
+		time.sleep (1)
+	if (app_conf.debug_sys):
+		print('STATUS: Ready to start - THREAD: multicast_rxd_sharded - NODE: {}'.format(node),'\n')
+
+	workers = RxdWorkers(node_interface, coordinates, multicast_rxd_queue, beacon_rxd_queue,
+						 its_conf.rxd_workers, its_conf.rxd_worker_model)
+	workers.start()
+	sockets = create_rxd_sockets(node_interface)
+	if (its_conf.unicast_model):
+		sockets.append(get_unicast_socket(node))
+	selector = selectors.DefaultSelector()
+	for r in sockets:
+		selector.register(r, selectors.EVENT_READ)
+	capture = open_capture(node)
+	# (datagram, sender, kernel receive timestamp or None)
+	if rxd_timestamps():
+		for r in sockets:
+			enable_timestamps(r)
+		recv = recv_timestamped
+	else:
+		recv = lambda r, size, flags=0: r.recvfrom(size, flags) + (None,)
+
+	r = sockets[0]
+	while True :
+		if len(sockets) > 1:
+			r = selector.select()[0][0].fileobj
+		datagrams = [recv(r, MSG_SIZE)]
+		# datagrams already waiting are read without blocking and dispatched together
+		while len(datagrams) < RXD_BATCH:
+			try:
+				datagrams.append(recv(r, MSG_SIZE, socket.MSG_DONTWAIT))
+			except BlockingIOError:
+				break
+		if capture is not None:
+			for rxd_data, sender, rxd_time in datagrams:
+				capture.write(CAPTURE_RXD, rxd_data, sender)
+		workers.dispatch(datagrams)
+	return
+
+#------------------------------------------------------------------------------------------------
+# RxdWorkers - n reception workers of a node (model: 'threads' | 'processes')
+#------------------------------------------------------------------------------------------------
+class RxdWorkers:
+
+	def __init__(self, node_interface, coordinates, multicast_rxd_queue, beacon_rxd_queue, n, model='threads'):
+		if model not in ('threads', 'processes'):
+			raise ValueError('unknown rxd worker model: {}'.format(model))
+		self.node_interface = node_interface
+		self.coordinates = coordinates
+		self.multicast_rxd_queue = multicast_rxd_queue
+		self.beacon_rxd_queue = beacon_rxd_queue
+		self.n = n
+		self.model = model
+		self.probe = get_channel_probe(node_interface['node_id']) if its_conf.dcc_model else None
+		self.deliver = lambda pkts_rxd: deliver_packets(node_interface['node_id'], pkts_rxd, multicast_rxd_queue, beacon_rxd_queue)
+		# impairments are applied to the packets of all the workers, when delivered
+		impairment = create_impairment_stage(node_interface['node_id'], self.deliver)
+		if impairment is not None:
+			self.deliver = impairment.submit
+		# the MAC model is shared by the worker threads (not available to process workers)
+		self.mac = create_mac_model(node_interface['node_id'], self.deliver) if (model == 'threads') else None
+		self.jobs = []
+		self.processes = []
+
+	def start(self):
+		node = self.node_interface['node_id']
+		if (self.model == 'threads'):
+			for i in range(self.n):
+				jobs = Queue()
+				threading.Thread(target=rxd_worker_thread, args=(self.node_interface, self.coordinates, jobs,
+								 self.deliver, self.probe, self.mac,), daemon=True).start()
+				self.jobs.append(jobs)
+			return
+
+		# spawn: forking a process that runs threads is not safe
+		context = multiprocessing.get_context('spawn')
+		results = context.Queue()
+		options = {k: v for k, v in vars(its_conf).items() if not k.startswith('_')}
+		worker_interface = {'node_id': node, 'type': self.node_interface['type']}
+		for i in range(self.n):
+			jobs = context.Queue()
+			p = context.Process(target=rxd_worker_process, args=(worker_interface, options, jobs, results,), daemon=True)
+			p.start()
+			self.jobs.append(jobs)
+			self.processes.append(p)
+		threading.Thread(target=rxd_merger, args=(node, results, self.deliver, self.probe,), daemon=True).start()
+
+	#------------------------------------------------------------------------------------------------
+	# dispatch - sends a list of (datagram, sender, receive timestamp) to the workers, sharded by sender
+	#------------------------------------------------------------------------------------------------
+	def dispatch(self, datagrams):
+		batches = [[] for i in range(self.n)]
+		for datagram in datagrams:
+			batches[hash(datagram[1]) % self.n].append(datagram)
+		for jobs, batch in zip(self.jobs, batches):
+			if batch:
+				if (self.model == 'threads'):
+					jobs.put(batch)
+				else:
+					jobs.put((batch, self.coordinates['x'], self.coordinates['y']))
+
+	def close(self):
+		for jobs in self.jobs:
+			jobs.put(None)
+		for p in self.processes:
+			p.join()
+
+#------------------------------------------------------------------------------------------------
+# rxd_worker_thread - decodes the batches of datagrams of its shard and delivers the packets of each batch
+#		with deliver(packets)
+#------------------------------------------------------------------------------------------------
+def rxd_worker_thread(node_interface, coordinates, jobs, deliver, probe, mac=None):
+	node = node_interface['node_id']
+	table = ReassemblyTable(its_conf.reassembly_max_entries, its_conf.reassembly_max_bytes, its_conf.reassembly_timeout)
+	duplicates = create_duplicate_filter()
+	while True:
+		batch = jobs.get()
+		if batch is None:
+			return
+		packets = []
+		for rxd_data, sender, rxd_time in batch:
+			for header, pkt_data in read_datagram(node, rxd_data, sender, table):
+				pkt_rxd = accept_packet(node_interface, coordinates, header, pkt_data, duplicates, probe, rxd_time, mac)
+				if pkt_rxd is not None:
+					packets.append(pkt_rxd)
+		if packets:
+			deliver(packets)
+		if mac is not None:
+			mac.flush()
+
+#------------------------------------------------------------------------------------------------
+# HeardPackets - sizes of the packets heard by a process worker, reported to the ChannelProbe of the node
+#------------------------------------------------------------------------------------------------
+class HeardPackets(list):
+
+	def heard(self, size):
+		self.append(size)
+
+#------------------------------------------------------------------------------------------------
+# rxd_worker_process - process version of rxd_worker_thread. Returns (packets, heard packet sizes, neighbour
+#		addresses learnt) per batch
+#		options: ITS_options values of the parent process
+#------------------------------------------------------------------------------------------------
+def rxd_worker_process(node_interface, options, jobs, results):
+	for name, value in options.items():
+		setattr(its_conf, name, value)
+	node = node_interface['node_id']
+	table = ReassemblyTable(its_conf.reassembly_max_entries, its_conf.reassembly_max_bytes, its_conf.reassembly_timeout)
+	duplicates = create_duplicate_filter()
+	while True:
+		job = jobs.get()
+		if job is None:
+			return
+		batch, x, y = job
+		coordinates = {'x': x, 'y': y}
+		heard = HeardPackets() if its_conf.dcc_model else None
+		packets = []
+		for rxd_data, sender, rxd_time in batch:
+			for header, pkt_data in read_datagram(node, rxd_data, sender, table):
+				pkt_rxd = accept_packet(node_interface, coordinates, header, pkt_data, duplicates, heard, rxd_time)
+				if pkt_rxd is not None:
+					packets.append(pkt_rxd)
+		# addresses learnt by read_datagram in this process, since the last batch
+		results.put((packets, heard, neighbour_addresses.pop(node, None)))
+
+#------------------------------------------------------------------------------------------------
+# Thread - rxd_merger - delivers the packets decoded by the process workers and learns the neighbour
+#		addresses they found
+#------------------------------------------------------------------------------------------------
+def rxd_merger(node, results, deliver, probe):
+	while True:
+		packets, heard, addresses = results.get()
+		if addresses:
+			for neighbour, address in addresses.items():
+				learn_neighbour(node, neighbour, address)
+		if (probe is not None) and heard:
+			for size in heard:
+				probe.heard(size)
+		if packets:
+			deliver(packets)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# #################################################
+## SHARED MEMORY MEDIUM - nodes running as separate processes on the same host exchange frames through
+# shared memory rings instead of the kernel multicast stack (its_conf.medium_model = 'shm').
+# Each node owns a ring (multiprocessing.shared_memory segment 'its_ring_<node_id>') and is its single writer.
+# Every node reads the rings of all the nodes of ITS_maps.map, its own included, with one cursor per ring.
+# Writers never wait for readers: a reader overtaken by the writer (a write started over the frame being read)
+# detects the overrun and counts the frames it lost as drops.
+#
+# Ring layout:
+#		header - magic (4 bytes) | capacity (4 bytes) | head (8 bytes) | frames (8 bytes) | reserved (8 bytes) |
+#				 generation (8 bytes)
+#				 head: bytes written since the creation of the ring, frames: frames written,
+#				 reserved: end of the bytes written or being written (published before the record is copied),
+#				 generation: random number drawn by each writer. A node that restarts writes a new generation, in
+#				 the segment left behind or in a new one: readers start over (or reattach) when it changes.
+#		data - records [length (4 bytes) | frame]. A record never wraps: the end of the data area is
+#			   skipped with a padding record when the next record does not fit.
+# Frames are bundles of encoded packets (data_link/framing.py and data_link/codec.py).
+#################################################
+import struct, time, os
+from multiprocessing import shared_memory, resource_tracker
+import ITS_maps as map
+import ITS_options as its_conf
+from data_link.codec import *
+from data_link.framing import *
+from data_link.medium import Medium
+
+RING_MAGIC = 0x49545352
+RING_HEADER = struct.Struct('=IIQQQQ')
+RING_HEAD_OFFSET = 8
+RING_HEAD = struct.Struct('=QQ')
+RING_RESERVED_OFFSET = 24
+RING_RESERVED = struct.Struct('=Q')
+RING_GENERATION_OFFSET = 32
+RING_GENERATION = struct.Struct('=Q')
+RING_DATA_OFFSET = 64
+RING_RECORD = struct.Struct('=I')
+RING_PADDING = 0xFFFFFFFF
+
+# interval (seconds) between two attempts to attach to the rings of nodes that are not running yet
+RING_DISCOVERY_INTERVAL = 1.0
+
+# Reception statistics of this process
+#		frames - frames read
+#		overruns - times a reader was overtaken by the writer
+#		drops - frames lost in overruns
+shm_stats = {'frames': 0, 'overruns': 0, 'drops': 0}
+
+def ring_name(node_id):
+	return 'its_ring_{}'.format(node_id)
+
+
+#------------------------------------------------------------------------------------------------
+# RingWriter - creates the ring of a node and appends frames to it
+#------------------------------------------------------------------------------------------------
+class RingWriter:
+
+	def __init__(self, name, capacity):
+		try:
+			self.shm = shared_memory.SharedMemory(name=name, create=True, size=RING_DATA_OFFSET + capacity)
+		except FileExistsError:
+			# left behind by a previous run of the same node
+			self.shm = shared_memory.SharedMemory(name=name)
+			if self.shm.size < RING_DATA_OFFSET + capacity:
+				raise ValueError('shared memory segment {} is too small'.format(name))
+		self.buf = self.shm.buf
+		self.capacity = capacity
+		self.head = 0
+		self.frames = 0
+		self.generation = int.from_bytes(os.urandom(RING_GENERATION.size), 'little')
+		RING_HEADER.pack_into(self.buf, 0, RING_MAGIC, capacity, 0, 0, 0, self.generation)
+
+	#------------------------------------------------------------------------------------------------
+	# write - append a frame. The end of the bytes about to be written is published before the record is
+	#		copied, and head after, so readers never accept a partial or overwritten record.
+	#------------------------------------------------------------------------------------------------
+	def write(self, frame):
+		size = RING_RECORD.size + len(frame)
+		if size > self.capacity // 2:
+			raise FramingError('frame too large for the ring: {} bytes'.format(len(frame)))
+		pos = self.head % self.capacity
+		skip = self.capacity - pos if pos + size > self.capacity else 0
+		RING_RESERVED.pack_into(self.buf, RING_RESERVED_OFFSET, self.head + skip + size)
+		if skip:
+			if skip >= RING_RECORD.size:
+				RING_RECORD.pack_into(self.buf, RING_DATA_OFFSET + pos, RING_PADDING)
+			self.head += skip
+			pos = 0
+		start = RING_DATA_OFFSET + pos
+		RING_RECORD.pack_into(self.buf, start, len(frame))
+		self.buf[start + RING_RECORD.size:start + size] = frame
+		self.head += size
+		self.frames += 1
+		RING_HEAD.pack_into(self.buf, RING_HEAD_OFFSET, self.head, self.frames)
+
+	def close(self):
+		self.buf = None
+		self.shm.close()
+		self.shm.unlink()
+
+#------------------------------------------------------------------------------------------------
+# RingReader - cursor of this process over the ring of another node (or its own)
+#------------------------------------------------------------------------------------------------
+class RingReader:
+
+	def __init__(self, name, start=False):
+		self.shm = shared_memory.SharedMemory(name=name)
+		# the segment belongs to its writer - do not let the resource tracker of this process unlink it
+		try:
+			resource_tracker.unregister(self.shm._name, 'shared_memory')
+		except Exception:
+			pass
+		self.buf = self.shm.buf
+		magic, self.capacity, head, frames, reserved, self.generation = RING_HEADER.unpack_from(self.buf, 0)
+		if magic != RING_MAGIC:
+			self.close()
+			raise ValueError('invalid ring: {}'.format(name))
+		# frames written before the reader attached are not delivered, unless start is set (ring of a restarted
+		# node, whose frames are all new to the reader)
+		self.cursor = head
+		self.frames = frames
+		if start:
+			self.restart(head, frames)
+
+	#------------------------------------------------------------------------------------------------
+	# read - frames written since the last read, as memoryviews of the ring. process(frame) is called for
+	#		each frame and its results are kept only if no write reached the frame meanwhile, finished or not
+	#		(the bytes reserved by the writer are less than a ring ahead of the frame), and the writer was not
+	#		restarted (same generation).
+	#------------------------------------------------------------------------------------------------
+	def read(self, process):
+		head, frames = RING_HEAD.unpack_from(self.buf, RING_HEAD_OFFSET)
+		if self.restarted():
+			self.restart(head, frames)
+		if head == self.cursor:
+			return []
+		if head - self.cursor > self.capacity:
+			self.overrun(head, frames)
+			return []
+
+		results = []
+		cursor = self.cursor
+		while cursor < head:
+			pos = cursor % self.capacity
+			if self.capacity - pos < RING_RECORD.size:
+				cursor += self.capacity - pos
+				continue
+			start = RING_DATA_OFFSET + pos
+			size = RING_RECORD.unpack_from(self.buf, start)[0]
+			result = None
+			if size != RING_PADDING:
+				result = process(self.buf[start + RING_RECORD.size:start + RING_RECORD.size + size])
+			# the record is valid if the writer did not reach it while it was being read
+			if self.restarted():
+				self.cursor = cursor
+				return results
+			if RING_RESERVED.unpack_from(self.buf, RING_RESERVED_OFFSET)[0] - cursor > self.capacity:
+				self.overrun(*RING_HEAD.unpack_from(self.buf, RING_HEAD_OFFSET))
+				return results
+			if size == RING_PADDING:
+				cursor += self.capacity - pos
+				continue
+			results.extend(result)
+			cursor += RING_RECORD.size + size
+			self.frames += 1
+			shm_stats['frames'] += 1
+		self.cursor = cursor
+		return results
+
+	def restarted(self):
+		return RING_GENERATION.unpack_from(self.buf, RING_GENERATION_OFFSET)[0] != self.generation
+
+	#------------------------------------------------------------------------------------------------
+	# restart - the writer of the ring restarted (new generation): the frames it wrote since are read from the
+	#		beginning of the ring, or counted as drops if it already wrapped
+	#------------------------------------------------------------------------------------------------
+	def restart(self, head, frames):
+		self.generation = RING_GENERATION.unpack_from(self.buf, RING_GENERATION_OFFSET)[0]
+		self.cursor = 0
+		self.frames = 0
+		if head > self.capacity:
+			self.overrun(head, frames)
+
+	def overrun(self, head, frames):
+		shm_stats['overruns'] += 1
+		shm_stats['drops'] += max(frames - self.frames, 0)
+		self.cursor = head
+		self.frames = frames
+
+	def close(self):
+		self.buf = None
+		self.shm.close()
+
+
+#------------------------------------------------------------------------------------------------
+# ShmMedium - ring of each node in shared memory (its_conf.shm_ring_size bytes)
+#------------------------------------------------------------------------------------------------
+class ShmMedium(Medium):
+
+	def open_txd(self, node_interface):
+		return ShmTxd(node_interface)
+
+	def open_rxd(self, node_interface):
+		return ShmRxd(node_interface)
+
+class ShmTxd:
+
+	def __init__(self, node_interface):
+		self.node = node_interface['node_id']
+		self.codec = node_codec(self.node)
+		self.ring = RingWriter(ring_name(self.node), its_conf.shm_ring_size)
+
+	def send(self, msgs):
+		packets = [encode_packet(msg, self.codec) for msg in msgs]
+		for i in range(0, len(packets), BUNDLE_MAX_PACKETS):
+			try:
+				self.ring.write(pack_bundle(packets[i:i+BUNDLE_MAX_PACKETS]))
+			except FramingError as e:
+				print('ERROR: Packet discarded ({}) - THREAD: multicast_txd - NODE: {}'.format(e, self.node),'\n')
+
+class ShmRxd:
+
+	def __init__(self, node_interface):
+		self.node = node_interface['node_id']
+		self.readers = {}
+		self.discovery_time = 0
+
+	#------------------------------------------------------------------------------------------------
+	# receive - polls the rings until new frames are found. The polling interval grows from 0 up to
+	#		its_conf.shm_poll_interval while the rings are idle.
+	#------------------------------------------------------------------------------------------------
+	def receive(self):
+		idle = 0
+		while True:
+			if time.time() >= self.discovery_time:
+				self.discover()
+			packets = []
+			for reader in list(self.readers.values()):
+				packets.extend(reader.read(decode_frame))
+			if packets:
+				return packets
+			idle = min(idle + its_conf.shm_poll_interval/8, its_conf.shm_poll_interval)
+			time.sleep(idle)
+
+	#------------------------------------------------------------------------------------------------
+	# discover - attach to the rings of the map nodes that started since the last discovery, and to the new ring of
+	#		the nodes that restarted (a new segment of the same name, with another generation). Rings removed by
+	#		their writer are detached
+	#------------------------------------------------------------------------------------------------
+	def discover(self):
+		for node_id in map.map:
+			reader = self.readers.get(node_id)
+			try:
+				ring = RingReader(ring_name(node_id), reader is not None)
+			except FileNotFoundError:
+				if reader is not None:
+					reader.close()
+					del self.readers[node_id]
+				continue
+			except ValueError:
+				continue
+			if (reader is not None) and (ring.generation == reader.generation):
+				# still the segment being read, or the same writer
+				ring.close()
+				continue
+			if reader is not None:
+				reader.close()
+			self.readers[node_id] = ring
+		self.discovery_time = time.time() + RING_DISCOVERY_INTERVAL
+
+	def close(self):
+		for reader in self.readers.values():
+			reader.close()
+
+#------------------------------------------------------------------------------------------------
+# decode_frame - (header, packet data) of the packets of a frame read from a ring. The packet data is copied out of
+#		the ring, as the body is decoded later, only if the packet is accepted. Damaged frames are discarded.
+#------------------------------------------------------------------------------------------------
+def decode_frame(frame):
+	packets = []
+	try:
+		for pkt_data in split_datagram(frame):
+			header, pkt_data = read_packet(pkt_data)
+			packets.append((header, None if pkt_data is None else bytes(pkt_data)))
+	except (FramingError, CodecError):
+		pass
+	return packets
+
+shm_medium = ShmMedium()
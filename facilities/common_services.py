@@ -5,7 +5,9 @@
 ##########################################################################################################
 import time
 from facilities.services import *
+from transport_network.geo import address_message
 import application.app_config as app_conf
+import ITS_options as its_conf
 
 #------------------------------------------------------------------------------------------------
 # Thread - ca_service_txd - periodical transmission of CA messages.
@@ -48,6 +50,7 @@ def ca_service_rxd(node_interface, start_flag, geonetwork_rxd_ca_queue, services
 #------------------------------------------------------------------------------------------------
 # Thread - den_service_txd -  transmission of DEN messages.
 #			Note: for message repetition, you need to include the repetition mechanism.
+#			With its_conf.den_destination, DEN messages are addressed to that node
 #------------------------------------------------------------------------------------------------
 def den_service_txd(node_interface, start_flag, coordinates, den_service_txd_queue, geonetwork_txd_queue):
 	
@@ -63,6 +66,8 @@ def den_service_txd(node_interface, start_flag, coordinates, den_service_txd_que
 	while True :
 		event=den_service_txd_queue.get()
 		den_msg_txd=create_den_message(node_interface, msg_id, coordinates, event)
+		if (its_conf.den_destination) and (its_conf.den_destination != node):
+			address_message(den_msg_txd, its_conf.den_destination)
 		geonetwork_txd_queue.put(den_msg_txd)
 		msg_id=msg_id+1
 	return
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# #################################################
+## CODEC TESTS - json and binary round-trips of the messages of each type (data_link/codec.py), with and without
+# the preset dictionary compression, and the compiled body layouts of the binary decoder.
+#		usage (from the repository root): python -m pytest tests
+#################################################
+import pytest
+import ITS_options as its_conf
+from data_link.codec import *
+from benchmarks.codec_benchmark import sample_messages
+
+MESSAGES = sample_messages()
+
+# messages as received: json.loads(json.dumps(msg))
+def received(msg):
+	return decode_json(encode_json(msg))
+
+@pytest.fixture(params=[False, True], ids=['plain', 'compressed'])
+def compression(request, monkeypatch):
+	monkeypatch.setattr(its_conf, 'compression_model', request.param)
+	monkeypatch.setattr(its_conf, 'compression_min_size', 0)
+	return request.param
+
+@pytest.mark.parametrize('codec', ['json', 'binary'])
+@pytest.mark.parametrize('name, msg', MESSAGES, ids=[name for name, msg in MESSAGES])
+def test_round_trip(name, msg, codec, compression):
+	pkt = encode_packet(msg, codec)
+	if codec == 'binary':
+		assert pkt[0] == WIRE_MAGIC
+	if not compression:
+		assert (pkt[0] != COMPRESSED_MAGIC) and not ((pkt[0] == WIRE_MAGIC) and (pkt[HEADER_FLAGS_OFFSET] & FLAG_COMPRESSED))
+	assert decode_packet(pkt) == received(msg)
+	header, data = read_packet(pkt)
+	assert packet_size(header, data, 0) == len(pkt)
+	assert open_packet(header, data) == received(msg)
+
+@pytest.mark.parametrize('codec', ['json', 'binary'])
+def test_large_messages_compressed(codec, monkeypatch):
+	monkeypatch.setattr(its_conf, 'compression_model', True)
+	for name, msg in MESSAGES:
+		pkt = encode_packet(msg, codec)
+		uncompressed = encode_json(msg) if codec == 'json' else encode_binary(msg)
+		if len(uncompressed) < its_conf.compression_min_size:
+			assert pkt == uncompressed
+		elif codec == 'json':
+			assert (pkt[0] == COMPRESSED_MAGIC) and (len(pkt) < len(uncompressed))
+		else:
+			assert (pkt[HEADER_FLAGS_OFFSET] & FLAG_COMPRESSED) and (len(pkt) < len(uncompressed))
+		assert decode_packet(pkt) == received(msg)
+
+def test_compress_packet_idempotent():
+	for name, msg in MESSAGES:
+		for pkt in (encode_json(msg), encode_binary(msg)):
+			compressed = compress_packet(pkt)
+			assert compress_packet(compressed) == compressed
+			assert decode_packet(compressed) == decode_packet(pkt)
+
+def test_invalid_compressed_packet():
+	pkt = compress_packet(encode_json(dict(MESSAGES)['IVIM']))
+	with pytest.raises(CodecError):
+		decode_packet(pkt[:-4])
+
+@pytest.mark.parametrize('name, msg', MESSAGES, ids=[name for name, msg in MESSAGES])
+def test_binary_layout(name, msg):
+	body_layouts.clear()
+	pkt = encode_binary(msg)
+	# the first decoding compiles the layout, the second one reads the packet with it
+	assert decode_binary(pkt) == received(msg)
+	assert body_layouts
+	assert decode_binary(pkt) == received(msg)
+
+def test_binary_layout_values():
+	body_layouts.clear()
+	msg = dict(dict(MESSAGES)['CA'])
+	decode_binary(encode_binary(msg))
+	# same layout, other values
+	for speed, msg_id in ((1.5, 1), (-42.25, 77), (0.0, 0xFFFFFFFF)):
+		msg.update(speed=speed, msg_id=msg_id)
+		assert decode_binary(encode_binary(msg)) == received(msg)
+
+def test_binary_layout_constants():
+	body_layouts.clear()
+	msg = dict(dict(MESSAGES)['BEACON'])
+	for value in (True, False, None, True):
+		msg['extra'] = value
+		pkt = encode_binary(msg)
+		assert decode_binary(pkt) == received(msg)
+		assert decode_binary(pkt) == received(msg)
+
+def test_binary_unsupported_messages():
+	msg = dict(dict(MESSAGES)['CA'])
+	msg['node'] = 'rsu-1'
+	with pytest.raises(CodecError):
+		encode_binary(msg)
+	# sent in json
+	assert encode_packet(msg, 'binary') == encode_json(msg)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# #################################################
+## DUPLICATE FILTER TESTS - sliding window of msg_ids per source, restarts and eviction of the sources
+# (data_link/duplicates.py).
+#		usage (from the repository root): python -m pytest tests
+#################################################
+from data_link.duplicates import *
+
+def header(msg_id, node='1', msg_type='CA'):
+	return {'node': node, 'msg_type': msg_type, 'msg_id': msg_id}
+
+def test_duplicates():
+	duplicates = DuplicateFilter(window=8)
+	assert not duplicates.is_duplicate(header(5), 0.0)
+	assert duplicates.is_duplicate(header(5), 0.0)
+	# other source, other type
+	assert not duplicates.is_duplicate(header(5, node='2'), 0.0)
+	assert not duplicates.is_duplicate(header(5, msg_type='DEN'), 0.0)
+	assert duplicates.stats['duplicates'] == 1
+
+def test_without_msg_id():
+	duplicates = DuplicateFilter()
+	assert not duplicates.is_duplicate({'node': '1', 'msg_type': 'BEACON'}, 0.0)
+	assert not duplicates.is_duplicate({'node': '1', 'msg_type': 'BEACON'}, 0.0)
+
+def test_window():
+	duplicates = DuplicateFilter(window=8)
+	# reordered msg_ids within the window
+	for msg_id in (10, 7, 12, 8, 11, 5):
+		assert not duplicates.is_duplicate(header(msg_id), 0.0)
+	for msg_id in (10, 7, 12, 8, 11, 5):
+		assert duplicates.is_duplicate(header(msg_id), 0.0)
+	assert not duplicates.is_duplicate(header(9), 0.0)
+	# 4 is older than the window (12 - 8): stale
+	assert duplicates.is_duplicate(header(4), 0.0)
+	assert duplicates.stats['stale'] == 1
+	# the window slides past the bitmap
+	assert not duplicates.is_duplicate(header(100), 0.0)
+	assert not duplicates.is_duplicate(header(99), 0.0)
+	assert duplicates.is_duplicate(header(12), 0.0)
+
+def test_restart_gap():
+	duplicates = DuplicateFilter(window=8)
+	assert not duplicates.is_duplicate(header(0xFFFFFFF0), 0.0)
+	# more than half the msg_id space behind: the source restarted (or wrapped around)
+	assert not duplicates.is_duplicate(header(0), 0.0)
+	assert duplicates.stats['restarts'] == 1
+	assert duplicates.is_duplicate(header(0), 0.0)
+	assert not duplicates.is_duplicate(header(1), 0.0)
+
+def test_restart_stale():
+	duplicates = DuplicateFilter(window=8)
+	assert not duplicates.is_duplicate(header(1000), 0.0)
+	# a node restarted with msg_ids from 1: the first stale msg_ids are discarded, then the window restarts
+	for msg_id in range(1, DUPLICATE_RESTART):
+		assert duplicates.is_duplicate(header(msg_id), 0.0)
+	assert not duplicates.is_duplicate(header(DUPLICATE_RESTART), 0.0)
+	assert (duplicates.stats['stale'] == DUPLICATE_RESTART - 1) and (duplicates.stats['restarts'] == 1)
+	assert not duplicates.is_duplicate(header(DUPLICATE_RESTART + 1), 0.0)
+	assert duplicates.is_duplicate(header(DUPLICATE_RESTART), 0.0)
+	# stale msg_ids must be in a row
+	duplicates = DuplicateFilter(window=8)
+	duplicates.is_duplicate(header(1000), 0.0)
+	for msg_id in range(10):
+		assert duplicates.is_duplicate(header(1), 0.0)
+		assert not duplicates.is_duplicate(header(1001 + msg_id), 0.0)
+	assert duplicates.stats['restarts'] == 0
+
+def test_ttl():
+	duplicates = DuplicateFilter(ttl=10.0)
+	duplicates.is_duplicate(header(5), 0.0)
+	assert duplicates.is_duplicate(header(5), 9.0)
+	# heard at 9.0: kept until 19.0
+	assert duplicates.is_duplicate(header(5), 18.9)
+	assert not duplicates.is_duplicate(header(5), 28.9)
+	assert duplicates.stats['evicted'] == 1
+
+def test_max_sources():
+	duplicates = DuplicateFilter(max_sources=2)
+	duplicates.is_duplicate(header(5, node='1'), 0.0)
+	duplicates.is_duplicate(header(5, node='2'), 0.0)
+	# '1' heard again: '2' is the least recently heard
+	assert duplicates.is_duplicate(header(5, node='1'), 0.0)
+	duplicates.is_duplicate(header(5, node='3'), 0.0)
+	assert len(duplicates.sources) == 2
+	assert duplicates.is_duplicate(header(5, node='1'), 0.0)
+	assert not duplicates.is_duplicate(header(5, node='2'), 0.0)
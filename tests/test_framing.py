@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# #################################################
+## FRAMING TESTS - bundles and fragment reassembly (data_link/framing.py): fragments out of order, reassembly
+# timeout, memory bounds of the reassembly table and one table per receiver (data_link/multicast.py).
+#		usage (from the repository root): python -m pytest tests
+#################################################
+import pytest
+import data_link.multicast as multicast
+from data_link.framing import *
+
+DATAGRAM = bytes(range(256)) * 20
+
+def fragments(datagram=DATAGRAM, frag_id=1, max_size=1000):
+	return fragment_datagram(datagram, frag_id, max_size)
+
+def test_bundle_round_trip():
+	packets = [b'a' * 10, b'b' * 300, b'c']
+	assert split_datagram(pack_bundle(packets)) == packets
+	assert pack_bundle([b'single']) == b'single'
+	for bundle in group_packets(packets * 10, 400):
+		assert len(pack_bundle(bundle)) <= 400 or len(bundle) == 1
+	with pytest.raises(FramingError):
+		split_datagram(pack_bundle(packets)[:-1])
+
+def test_fragment_sizes():
+	frames = fragments()
+	assert len(frames) == 6
+	assert all(len(frame) <= 1000 for frame in frames)
+
+def test_reassembly_in_order():
+	table = ReassemblyTable()
+	frames = fragments()
+	results = [table.add('a', frame, 0.0) for frame in frames]
+	assert results[:-1] == [None] * (len(frames) - 1)
+	assert results[-1] == DATAGRAM
+	assert (table.pending() == 0) and (table.size == 0) and (table.stats['completed'] == 1)
+
+def test_reassembly_out_of_order():
+	table = ReassemblyTable()
+	frames = fragments()
+	order = [3, 0, 5, 1, 4, 2]
+	results = [table.add('a', frames[i], 0.0) for i in order]
+	assert results[-1] == DATAGRAM
+	assert results[:-1] == [None] * (len(frames) - 1)
+
+def test_reassembly_duplicates_and_invalid():
+	table = ReassemblyTable()
+	frames = fragments()
+	table.add('a', frames[0], 0.0)
+	assert table.add('a', frames[0], 0.0) is None
+	assert table.stats['duplicates'] == 1
+	assert table.add('a', b'\xf5\x00', 0.0) is None
+	assert table.add('a', FRAGMENT_HEADER.pack(FRAGMENT_MAGIC, 2, 3, 3), 0.0) is None
+	assert table.stats['invalid'] == 2
+	for frame in frames[1:]:
+		result = table.add('a', frame, 0.0)
+	assert result == DATAGRAM
+
+def test_reassembly_senders():
+	table = ReassemblyTable()
+	frames_a = fragments(DATAGRAM, 1)
+	frames_b = fragments(DATAGRAM[::-1], 1)
+	# same datagram id from two senders
+	for frame_a, frame_b in zip(frames_a[:-1], frames_b[:-1]):
+		assert table.add('a', frame_a, 0.0) is None
+		assert table.add('b', frame_b, 0.0) is None
+	assert table.add('b', frames_b[-1], 0.0) == DATAGRAM[::-1]
+	assert table.add('a', frames_a[-1], 0.0) == DATAGRAM
+
+def test_reassembly_timeout():
+	table = ReassemblyTable(timeout=1.0)
+	frames = fragments()
+	for frame in frames[:-1]:
+		table.add('a', frame, 0.0)
+	table.expire(0.99)
+	assert table.pending() == 1
+	# the last fragment arrives after the timeout: the reassembly started again
+	assert table.add('a', frames[-1], 1.0) is None
+	assert table.stats['timeout'] == 1
+	assert (table.pending() == 1) and (table.size == len(frames[-1]) - FRAGMENT_HEADER.size)
+	table.expire(2.0)
+	assert (table.pending() == 0) and (table.size == 0) and (table.stats['timeout'] == 2)
+
+def test_reassembly_entry_limit():
+	table = ReassemblyTable(max_entries=2)
+	frames = [fragments(DATAGRAM, frag_id) for frag_id in range(3)]
+	for frag_id in range(3):
+		table.add('a', frames[frag_id][0], 0.0)
+	# the oldest reassembly is evicted
+	assert (table.pending() == 2) and (table.stats['overflow'] == 1)
+	for frame in frames[0][1:]:
+		assert table.add('a', frame, 0.0) is None
+	for frame in frames[2][1:]:
+		result = table.add('a', frame, 0.0)
+	assert result == DATAGRAM
+
+def test_reassembly_byte_limit():
+	chunk = 1000 - FRAGMENT_HEADER.size
+	table = ReassemblyTable(max_bytes=3 * chunk)
+	first = fragments(DATAGRAM, 1)
+	second = fragments(DATAGRAM, 2)
+	table.add('a', first[0], 0.0)
+	table.add('a', first[1], 0.0)
+	table.add('a', second[0], 0.0)
+	assert (table.size == 3 * chunk) and (table.stats['overflow'] == 0)
+	table.add('a', second[1], 0.0)
+	assert (table.stats['overflow'] == 1) and (table.pending() == 1) and (table.size == 2 * chunk)
+	assert table.size <= table.max_bytes
+
+def test_reassembly_table_per_receiver(monkeypatch):
+	monkeypatch.setattr(multicast, 'reassembly_tables', {})
+	table_a = multicast.create_reassembly_table('a')
+	table_b = multicast.create_reassembly_table('b')
+	assert table_a is not table_b
+	assert multicast.get_reassembly_table('a') is table_a
+	frames = fragments()
+	# fragments heard by two receivers are reassembled by each of them
+	for frame in frames[:-1]:
+		table_a.add('sender', frame, 0.0)
+		table_b.add('sender', frame, 0.0)
+	assert table_a.add('sender', frames[-1], 0.0) == DATAGRAM
+	assert table_b.pending() == 1
+	assert table_b.add('sender', frames[-1], 0.0) == DATAGRAM
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# #################################################
+## GEO AREA TESTS - positions inside the circle, rectangle and ellipse destination areas, rotated or not
+# (transport_network/geo_area.py).
+#		usage (from the repository root): python -m pytest tests
+#################################################
+import pytest
+from transport_network.geo_area import *
+
+def test_circle():
+	area = GeoArea('circle', 100.0, 50.0, 10.0)
+	assert area.contains(100.0, 50.0)
+	assert area.contains(110.0, 50.0) and area.contains(100.0, 40.0)
+	assert area.contains(107.0, 57.0)
+	assert not area.contains(108.0, 58.0)
+	assert not area.contains(100.0, 60.1)
+	# b is ignored
+	assert GeoArea('circle', 0.0, 0.0, 10.0, 1.0).contains(0.0, 9.0)
+
+def test_rect():
+	# long axis (a) north-south
+	area = GeoArea('rect', 0.0, 0.0, 100.0, 10.0)
+	assert area.contains(0.0, 100.0) and area.contains(10.0, -100.0)
+	# corners are inside, unlike an ellipse
+	assert area.contains(9.9, 99.9)
+	assert not area.contains(10.1, 0.0)
+	assert not area.contains(0.0, 100.1)
+	assert not area.contains(90.0, 0.0)
+
+def test_ellipse():
+	area = GeoArea('ellipse', 0.0, 0.0, 100.0, 10.0)
+	assert area.contains(0.0, 100.0) and area.contains(10.0, 0.0)
+	assert not area.contains(9.9, 99.9)
+	assert area.contains(6.0, 60.0)
+	assert not area.contains(8.0, 80.0)
+
+@pytest.mark.parametrize('shape', ['rect', 'ellipse'])
+def test_rotated(shape):
+	# long axis east-west
+	area = GeoArea(shape, 0.0, 0.0, 100.0, 10.0, 90)
+	assert area.contains(90.0, 0.0) and area.contains(-90.0, 0.0)
+	assert not area.contains(0.0, 90.0)
+	# long axis north-east
+	area = GeoArea(shape, 0.0, 0.0, 100.0, 10.0, 45)
+	assert area.contains(60.0, 60.0) and area.contains(-60.0, -60.0)
+	assert not area.contains(60.0, -60.0)
+	assert not area.contains(80.0, 0.0)
+
+@pytest.mark.parametrize('shape', AREA_SHAPES)
+@pytest.mark.parametrize('angle', [0, 30, 90, 135, 270])
+def test_bounding_box(shape, angle):
+	area = GeoArea(shape, 20.0, -30.0, 100.0, 40.0, angle)
+	# every position inside the area is inside its box
+	for i in range(-120, 121, 4):
+		for j in range(-120, 121, 4):
+			x, y = 20.0 + i, -30.0 + j
+			if area.function(x, y) >= 0:
+				assert area.in_bbox(x, y) and area.contains(x, y)
+			else:
+				assert not area.contains(x, y)
+
+def test_invalid():
+	with pytest.raises(ValueError):
+		GeoArea('triangle', 0.0, 0.0, 10.0)
+	with pytest.raises(ValueError):
+		GeoArea('rect', 0.0, 0.0, 10.0, 0.0)
+
+def test_geo_area_cache():
+	header = create_area('ellipse', 0.0, 0.0, 100.0, 10.0, 45)
+	area = geo_area(header)
+	assert geo_area(dict(header)) is area
+	assert area.contains(60.0, 60.0)
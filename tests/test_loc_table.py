@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# #################################################
+## LOC TABLE TESTS - expiry of the entries and changes between views (transport_network/loc_table.py).
+#		usage (from the repository root): python -m pytest tests
+#################################################
+from transport_network.loc_table import *
+
+def create_table():
+	return LocTable(1000, 1000, 100)
+
+def entry(node, x=0.0, y=0.0, timeout=None):
+	return {'node': node, 'pos_x': x, 'pos_y': y, 'timeout': timeout}
+
+def test_expire():
+	table = create_table()
+	table.update(entry('1', timeout=10.0), entry('2', 100.0, 100.0, timeout=20.0), entry('3', -300.0, 0.0))
+	assert table.expire(5.0) == []
+	assert table.expire(10.0) == ['1']
+	assert ('1' not in table) and (len(table) == 2)
+	assert table.radius(0.0, 0.0, 50.0) == []
+	# entries without timeout are kept
+	assert table.expire(1000.0) == ['2']
+	assert list(table) == ['3']
+
+def test_expire_refreshed():
+	table = create_table()
+	table.update(entry('1', timeout=10.0))
+	# refreshed by a later beacon: the old deadline is skipped
+	table.update(entry('1', 50.0, 0.0, timeout=20.0))
+	assert table.expire(15.0) == []
+	assert table['1']['pos_x'] == 50.0
+	assert table.expire(20.0) == ['1']
+	assert table.expire(30.0) == []
+
+def test_expire_deleted():
+	table = create_table()
+	table.update(entry('1', timeout=10.0), entry('2', timeout=10.0))
+	assert table.delete('1')
+	assert not table.delete('1')
+	assert table.expire(10.0) == ['2']
+	assert len(table) == 0
+
+def test_changes_since():
+	table = create_table()
+	start = table.view()
+	table.update(entry('1'), entry('2'))
+	middle = table.view()
+	table.update(entry('2', 200.0, 0.0))
+	table.delete('1')
+	table.update(entry('3'))
+	end = table.view()
+	assert table.changes_since(start.generation, end) == {'1', '2', '3'}
+	assert table.changes_since(middle.generation, end) == {'1', '2', '3'}
+	assert table.changes_since(start.generation, middle) == {'1', '2'}
+	assert table.changes_since(end.generation, end) == set()
+	# views are not changed by later publications
+	assert sorted(middle) == ['1', '2'] and middle['2']['pos_x'] == 0.0
+	assert sorted(end) == ['2', '3'] and end['2']['pos_x'] == 200.0
+
+def test_changes_since_expire():
+	table = create_table()
+	table.update(entry('1', timeout=10.0), entry('2'))
+	view = table.view()
+	table.expire(10.0)
+	assert table.changes_since(view.generation, table.view()) == {'1'}
+
+def test_changes_since_unknown():
+	table = create_table()
+	start = table.view()
+	for i in range(CHANGE_LOG + 1):
+		table.update(entry(str(i % 10)))
+	# the first publications are no longer in the log
+	assert table.changes_since(start.generation, table.view()) is None
+	recent = table.view()
+	table.update(entry('a'))
+	assert table.changes_since(recent.generation, table.view()) == {'a'}
+	table.clear()
+	assert len(table) == 0
+	assert table.changes_since(recent.generation, table.view()) is None
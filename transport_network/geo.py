@@ -3,7 +3,14 @@
 ## FUNCTIONS USED BY GEONETWORK LAYER
 #################################################
 import time
-from Queue import Empty
+import ITS_maps as maps
+import ITS_options as its_conf
+from transport_network.geo_area import create_area, geo_area
+from transport_network.geo_routing import geo_next_hop, routing_stats
+
+# destination area tests of the received messages (check_roi): hits, misses (of which bbox_misses rejected by the
+# bounding box) and invalid area headers
+roi_stats = {'hits': 0, 'misses': 0, 'bbox_misses': 0, 'invalid': 0}
 
 #------------------------------------------------------------------------------------------------
 # create_beacon - a beacon is a keep-alive packet used to maintain up-to-date information of neighnour nodes
@@ -23,40 +30,122 @@ def update_node_info(node, x, y, t):
 # update_loc_table_entry - node's neighbourhood is maintained on a table - the loc_table. 
 # 					This table ia update upon reception of a beacon from a neighbour node
 #------------------------------------------------------------------------------------------------
-def update_loc_table_entry(node,loc_table, beacon, lock, validity):
+def update_loc_table_entry(node,loc_table, beacon, validity):
 	neighbour_node=beacon['node']
 	if (neighbour_node==node):
 		return -1
-	lock.acquire()
 	timer = time.time()+validity
-	loc_table.update({beacon['node']:{'node': beacon['node'], 'pos_x':beacon['pos_x'],'pos_y':beacon['pos_y'],'timeout':timer}})
-	print ('loc_table', loc_table)
-	lock.release()
+	loc_table.update({'node': beacon['node'], 'pos_x':beacon['pos_x'],'pos_y':beacon['pos_y'],'timeout':timer})
+	return node
+
+#------------------------------------------------------------------------------------------------
+# update_loc_table_entries - loc_table update with the beacons received together, published at once
+#------------------------------------------------------------------------------------------------
+def update_loc_table_entries(node, loc_table, beacons, validity):
+	timer = time.time()+validity
+	entries = [{'node': beacon['node'], 'pos_x':beacon['pos_x'],'pos_y':beacon['pos_y'],'timeout':timer} for beacon in beacons if beacon['node']!=node]
+	if entries:
+		loc_table.update(*entries)
 	return node
 
 #------------------------------------------------------------------------------------------------
 # delete_loc_table_entry - loc_table entries are removed after a timeout period without receiving a beacon 
-# 				from the correspodent node. This function checks for invalid entries.
+# 				from the correspodent node. Removes the entries whose deadline passed (taken from the deadline heap
+# 				of the loc_table, without scanning the table) and returns the nodes removed
 #------------------------------------------------------------------------------------------------
-def delete_loc_table_entry(loc_table, node, lock):
-	if loc_table is not Empty:
-		for neighbour in list(loc_table):
-			if (node!=neighbour) and (time.time()>loc_table[neighbour]['timeout']):
-				lock.acquire()
-				del (loc_table[neighbour])
-				lock.release()
-	return
+def delete_loc_table_entry(loc_table):
+	return loc_table.expire(time.time())
 
 #------------------------------------------------------------------------------------------------
-# to be done, if needed
+# check_roi - True if the node position pos (x, y) is inside the destination area roi (area header, see
+# 				transport_network/geo_area.py). Positions out of the bounding box of the area are rejected
+# 				without the exact test. Invalid areas do not match.
 #------------------------------------------------------------------------------------------------
 def check_roi(node_info, pos, roi):
-	in_roi=True
+	x, y = pos
+	try:
+		area = geo_area(roi)
+	except (KeyError, TypeError, ValueError):
+		roi_stats['invalid'] += 1
+		return False
+	if not area.in_bbox(x, y):
+		roi_stats['bbox_misses'] += 1
+		roi_stats['misses'] += 1
+		return False
+	in_roi = area.function(x, y) >= 0
+	roi_stats['hits' if in_roi else 'misses'] += 1
 	return in_roi
 
 #------------------------------------------------------------------------------------------------
-# to be done, if needed
+# roi_area - destination area of a DEN/IVIM message from the roi_x, roi_y of its event/situation: rectangle of
+# 				half sides roi_x (along x) and roi_y (along y) centred on the event location, or on the position
+# 				of the sender. None if the message has no roi (0)
+#------------------------------------------------------------------------------------------------
+def roi_area(msg):
+	payload = msg.get('event') or msg.get('situation')
+	if not isinstance(payload, dict):
+		return None
+	roi_x = payload.get('roi_x') or 0
+	roi_y = payload.get('roi_y') or 0
+	if (roi_x <= 0) or (roi_y <= 0):
+		return None
+	location = payload.get('location') or {}
+	return create_area('rect', location.get('x', msg['pos_x']), location.get('y', msg['pos_y']), roi_x, roi_y, 90)
+
+#------------------------------------------------------------------------------------------------
+# find_next_hop - next hop to reach dest_node: the destination itself when it is a neighbour (in the loc_table),
+# 				otherwise, for a message with the position of the destination (msg['dest_pos']), the neighbour chosen
+# 				by greedy/perimeter forwarding from the node position pos (transport_network/geo_routing.py).
+# 				0 if not known
 #------------------------------------------------------------------------------------------------
-def find_next_hop(node_info, loc_table, dest_node):
+def find_next_hop(node_info, loc_table, dest_node, pos=None, msg=None, graph=None):
 	next_hop=0
+	if dest_node in loc_table:
+		next_hop=dest_node
+		routing_stats['direct'] += 1
+	elif (pos is not None) and (msg is not None) and (graph is not None) and msg.get('dest_pos'):
+		next_hop=geo_next_hop(node_info['node_id'], pos[0], pos[1], loc_table, graph, msg)
 	return next_hop
+
+#------------------------------------------------------------------------------------------------
+# route_message - next hop of a message addressed to a node (msg['dest']), sent by the node at pos (x, y) with the
+# 				neighbours of the loc_table view neighbours. Greedy/perimeter forwarding through other nodes
+# 				(graph) is used only with its_conf.forwarding_model: without it, only a destination in the
+# 				neighbourhood is a next hop. A node relaying the message of another node puts its own position and
+# 				type in the header (the range of the transmission is the range of the relay), keeping the ones of the
+# 				originator in msg['gn_src'] (see originator_message). Returns False if the message must be dropped
+# 				(forwarded, without a next hop)
+#------------------------------------------------------------------------------------------------
+def route_message(node_interface, neighbours, pos, msg, graph=None):
+	msg.pop('next_hop', None)
+	if (msg['node'] != node_interface['node_id']):
+		if 'gn_src' not in msg:
+			msg['gn_src'] = [msg['pos_x'], msg['pos_y'], msg['node_type']]
+		msg['pos_x'], msg['pos_y'] = pos
+		msg['node_type'] = node_interface['type']
+	next_hop = find_next_hop(node_interface, neighbours, msg['dest'], pos, msg, graph if its_conf.forwarding_model else None)
+	if next_hop:
+		msg['next_hop'] = next_hop
+		return True
+	return 'gn_prev' not in msg
+
+#------------------------------------------------------------------------------------------------
+# originator_message - message with the position and type of its originator in the header, as sent by it
+# 				(a copy, if relays changed them)
+#------------------------------------------------------------------------------------------------
+def originator_message(msg):
+	if 'gn_src' not in msg:
+		return msg
+	msg = dict(msg)
+	msg['pos_x'], msg['pos_y'], msg['node_type'] = msg.pop('gn_src')
+	return msg
+
+#------------------------------------------------------------------------------------------------
+# address_message - addresses a message to a node of ITS_maps.map (GeoUnicast): msg['dest'] and the position of
+# 				the node, msg['dest_pos'] (the map is the location service of the fixed nodes)
+#------------------------------------------------------------------------------------------------
+def address_message(msg, dest):
+	node = maps.map[dest]
+	msg['dest'] = dest
+	msg['dest_pos'] = {'x': node['x'], 'y': node['y']}
+	return msg
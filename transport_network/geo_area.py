@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# #################################################
+## GEO AREA - geocast destination areas (ETSI EN 302 931), carried in the geonetworking header of the messages
+# (msg['area']): {'shape': 'circle' | 'rect' | 'ellipse', 'x', 'y': centre, 'a', 'b': distances (m), 'angle'}
+#		circle - radius a
+#		rect - rectangle of half sides a (long axis) and b
+#		ellipse - semi-axes a (long axis) and b
+# angle: azimuth of the long axis, in degrees clockwise from north (the y axis). A position is inside the area if
+# F(x, y) >= 0, F being the geometric function of the shape in the coordinates of the area:
+#		circle 1 - (x/a)^2 - (y/a)^2    rect min(1 - (x/a)^2, 1 - (y/b)^2)    ellipse 1 - (x/a)^2 - (y/b)^2
+# GeoArea precomputes the rotation and the bounding box of an area, tested first to reject far positions.
+#################################################
+import math
+
+AREA_SHAPES = ('circle', 'rect', 'ellipse')
+
+# areas compiled by geo_area, by header (cleared when it holds AREA_CACHE areas)
+AREA_CACHE = 256
+area_cache = {}
+
+#------------------------------------------------------------------------------------------------
+# GeoArea - destination area with its rotation and bounding box precomputed
+#------------------------------------------------------------------------------------------------
+class GeoArea:
+
+	__slots__ = ('shape', 'x', 'y', 'a2', 'b2', 'sin', 'cos', 'x_min', 'x_max', 'y_min', 'y_max')
+
+	def __init__(self, shape, x, y, a, b=0, angle=0):
+		if shape not in AREA_SHAPES:
+			raise ValueError('unknown area shape: {}'.format(shape))
+		if (shape == 'circle'):
+			b = a
+		if (a <= 0) or (b <= 0):
+			raise ValueError('area distances must be positive: a={} b={}'.format(a, b))
+		self.shape = shape
+		self.x = x
+		self.y = y
+		self.a2 = float(a) * a
+		self.b2 = float(b) * b
+		self.sin = math.sin(math.radians(angle))
+		self.cos = math.cos(math.radians(angle))
+		# half sizes of the box holding the rotated shape
+		if (shape == 'rect'):
+			half_x = abs(a * self.sin) + abs(b * self.cos)
+			half_y = abs(a * self.cos) + abs(b * self.sin)
+		else:
+			half_x = math.hypot(a * self.sin, b * self.cos)
+			half_y = math.hypot(a * self.cos, b * self.sin)
+		self.x_min, self.x_max = x - half_x, x + half_x
+		self.y_min, self.y_max = y - half_y, y + half_y
+
+	def in_bbox(self, x, y):
+		return (self.x_min <= x <= self.x_max) and (self.y_min <= y <= self.y_max)
+
+	#------------------------------------------------------------------------------------------------
+	# function - geometric function F of the position (x, y): > 0 inside, 0 on the border, < 0 outside
+	#------------------------------------------------------------------------------------------------
+	def function(self, x, y):
+		dx = x - self.x
+		dy = y - self.y
+		# coordinates along the long axis and across it
+		u = dx * self.sin + dy * self.cos
+		v = dx * self.cos - dy * self.sin
+		if (self.shape == 'rect'):
+			return min(1.0 - u * u / self.a2, 1.0 - v * v / self.b2)
+		return 1.0 - u * u / self.a2 - v * v / self.b2
+
+	def contains(self, x, y):
+		return self.in_bbox(x, y) and (self.function(x, y) >= 0)
+
+#------------------------------------------------------------------------------------------------
+# create_area - geonetworking header of a destination area
+#------------------------------------------------------------------------------------------------
+def create_area(shape, x, y, a, b=0, angle=0):
+	return {'shape': shape, 'x': x, 'y': y, 'a': a, 'b': b, 'angle': angle}
+
+#------------------------------------------------------------------------------------------------
+# geo_area - GeoArea of an area header, compiled once for the messages carrying the same area
+#------------------------------------------------------------------------------------------------
+def geo_area(area):
+	key = (area['shape'], area['x'], area['y'], area['a'], area.get('b', 0), area.get('angle', 0))
+	compiled = area_cache.get(key)
+	if compiled is None:
+		if len(area_cache) >= AREA_CACHE:
+			area_cache.clear()
+		compiled = area_cache[key] = GeoArea(*key)
+	return compiled
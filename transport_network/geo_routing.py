@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# #################################################
+## GEO ROUTING - GeoUnicast forwarding towards the position of the destination (msg['dest_pos'] {'x', 'y'}):
+#		greedy - the next hop is the neighbour closest to the destination (nearest query of the loc_table), if
+#		         it is closer than the node itself
+#		perimeter - when greedy forwarding reaches a local maximum, the message goes around the faces of the planar
+#		            graph of the neighbours (Gabriel graph) by the right-hand rule, changing face where an edge
+#		            crosses the line from the perimeter entry point (gn_lp) to the destination, until it reaches a
+#		            node closer to the destination than gn_lp, where greedy forwarding resumes (GPSR)
+# Routing state carried in the geonetworking header of the message: gn_mode ('greedy' | 'perimeter'), gn_lp and
+# gn_lf (entry point and last face change point), gn_e0 (first edge of the face: a message about to traverse it
+# again is dropped), gn_prev (previous hop [node, x, y]) and gn_hops (hops left). The relays put their own position
+# in the header, the originator position is kept in gn_src (route_message in transport_network/geo.py).
+#		routing_stats: direct, greedy, perimeter (hops), recovered (back to greedy), dropped
+#################################################
+import math, threading
+import ITS_options as its_conf
+
+routing_stats = {'direct': 0, 'greedy': 0, 'perimeter': 0, 'recovered': 0, 'dropped': 0}
+
+# a neighbour inside the circle of diameter (node, v) by less than PLANAR_EPSILON metres does not remove the edge
+PLANAR_EPSILON = 1e-6
+
+#------------------------------------------------------------------------------------------------
+# PlanarGraph - Gabriel graph of a node and its neighbours: the edge (node, v) is kept if no other neighbour is
+#		inside the circle of diameter (node, v). Witnesses are found with radius queries of the loc_table. The graph
+#		is updated with the nodes changed in the loc_table since the last update (rebuilt if the node moved):
+#		a changed neighbour is tested again, may remove kept edges, and the edges it removed are tested again
+#------------------------------------------------------------------------------------------------
+class PlanarGraph:
+
+	def __init__(self, loc_table):
+		self.loc_table = loc_table
+		self.lock = threading.Lock()
+		self.generation = None
+		self.position = None
+		self.kept = {}
+		self.witness = {}
+		self.removed_by = {}
+		self.stats = {'rebuilt': 0, 'updated': 0}
+
+	#------------------------------------------------------------------------------------------------
+	# neighbours - planar neighbours {node: entry} of the node at (x, y), with the neighbours of view
+	#------------------------------------------------------------------------------------------------
+	def neighbours(self, view, x, y):
+		with self.lock:
+			changed = None
+			if (self.generation is not None) and (self.position == (x, y)):
+				changed = self.loc_table.changes_since(self.generation, view)
+			if changed is None:
+				self.rebuild(view, x, y)
+			elif changed:
+				for node in changed:
+					self.refresh(view, node)
+				self.stats['updated'] += 1
+			self.generation = view.generation
+			return dict(self.kept)
+
+	def rebuild(self, view, x, y):
+		self.position = (x, y)
+		self.kept = {}
+		self.witness = {}
+		self.removed_by = {}
+		for node, entry in view.items():
+			self.test(view, node, entry)
+		self.stats['rebuilt'] += 1
+
+	# keeps or removes the edge to a neighbour
+	def test(self, view, node, entry):
+		x, y = self.position
+		mx = (x + entry['pos_x']) / 2.0
+		my = (y + entry['pos_y']) / 2.0
+		r = math.hypot(entry['pos_x'] - x, entry['pos_y'] - y) / 2.0
+		for other in view.radius(mx, my, r):
+			if (other['node'] != node) and (math.hypot(other['pos_x'] - mx, other['pos_y'] - my) < r - PLANAR_EPSILON):
+				self.witness[node] = other['node']
+				self.removed_by.setdefault(other['node'], set()).add(node)
+				return
+		self.kept[node] = entry
+
+	def refresh(self, view, node):
+		self.kept.pop(node, None)
+		witness = self.witness.pop(node, None)
+		if witness is not None:
+			self.removed_by.get(witness, set()).discard(node)
+		# edges the node removed
+		for removed in self.removed_by.pop(node, ()):
+			self.witness.pop(removed, None)
+			entry = view.get(removed)
+			if entry is not None:
+				self.test(view, removed, entry)
+		entry = view.get(node)
+		if entry is None:
+			return
+		self.test(view, node, entry)
+		# kept edges the node may remove
+		x, y = self.position
+		for kept, kept_entry in list(self.kept.items()):
+			if kept == node:
+				continue
+			mx = (x + kept_entry['pos_x']) / 2.0
+			my = (y + kept_entry['pos_y']) / 2.0
+			r = math.hypot(kept_entry['pos_x'] - x, kept_entry['pos_y'] - y) / 2.0
+			if math.hypot(entry['pos_x'] - mx, entry['pos_y'] - my) < r - PLANAR_EPSILON:
+				del self.kept[kept]
+				self.witness[kept] = node
+				self.removed_by.setdefault(node, set()).add(kept)
+
+#------------------------------------------------------------------------------------------------
+# right_hand - first planar neighbour counterclockwise about (x, y) from the direction bearing (radians).
+#		exclude is taken only if there is no other neighbour
+#------------------------------------------------------------------------------------------------
+def right_hand(planar, x, y, bearing, exclude=None):
+	best = None
+	best_angle = None
+	for node, entry in planar.items():
+		if node == exclude:
+			continue
+		angle = (math.atan2(entry['pos_y'] - y, entry['pos_x'] - x) - bearing) % (2 * math.pi)
+		if angle == 0:
+			angle = 2 * math.pi
+		if (best_angle is None) or (angle < best_angle):
+			best, best_angle = node, angle
+	if (best is None) and (exclude in planar):
+		return exclude
+	return best
+
+# intersection of the segments p1-p2 and p3-p4, or None
+def intersection(p1, p2, p3, p4):
+	d = (p2[0] - p1[0]) * (p4[1] - p3[1]) - (p2[1] - p1[1]) * (p4[0] - p3[0])
+	if d == 0:
+		return None
+	t = ((p3[0] - p1[0]) * (p4[1] - p3[1]) - (p3[1] - p1[1]) * (p4[0] - p3[0])) / d
+	u = ((p3[0] - p1[0]) * (p2[1] - p1[1]) - (p3[1] - p1[1]) * (p2[0] - p1[0])) / d
+	if (0 < t < 1) and (0 < u < 1):
+		return (p1[0] + t * (p2[0] - p1[0]), p1[1] + t * (p2[1] - p1[1]))
+	return None
+
+#------------------------------------------------------------------------------------------------
+# geo_next_hop - next hop of a message from the node at (x, y) to msg['dest_pos'], with the neighbours of view
+#		and their planar graph. Updates the routing state of the message. Returns 0 if the message must be dropped
+#------------------------------------------------------------------------------------------------
+def geo_next_hop(node, x, y, view, graph, msg):
+	hops = msg.get('gn_hops', its_conf.geounicast_max_hops)
+	if hops <= 0:
+		routing_stats['dropped'] += 1
+		return 0
+	dest = (msg['dest_pos']['x'], msg['dest_pos']['y'])
+	distance = math.hypot(dest[0] - x, dest[1] - y)
+
+	if (msg.get('gn_mode') == 'perimeter'):
+		lp = msg['gn_lp']
+		if distance < math.hypot(dest[0] - lp[0], dest[1] - lp[1]):
+			for key in ('gn_lp', 'gn_lf', 'gn_e0'):
+				msg.pop(key, None)
+			msg['gn_mode'] = 'greedy'
+			routing_stats['recovered'] += 1
+
+	if (msg.get('gn_mode', 'greedy') == 'greedy'):
+		closest = view.nearest(dest[0], dest[1], 1, exclude=(node,))
+		if closest and (math.hypot(closest[0]['pos_x'] - dest[0], closest[0]['pos_y'] - dest[1]) < distance):
+			routing_stats['greedy'] += 1
+			return forward(msg, node, x, y, closest[0]['node'], hops)
+		# local maximum: perimeter mode, starting with the first edge counterclockwise from the destination
+		msg['gn_mode'] = 'perimeter'
+		msg['gn_lp'] = [x, y]
+		msg['gn_lf'] = [x, y]
+		msg['gn_e0'] = None
+		bearing = math.atan2(dest[1] - y, dest[0] - x)
+		previous = None
+	else:
+		previous, prev_x, prev_y = msg['gn_prev']
+		bearing = math.atan2(prev_y - y, prev_x - x)
+
+	planar = graph.neighbours(view, x, y)
+	next_hop = right_hand(planar, x, y, bearing, previous)
+	# face change: the edge crosses the line gn_lp - destination closer to the destination than gn_lf
+	lf = msg['gn_lf']
+	for i in range(len(planar)):
+		if next_hop is None:
+			break
+		entry = planar[next_hop]
+		crossing = intersection((x, y), (entry['pos_x'], entry['pos_y']), msg['gn_lp'], dest)
+		if (crossing is None) or (math.hypot(dest[0] - crossing[0], dest[1] - crossing[1]) >= math.hypot(dest[0] - lf[0], dest[1] - lf[1])):
+			break
+		lf = msg['gn_lf'] = [crossing[0], crossing[1]]
+		msg['gn_e0'] = None
+		next_hop = right_hand(planar, x, y, math.atan2(entry['pos_y'] - y, entry['pos_x'] - x), next_hop)
+	if next_hop is None:
+		routing_stats['dropped'] += 1
+		return 0
+	# the first edge of the face is traversed again: the destination is not reachable
+	if msg.get('gn_e0') is None:
+		msg['gn_e0'] = [node, next_hop]
+	elif (msg['gn_e0'] == [node, next_hop]):
+		routing_stats['dropped'] += 1
+		return 0
+	routing_stats['perimeter'] += 1
+	return forward(msg, node, x, y, next_hop, hops)
+
+def forward(msg, node, x, y, next_hop, hops):
+	msg['gn_prev'] = [node, x, y]
+	msg['gn_hops'] = hops - 1
+	return next_hop
@@ -5,6 +5,9 @@
 #################################################
 import sys, os, time, threading
 from transport_network.geo import *
+from transport_network.loc_table import LocTable
+from transport_network.geo_routing import PlanarGraph
+from data_link.duplicates import DuplicateFilter
 from gps_info.gps_reader import position_read
 import application.app_config as app_conf
 
@@ -12,18 +15,22 @@ sys.path.append(os.path.abspath(".."))
 import ITS_options as its_conf
 
 
-loc_table=dict()
+# neighbour table, indexed by position (transport_network/loc_table.py)
+loc_table=LocTable()
+# planar graph of the neighbours, for perimeter forwarding (transport_network/geo_routing.py)
+planar_graph=PlanarGraph(loc_table)
 pkt_beacon=dict()
 
-lock_loc_table = threading.Lock()
-
 #------------------------------------------------------------------------------------------------
 # Thread - geonetwork_txd - message transmission in geocast mode. 
 #		Note: current version is just a place holder. Future versions must include support for:
 # 			1) geocast communication - messsages are trasmitted only it the node has, at least, one neigbour
 #			2) unicast communication - location-based routing and a location service
+#	Messages addressed to a node (msg['dest']) go to the destination if it is a neighbour or, with
+#	its_conf.forwarding_model, if they carry the position of the destination (msg['dest_pos']), to the next hop of
+#	greedy/perimeter forwarding (route_message). Messages being forwarded without a next hop are dropped
 #------------------------------------------------------------------------------------------------
-def geonetwork_txd(node_interface, start_flag, geonetwork_txd_queue, multicast_txd_queue):
+def geonetwork_txd(node_interface, start_flag, coordinates, geonetwork_txd_queue, multicast_txd_queue):
 
 	node_id = node_interface['node_id']
 	while not start_flag.isSet():
@@ -35,8 +42,23 @@ def geonetwork_txd(node_interface, start_flag, geonetwork_txd_queue, multicast_t
 		msg_rxd=geonetwork_txd_queue.get()
 		if (app_conf.debug_geo_net):
 			print('STATUS: Message received from getnetwork queue  - THREAD: geonetwork_txd - NODE: {}'.format(node_id),' - MSG: {}'.format(msg_rxd),'\n')
+		# geocast: DEN/IVIM messages with a region of interest carry its destination area in the header
+		if (its_conf.roi_model) and ('area' not in msg_rxd):
+			area = roi_area(msg_rxd)
+			if area:
+				msg_rxd['area'] = area
+		# neighbours published by beacon_rxd/check_loc_table (read without locking)
+		neighbours = loc_table.view()
+		# messages addressed to a node (msg['dest']) carry their next hop: sent by unicast to it (unicast_model) and
+		# forwarded by it (forwarding_model)
+		if (its_conf.unicast_model or its_conf.forwarding_model) and msg_rxd.get('dest'):
+			x,y,t=position_read(coordinates)
+			if not route_message(node_interface, neighbours, (x, y), msg_rxd, planar_graph):
+				if (app_conf.debug_geo_net):
+					print('STATUS: Message discarded (no next hop) - THREAD: geonetwork_txd - NODE: {}'.format(node_id),' - MSG: {}'.format(msg_rxd),'\n')
+				continue
 		if (its_conf.geonetwork_model):
-			if loc_table:
+			if neighbours:
 				if (app_conf.debug_geo_net):
 					print('STATUS: Message send to multicast queue - THREAD: geonetwork_txd - NODE: {}'.format(node_id),' - MSG: {}'.format(msg_rxd),'\n')
 				multicast_txd_queue.put(msg_rxd)
@@ -53,8 +75,15 @@ def geonetwork_txd(node_interface, start_flag, geonetwork_txd_queue, multicast_t
 #	Note: current version is just a place holder. Future versions must include support for:
 #		1) geocast communication - including region-of-interest (roi) processing
 #		2) unicast communication - location-based routing and a location service
+#	With its_conf.roi_model, messages with a destination area (msg['area']) not including the node position are
+#	dropped (counters in roi_stats)
+#	With its_conf.forwarding_model, messages addressed to another node are not delivered: the node forwards them
+#	(geonetwork_txd_queue) if it is their next hop (set by geonetwork_txd with forwarding_model). The message
+#	forwarded is a copy, as geonetwork_txd changes its
+#	header while the other nodes of the process may still read the received message (memory medium). Copies of a
+#	message received through several paths are delivered once (duplicate_stats['geonetworking'])
 #------------------------------------------------------------------------------------------------
-def geonetwork_rxd(node_interface, start_flag, multicast_rxd_queue, geonetwork_rxd_ca_queue, geonetwork_rxd_den_queue, geonetwork_rxd_spat_queue, geonetwork_rxd_ivim_queue,):
+def geonetwork_rxd(node_interface, start_flag, coordinates, multicast_rxd_queue, geonetwork_rxd_ca_queue, geonetwork_rxd_den_queue, geonetwork_rxd_spat_queue, geonetwork_rxd_ivim_queue, geonetwork_txd_queue=None):
 
 	global loc_table
 
@@ -63,19 +92,44 @@ def geonetwork_rxd(node_interface, start_flag, multicast_rxd_queue, geonetwork_r
 		time.sleep (1)
 	if (app_conf.debug_sys):
 		print('STATUS: Ready to start - THREAD: geonetwork_rxd - NODE: {}'.format(node_interface["node_id"]),'\n')
+	duplicates = None
+	if (its_conf.forwarding_model):
+		duplicates = DuplicateFilter(its_conf.duplicate_max_entries, its_conf.duplicate_ttl, its_conf.duplicate_window, 'geonetworking')
 
 	while True:
-		msg_rxd=multicast_rxd_queue.get()
-		if (app_conf.debug_geo_net):
-			print('STATUS: Message received from multicast queue - THREAD: geonetwork_rxd - NODE: {}'.format(node_id),' - MSG: {}'.format(msg_rxd),'\n')
-		if (msg_rxd['msg_type']=='CA'):
-			geonetwork_rxd_ca_queue.put(msg_rxd)
-		elif (msg_rxd['msg_type']=='DEN'):
-			geonetwork_rxd_den_queue.put(msg_rxd)
-		elif (msg_rxd['msg_type']=='SPAT'):
-			geonetwork_rxd_spat_queue.put(msg_rxd)
-		elif (msg_rxd['msg_type']=='IVIM'):
-			geonetwork_rxd_ivim_queue.put(msg_rxd)
+		# multicast_rxd delivers a message or a list of messages received together
+		msgs_rxd=multicast_rxd_queue.get()
+		if not isinstance(msgs_rxd, list):
+			msgs_rxd = [msgs_rxd]
+		for msg_rxd in msgs_rxd:
+			if (app_conf.debug_geo_net):
+				print('STATUS: Message received from multicast queue - THREAD: geonetwork_rxd - NODE: {}'.format(node_id),' - MSG: {}'.format(msg_rxd),'\n')
+			if (its_conf.roi_model) and ('area' in msg_rxd):
+				x,y,t=position_read(coordinates)
+				if not check_roi(node_interface, (x, y), msg_rxd['area']):
+					if (app_conf.debug_geo_net):
+						print('STATUS: Message discarded (out of the destination area) - THREAD: geonetwork_rxd - NODE: {}'.format(node_id),' - MSG: {}'.format(msg_rxd),'\n')
+					continue
+			if (its_conf.forwarding_model) and msg_rxd.get('dest') and (msg_rxd['dest'] != node_id):
+				if (msg_rxd.get('next_hop') == node_id) and (geonetwork_txd_queue is not None):
+					if (app_conf.debug_geo_net):
+						print('STATUS: Message forwarded - THREAD: geonetwork_rxd - NODE: {}'.format(node_id),' - MSG: {}'.format(msg_rxd),'\n')
+					geonetwork_txd_queue.put(dict(msg_rxd))
+				continue
+			if (duplicates is not None) and duplicates.is_duplicate(msg_rxd):
+				if (app_conf.debug_geo_net):
+					print('STATUS: Message discarded (duplicate) - THREAD: geonetwork_rxd - NODE: {}'.format(node_id),' - MSG: {}'.format(msg_rxd),'\n')
+				continue
+			# messages relayed to the node are delivered as sent by their originator
+			msg_rxd = originator_message(msg_rxd)
+			if (msg_rxd['msg_type']=='CA'):
+				geonetwork_rxd_ca_queue.put(msg_rxd)
+			elif (msg_rxd['msg_type']=='DEN'):
+				geonetwork_rxd_den_queue.put(msg_rxd)
+			elif (msg_rxd['msg_type']=='SPAT'):
+				geonetwork_rxd_spat_queue.put(msg_rxd)
+			elif (msg_rxd['msg_type']=='IVIM'):
+				geonetwork_rxd_ivim_queue.put(msg_rxd)
 
 	return
 
@@ -104,10 +158,9 @@ def beacon_txd(node_interface, start_flag, coordinates, multicast_txd_queue):
 	return
 #------------------------------------------------------------------------------------------------
 # Thread -- beacon_rxd - reception of beacon packets and loc_table update
-#		Note: - entry_validity defines the timeout value. The value used is very high to avoid removing entries for the table
+#		Note: - its_conf.loc_table_validity defines the timeout value
 #------------------------------------------------------------------------------------------------
 def beacon_rxd(node_interface, start_flag, beacon_rxd_queue):
-	ENTRY_VALIDITY = 2000
 	global loc_table
 
 	node_id = node_interface['node_id']
@@ -117,17 +170,22 @@ def beacon_rxd(node_interface, start_flag, beacon_rxd_queue):
 		print('STATUS: Ready to start - THREAD: beacon_rxd - NODE: {}'.format(node_id),'\n')
 
 	while True :
-		beacon_pkt_rxd=beacon_rxd_queue.get()
+		# a beacon or a list of beacons received together
+		beacon_pkts_rxd=beacon_rxd_queue.get()
+		if not isinstance(beacon_pkts_rxd, list):
+			beacon_pkts_rxd = [beacon_pkts_rxd]
 		if (app_conf.debug_beacon):
-			print('STATUS: Beacon received from beacon queue - THREAD:  beacon_rxd - NODE: {}'.format(node_id),' - MSG: {}'.format(beacon_pkt_rxd),'\n')
-		neighbour_node=update_loc_table_entry (node_id, loc_table, beacon_pkt_rxd, lock_loc_table, ENTRY_VALIDITY)
+			for beacon_pkt_rxd in beacon_pkts_rxd:
+				print('STATUS: Beacon received from beacon queue - THREAD:  beacon_rxd - NODE: {}'.format(node_id),' - MSG: {}'.format(beacon_pkt_rxd),'\n')
+		# the beacons received together are published in one loc_table view
+		update_loc_table_entries (node_id, loc_table, beacon_pkts_rxd, its_conf.loc_table_validity)
 		if (app_conf.debug_beacon):
 			print('STATUS: Loc_table_updated - THREAD:  beacon_rxd - NODE: {}'.format(node_id),' - MSG: {}'.format(loc_table),'\n')
 	return
 
 #------------------------------------------------------------------------------------------------
 # Thread -- check_loc_table - verification of the loc_table status and remove unused entries
-#		Note: - entry_validity defines the timeout value. The value used is very high to avoid removing entries for the table
+#		Note: - the thread sleeps until the earliest deadline of the loc_table entries
 #------------------------------------------------------------------------------------------------
 def check_loc_table(node_interface, start_flag):
 	global loc_table
@@ -139,8 +197,8 @@ def check_loc_table(node_interface, start_flag):
 		print('STATUS: Ready to start - THREAD: check_loc_table - NODE: {}'.format(node_id),'\n')
 
 	while True :
-		time.sleep (1)
-		delete_loc_table_entry(loc_table, node_id, lock_loc_table)
-		if (app_conf.debug_beacon):
+		loc_table.wait_deadline()
+		expired = delete_loc_table_entry(loc_table)
+		if (app_conf.debug_beacon) and expired:
 			print('STATUS: Loc_table_updated - THREAD:  check_loc_table - NODE: {}'.format(node_id),' - MSG: {}'.format(loc_table),'\n')
 	return
@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+# #################################################
+## LOC TABLE - neighbour table of the geonetworking layer, indexed by node and by position.
+# Entries are the dictionaries {'node', 'pos_x', 'pos_y', 'timeout'} of the original loc_table, kept in a
+# uniform grid of cells of its_conf.loc_table_cell metres over the map area (ITS_maps.size_x x size_y, centred
+# on the origin). Positions out of the area are kept in the border cells.
+#		update/delete - the entry moves to the cell of its last position
+#		radius(x, y, r) - entries within r metres of (x, y), from the cells overlapping the query box (every entry
+#		                  of small tables, and of tables with fewer entries than the cells of the box)
+#		nearest(x, y, k) - k entries closest to (x, y), searching rings of cells around (x, y)
+#		expire() - removes the entries whose 'timeout' passed. Deadlines are kept in a min-heap: an entry refreshed
+#		           by a beacon leaves its old deadline in the heap, skipped when popped (lazy invalidation), so
+#		           expiring costs O(expired.log n). wait_deadline() sleeps until the earliest deadline
+# Read-copy-update: the entries are published in an immutable LocTableView. Writers (update, delete, expire) take
+# the table lock, copy the parts of the current view they change and publish the new view with the next generation.
+# Cells and node buckets are kept in two levels (rows of cells, groups of buckets), so a writer copies the cells
+# and buckets touched and their row and group, whatever the size of the table. Readers take the current view
+# (view()) without locking and query it as long as they need. The queries of the table (in, [], get, len, iteration, radius,
+# nearest) are made on the current view. The nodes changed by the last CHANGE_LOG publications are kept, so that
+# structures derived from the table (the planar graph of transport_network/geo_routing.py) are updated incrementally.
+#################################################
+import heapq, math, threading, time
+from collections import deque
+import ITS_maps as maps
+import ITS_options as its_conf
+
+# tables of up to NEAREST_SCAN entries are scanned by nearest (the rings would be mostly empty)
+NEAREST_SCAN = 64
+
+# the deadline heap is rebuilt when it holds more than HEAP_SLACK times the entries (deadlines of refreshed entries)
+HEAP_SLACK = 4
+
+# the entries of a view are split by node in NODE_GROUPS groups of NODE_BUCKETS dictionaries, so that a writer
+# copies one of them and its group
+NODE_GROUPS = 64
+NODE_BUCKETS = 64
+NODE_SLOTS = NODE_GROUPS * NODE_BUCKETS
+
+# publications whose changed nodes are kept (changes_since)
+CHANGE_LOG = 1024
+
+#------------------------------------------------------------------------------------------------
+# Grid - cells of the map area
+#------------------------------------------------------------------------------------------------
+class Grid:
+
+	def __init__(self, size_x, size_y, cell):
+		self.cell = float(cell)
+		self.x0 = -size_x / 2.0
+		self.y0 = -size_y / 2.0
+		self.nx = max(int(math.ceil(size_x / self.cell)), 1)
+		self.ny = max(int(math.ceil(size_y / self.cell)), 1)
+
+	def cell_index(self, x, y):
+		cx = int((x - self.x0) // self.cell)
+		cy = int((y - self.y0) // self.cell)
+		return (min(max(cx, 0), self.nx - 1), min(max(cy, 0), self.ny - 1))
+
+	# cells at Chebyshev distance ring of the cell (cx, cy), inside the grid
+	def ring_cells(self, cx, cy, ring):
+		if ring == 0:
+			return [(cx, cy)]
+		keys = []
+		x_min, x_max = max(cx - ring, 0), min(cx + ring, self.nx - 1)
+		y_min, y_max = max(cy - ring, 0), min(cy + ring, self.ny - 1)
+		for key_y in (cy - ring, cy + ring):
+			if 0 <= key_y < self.ny:
+				keys.extend((key_x, key_y) for key_x in range(x_min, x_max + 1))
+		for key_x in (cx - ring, cx + ring):
+			if 0 <= key_x < self.nx:
+				keys.extend((key_x, key_y) for key_y in range(max(cy - ring + 1, 0), min(cy + ring - 1, self.ny - 1) + 1))
+		return keys
+
+	# distance from (x, y) to the closest cell not searched after ring, None if every cell was searched.
+	# The border cells extend to infinity (they keep the positions out of the area)
+	def searched_distance(self, x, y, cx, cy, ring):
+		bounds = []
+		if cx - ring > 0:
+			bounds.append(x - (self.x0 + (cx - ring) * self.cell))
+		if cx + ring < self.nx - 1:
+			bounds.append(self.x0 + (cx + ring + 1) * self.cell - x)
+		if cy - ring > 0:
+			bounds.append(y - (self.y0 + (cy - ring) * self.cell))
+		if cy + ring < self.ny - 1:
+			bounds.append(self.y0 + (cy + ring + 1) * self.cell - y)
+		if not bounds:
+			return None
+		return max(min(bounds), 0.0)
+
+	def border(self, key):
+		return (key[0] in (0, self.nx - 1)) or (key[1] in (0, self.ny - 1))
+
+#------------------------------------------------------------------------------------------------
+# LocTableView - entries of the table published at a generation, never modified once published
+#		rows: grid.ny dictionaries {cx: {node: entry}} of the occupied cells (cx, cy) of each row
+#		groups: NODE_GROUPS tuples of NODE_BUCKETS dictionaries {node: entry}, slot hash(node) % NODE_SLOTS
+#------------------------------------------------------------------------------------------------
+class LocTableView:
+
+	__slots__ = ('grid', 'rows', 'groups', 'count', 'generation')
+
+	def __init__(self, grid, rows, groups, count, generation):
+		self.grid = grid
+		self.rows = rows
+		self.groups = groups
+		self.count = count
+		self.generation = generation
+
+	def get(self, node, default=None):
+		group, bucket = divmod(hash(node) % NODE_SLOTS, NODE_BUCKETS)
+		return self.groups[group][bucket].get(node, default)
+
+	# occupied cells {node: entry}
+	def cells(self):
+		return (cell for row in self.rows for cell in row.values())
+
+	def items(self):
+		return [item for cell in self.cells() for item in cell.items()]
+
+	def entries(self):
+		return {node: entry for cell in self.cells() for node, entry in cell.items()}
+
+	#------------------------------------------------------------------------------------------------
+	# radius - entries within r metres of (x, y), not sorted
+	#------------------------------------------------------------------------------------------------
+	def radius(self, x, y, r):
+		grid = self.grid
+		found = []
+		r2 = r * r
+		if self.count > NEAREST_SCAN:
+			cx_min, cy_min = grid.cell_index(x - r, y - r)
+			cx_max, cy_max = grid.cell_index(x + r, y + r)
+		if (self.count <= NEAREST_SCAN) or (self.count < (cx_max - cx_min + 1) * (cy_max - cy_min + 1)):
+			# the cells of the box would cost more than testing every entry
+			for row in self.rows:
+				for cell in row.values():
+					for entry in cell.values():
+						dx = entry['pos_x'] - x
+						dy = entry['pos_y'] - y
+						if dx * dx + dy * dy <= r2:
+							found.append(entry)
+			return found
+		size = grid.cell
+		last_x = grid.nx - 1
+		last_y = grid.ny - 1
+		for cy in range(cy_min, cy_max + 1):
+			row = self.rows[cy]
+			if not row:
+				continue
+			y_min = grid.y0 + cy * size
+			dy = max(abs(y - y_min), abs(y - y_min - size))
+			# cells inside the circle need no distance test (border cells keep the positions out of the area)
+			inside2 = r2 - dy * dy if 0 < cy < last_y else -1.0
+			for cx, cell in row.items():
+				if (cx < cx_min) or (cx > cx_max):
+					continue
+				x_min = grid.x0 + cx * size
+				dx = max(abs(x - x_min), abs(x - x_min - size))
+				if (dx * dx <= inside2) and (0 < cx < last_x):
+					found.extend(cell.values())
+					continue
+				for entry in cell.values():
+					dx = entry['pos_x'] - x
+					dy = entry['pos_y'] - y
+					if dx * dx + dy * dy <= r2:
+						found.append(entry)
+		return found
+
+	#------------------------------------------------------------------------------------------------
+	# nearest - the k entries closest to (x, y), closest first. exclude: nodes not returned
+	#		The rings of cells around the cell of (x, y) are searched until the k-th closest entry found is closer
+	#		than any cell not searched yet
+	#------------------------------------------------------------------------------------------------
+	def nearest(self, x, y, k=1, exclude=()):
+		if self.count <= NEAREST_SCAN:
+			found = [(math.hypot(entry['pos_x'] - x, entry['pos_y'] - y), node, entry)
+					 for node, entry in self.items() if node not in exclude]
+			found.sort(key=lambda f: f[0])
+			return [entry for distance, node, entry in found[:k]]
+		grid = self.grid
+		rows = self.rows
+		cx, cy = grid.cell_index(x, y)
+		found = []
+		ring = 0
+		while True:
+			for key_x, key_y in grid.ring_cells(cx, cy, ring):
+				for node, entry in rows[key_y].get(key_x, EMPTY).items():
+					if node not in exclude:
+						found.append((math.hypot(entry['pos_x'] - x, entry['pos_y'] - y), node, entry))
+			bound = grid.searched_distance(x, y, cx, cy, ring)
+			if bound is None:
+				break
+			if len(found) >= k:
+				found.sort(key=lambda f: f[0])
+				del found[k:]
+				if found[-1][0] <= bound:
+					break
+			ring += 1
+		found.sort(key=lambda f: f[0])
+		return [entry for distance, node, entry in found[:k]]
+
+	def __contains__(self, node):
+		group, bucket = divmod(hash(node) % NODE_SLOTS, NODE_BUCKETS)
+		return node in self.groups[group][bucket]
+
+	def __getitem__(self, node):
+		group, bucket = divmod(hash(node) % NODE_SLOTS, NODE_BUCKETS)
+		return self.groups[group][bucket][node]
+
+	def __len__(self):
+		return self.count
+
+	def __iter__(self):
+		return (node for cell in self.cells() for node in cell)
+
+	def __repr__(self):
+		return repr(self.entries())
+
+#------------------------------------------------------------------------------------------------
+# empty_view - view without entries. Its rows and buckets are the same empty dictionary, copied before a change
+#------------------------------------------------------------------------------------------------
+EMPTY = {}
+
+def empty_view(grid, generation):
+	return LocTableView(grid, (EMPTY,) * grid.ny, ((EMPTY,) * NODE_BUCKETS,) * NODE_GROUPS, 0, generation)
+
+#------------------------------------------------------------------------------------------------
+# LocTable - neighbour table. Writers are serialized by the lock, readers use the current view
+#------------------------------------------------------------------------------------------------
+class LocTable:
+
+	def __init__(self, size_x=None, size_y=None, cell=None):
+		size_x = maps.size_x if size_x is None else size_x
+		size_y = maps.size_y if size_y is None else size_y
+		self.grid = Grid(size_x, size_y, its_conf.loc_table_cell if cell is None else cell)
+		self.current = empty_view(self.grid, 0)
+		# writer state, used with the lock held
+		self.cell_of = {}
+		self.deadlines = []
+		self.changes = deque(maxlen=CHANGE_LOG)
+		self.lock = threading.Lock()
+		self.condition = threading.Condition(self.lock)
+
+	def view(self):
+		return self.current
+
+	#------------------------------------------------------------------------------------------------
+	# changes_since - nodes changed (added, updated or deleted) after generation, up to the generation of view.
+	#		None if they are no longer known (the reader must rebuild from view). Does not lock
+	#------------------------------------------------------------------------------------------------
+	def changes_since(self, generation, view):
+		nodes = set()
+		expected = generation + 1
+		# the log is appended before a view is published: publications after view are skipped
+		for changed_generation, changed in list(self.changes):
+			if (changed_generation <= generation) or (changed_generation > view.generation):
+				continue
+			if changed_generation != expected:
+				return None
+			nodes.update(changed)
+			expected += 1
+		return nodes if expected == view.generation + 1 else None
+
+	#------------------------------------------------------------------------------------------------
+	# update - adds or replaces the entries of nodes (entry['node']), published together
+	#------------------------------------------------------------------------------------------------
+	def update(self, *entries):
+		with self.lock:
+			self.publish([(entry['node'], entry) for entry in entries])
+			deadlines = self.deadlines
+			earliest = deadlines[0] if deadlines else None
+			for entry in entries:
+				if entry.get('timeout') is not None:
+					heapq.heappush(deadlines, (entry['timeout'], entry['node']))
+			if len(deadlines) > HEAP_SLACK * self.current.count + NEAREST_SCAN:
+				self.deadlines = deadlines = [(e['timeout'], n) for n, e in self.current.items() if e.get('timeout') is not None]
+				heapq.heapify(deadlines)
+			# the expiry thread sleeps until the earliest deadline
+			if deadlines and (deadlines[0] != earliest):
+				self.condition.notify_all()
+
+	def delete(self, node):
+		with self.lock:
+			if node not in self.current:
+				return False
+			self.publish([(node, None)])
+			return True
+
+	def clear(self):
+		with self.lock:
+			self.cell_of.clear()
+			self.deadlines = []
+			self.changes.clear()
+			self.current = empty_view(self.grid, self.current.generation + 1)
+
+	#------------------------------------------------------------------------------------------------
+	# publish - publishes a view with the changes [(node, entry or None to delete)] applied to the current view.
+	#		Only the cells and node buckets changed, with their row and group, are copied (called with the lock held)
+	#------------------------------------------------------------------------------------------------
+	def publish(self, changes):
+		view = self.current
+		rows = list(view.rows)
+		groups = list(view.groups)
+		count = view.count
+		# cells and buckets already copied by this publication, and the rows and groups (as lists) copied
+		copied = set()
+		copied_rows = {}
+		copied_groups = {}
+		for node, entry in changes:
+			slot = hash(node) % NODE_SLOTS
+			g, b = divmod(slot, NODE_BUCKETS)
+			if g not in copied_groups:
+				groups[g] = copied_groups[g] = list(groups[g])
+			if slot not in copied:
+				groups[g][b] = dict(groups[g][b])
+				copied.add(slot)
+			bucket = groups[g][b]
+			old = self.cell_of.pop(node, None)
+			if old is not None:
+				row = copied_rows.get(old[1])
+				if row is None:
+					row = rows[old[1]] = copied_rows[old[1]] = dict(rows[old[1]])
+				if old not in copied:
+					row[old[0]] = dict(row[old[0]])
+					copied.add(old)
+				del row[old[0]][node]
+				if not row[old[0]]:
+					del row[old[0]]
+				del bucket[node]
+				count -= 1
+			if entry is not None:
+				key = self.grid.cell_index(entry['pos_x'], entry['pos_y'])
+				row = copied_rows.get(key[1])
+				if row is None:
+					row = rows[key[1]] = copied_rows[key[1]] = dict(rows[key[1]])
+				if key[0] not in row:
+					row[key[0]] = {}
+					copied.add(key)
+				elif key not in copied:
+					row[key[0]] = dict(row[key[0]])
+					copied.add(key)
+				row[key[0]][node] = entry
+				bucket[node] = entry
+				self.cell_of[node] = key
+				count += 1
+		for g, group in copied_groups.items():
+			groups[g] = tuple(group)
+		self.changes.append((view.generation + 1, [node for node, entry in changes]))
+		self.current = LocTableView(self.grid, tuple(rows), tuple(groups), count, view.generation + 1)
+
+	#------------------------------------------------------------------------------------------------
+	# expire - removes the entries whose timeout passed at time now. Returns the nodes removed
+	#------------------------------------------------------------------------------------------------
+	def expire(self, now=None):
+		now = time.time() if now is None else now
+		expired = []
+		with self.lock:
+			deadlines = self.deadlines
+			view = self.current
+			while deadlines and (deadlines[0][0] <= now):
+				timeout, node = heapq.heappop(deadlines)
+				entry = view.get(node)
+				# deleted, or refreshed with a later deadline
+				if (entry is None) or (entry.get('timeout') != timeout) or (node in expired):
+					continue
+				expired.append(node)
+			if expired:
+				self.publish([(node, None) for node in expired])
+		return expired
+
+	#------------------------------------------------------------------------------------------------
+	# wait_deadline - sleeps until the earliest deadline of the table is due (woken up if an earlier deadline
+	#		is added), or timeout seconds
+	#------------------------------------------------------------------------------------------------
+	def wait_deadline(self, timeout=None):
+		end = None if timeout is None else time.time() + timeout
+		with self.condition:
+			while True:
+				now = time.time()
+				if self.deadlines and (self.deadlines[0][0] <= now):
+					return
+				if (end is not None) and (now >= end):
+					return
+				wait = self.deadlines[0][0] - now if self.deadlines else None
+				if end is not None:
+					wait = end - now if wait is None else min(wait, end - now)
+				self.condition.wait(wait)
+
+	# queries, made on the current view
+
+	def snapshot(self):
+		return self.current.entries()
+
+	def get(self, node, default=None):
+		return self.current.get(node, default)
+
+	def radius(self, x, y, r):
+		return self.current.radius(x, y, r)
+
+	def nearest(self, x, y, k=1, exclude=()):
+		return self.current.nearest(x, y, k, exclude)
+
+	def __contains__(self, node):
+		return node in self.current
+
+	def __getitem__(self, node):
+		return self.current[node]
+
+	def __len__(self):
+		return self.current.count
+
+	def __bool__(self):
+		return self.current.count > 0
+
+	def __iter__(self):
+		return iter(self.current)
+
+	def __repr__(self):
+		return repr(self.current)